@@ -0,0 +1,65 @@
+# assistant_chat > asgi.py
+
+from django.urls import get_script_prefix, reverse
+from .services.llm_ollama import close_async_client, share_async_client
+from .views import chat_stream_asgi
+
+
+def _path_info(scope) -> str:
+    """
+    Ruta de la petició sense el prefix de muntatge (root_path), com ASGIRequest.path_info.
+    """
+    path, root = scope["path"], scope.get("root_path", "")
+    if root and path.startswith(root):
+        return path[len(root):]
+    return path
+
+
+class AssistantASGIApplication:
+    """
+    Aplicació ASGI que embolcalla la de Django (config/asgi.py).
+
+    - HTTP: el client d'Ollama compartit es crea al loop del servidor. El
+      flux de l'assistent (assistant_chat:api_chat_stream) el serveix
+      chat_stream_asgi, que no bloqueja l'event loop; la resta de peticions
+      van a Django.
+    - lifespan: en aturar el servidor es tanca el client d'Ollama (el
+      handler de Django 3.2 no accepta connexions que no siguin HTTP).
+    """
+
+    def __init__(self, django_app):
+        self.django_app = django_app
+        self._stream_path = None
+
+    @property
+    def stream_path(self) -> str:
+        """
+        path_info de la URL del flux (sense el prefix del script).
+        """
+        if self._stream_path is None:
+            url = reverse("assistant_chat:api_chat_stream")
+            self._stream_path = "/" + url[len(get_script_prefix()):]
+        return self._stream_path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+
+        if scope["type"] == "http":
+            share_async_client()
+            if _path_info(scope) == self.stream_path:
+                await chat_stream_asgi(self.django_app, scope, receive, send)
+                return
+
+        await self.django_app(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await close_async_client()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from semantic_search.services.benchmarks import latency_summary
+
+# Vistes que es poden comparar: síncrona (abans) i asíncrona (després)
+ENDPOINTS = {
+    "sync": "assistant_chat:api_chat",
+    "async": "assistant_chat:api_chat_async",
+}
+
+
+class _FakeOllamaHandler(BaseHTTPRequestHandler):
+    """
+    Ollama simulat: respon /api/generate (sense streaming) després de `delay` segons.
+    """
+
+    delay = 5.0
+    answer = json.dumps({"answer": "Resposta de prova.", "recommended_ids": [], "follow_up": ""})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        time.sleep(self.delay)
+
+        body = json.dumps({"response": self.answer, "done": True}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _start_fake_ollama(port: int, delay: float) -> ThreadingHTTPServer:
+    """
+    Arrenca l'Ollama simulat en un fil de fons (un fil per petició).
+    """
+    handler = type("FakeOllamaHandler", (_FakeOllamaHandler,), {"delay": delay})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class Command(BaseCommand):
+    """
+    Prova de càrrega de l'API de l'assistent: peticions concurrents contra un servidor en marxa.
+
+    Funciona com a script independent, executat amb:
+        python manage.py loadtest_assistant [--url http://127.0.0.1:8000]
+                                            [--concurrency 10,50,200] [--endpoints sync,async]
+
+    Per a cada vista i nivell de concurrència, N usuaris simulats envien
+    --rounds preguntes seguides cadascun. Es mostren les peticions
+    completades per segon, les que han fallat (error HTTP o timeout) i la
+    latència p50/p95/p99.
+
+    Cada vista s'ha de provar amb el servidor amb què es desplegaria: la
+    síncrona amb WSGI (gunicorn amb fils), on cada espera d'Ollama ocupa un
+    fil i la capacitat és fils / segons per resposta; l'asíncrona amb ASGI
+    (uvicorn), on les esperes no ocupen cap fil. La vista síncrona servida
+    amb uvicorn no és una referència vàlida: Django 3.2 executa totes les
+    vistes síncrones en un sol fil.
+
+    Per mesurar només el servidor web (no la GPU), --fake-ollama arrenca un
+    Ollama simulat que tarda --delay segons per resposta; el servidor s'ha
+    d'arrencar amb ASSISTANT_OLLAMA_URL apuntant-hi. Per exemple:
+
+        gunicorn config.wsgi --worker-class gthread --threads 8 -b 127.0.0.1:8001
+        uvicorn config.asgi:application --port 8002
+        python manage.py loadtest_assistant --url http://127.0.0.1:8001 --endpoints sync --fake-ollama 11500
+        python manage.py loadtest_assistant --url http://127.0.0.1:8002 --endpoints async --fake-ollama 11500
+
+    Opcions:
+    --url         : URL base del servidor a provar
+    --endpoints   : vistes a provar (sync, async)
+    --concurrency : nivells d'usuaris concurrents separats per comes
+    --rounds      : preguntes per usuari a cada nivell
+    --message     : pregunta que s'envia
+    --timeout     : segons màxims per petició
+    --fake-ollama : port on arrencar l'Ollama simulat
+    --delay       : segons que tarda cada resposta de l'Ollama simulat
+    """
+
+    help = "Mesura quantes preguntes concurrents aguanta l'API de l'assistent (síncrona vs asíncrona)."
+
+    def add_arguments(self, parser):
+        """
+        Defineix arguments opcionals per la comanda.
+        """
+        parser.add_argument("--url", default="http://127.0.0.1:8000")
+        parser.add_argument("--endpoints", default="sync,async")
+        parser.add_argument("--concurrency", default="10,50,200")
+        parser.add_argument("--rounds", type=int, default=2)
+        parser.add_argument("--message", default="vull un concert de jazz aquest cap de setmana")
+        parser.add_argument("--timeout", type=float, default=120.0)
+        parser.add_argument("--fake-ollama", type=int, default=None)
+        parser.add_argument("--delay", type=float, default=5.0)
+
+    async def _user(self, client, url, payload, rounds, times, errors):
+        """
+        Un usuari simulat: envia `rounds` preguntes, cadascuna quan ha rebut l'anterior.
+        """
+        import httpx
+
+        for _ in range(rounds):
+            start = time.perf_counter()
+            try:
+                resp = await client.post(url, json=payload)
+                ok = resp.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+
+            if ok:
+                times.append(time.perf_counter() - start)
+            else:
+                errors.append(time.perf_counter() - start)
+
+    async def _level(self, url, concurrency, options):
+        """
+        Executa un nivell de concurrència i retorna (latències, errors, segons totals).
+        """
+        import httpx
+
+        payload = {"message": options["message"], "only_future": True}
+        times, errors = [], []
+
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(timeout=options["timeout"], limits=limits) as client:
+            start = time.perf_counter()
+            await asyncio.gather(*(
+                self._user(client, url, payload, options["rounds"], times, errors)
+                for _ in range(concurrency)
+            ))
+            elapsed = time.perf_counter() - start
+
+        return times, errors, elapsed
+
+    def handle(self, *args, **options):
+        """
+        Lògica principal de la comanda:
+        1. Arrenca l'Ollama simulat, si s'ha demanat.
+        2. Per a cada vista i nivell de concurrència, llança els usuaris simulats.
+        3. Mostra el throughput, els errors i la latència de cada combinació.
+        """
+        try:
+            import httpx  # noqa: F401
+        except ImportError:
+            raise CommandError("Cal instal·lar httpx (pip install -r requirements.txt).")
+
+        endpoints = [name.strip() for name in options["endpoints"].split(",") if name.strip()]
+        unknown = [name for name in endpoints if name not in ENDPOINTS]
+        if unknown:
+            raise CommandError(f"Vistes desconegudes: {', '.join(unknown)} (opcions: {', '.join(ENDPOINTS)})")
+
+        try:
+            levels = [int(level) for level in options["concurrency"].split(",") if level.strip()]
+        except ValueError:
+            raise CommandError("--concurrency ha de ser una llista d'enters separats per comes.")
+
+        fake = None
+        if options["fake_ollama"]:
+            fake = _start_fake_ollama(options["fake_ollama"], options["delay"])
+            self.stdout.write(
+                f"Ollama simulat a http://127.0.0.1:{options['fake_ollama']}/api/generate "
+                f"({options['delay']:.1f}s per resposta)"
+            )
+
+        base = options["url"].rstrip("/")
+        self.stdout.write(
+            f"\n{'vista':<8}{'usuaris':>9}{'ok':>7}{'errors':>8}{'pet./s':>9}"
+            f"{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}"
+        )
+
+        try:
+            for name in endpoints:
+                url = base + reverse(ENDPOINTS[name])
+                for concurrency in levels:
+                    times, errors, elapsed = asyncio.run(self._level(url, concurrency, options))
+                    lat = latency_summary(times)
+                    self.stdout.write(
+                        f"{name:<8}{concurrency:>9}{len(times):>7}{len(errors):>8}"
+                        f"{len(times) / elapsed:>9.1f}{lat['p50'] / 1000:>9.2f}"
+                        f"{lat['p95'] / 1000:>9.2f}{lat['p99'] / 1000:>9.2f}"
+                    )
+        finally:
+            if fake is not None:
+                fake.shutdown()
@@ -1,13 +1,46 @@
 # assistant_chat > Services > llm_ollama.py
 
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
 import requests
+from django.conf import settings
 
-# URL del servei local d'Ollama
+logger = logging.getLogger(__name__)
+
+# URL del servei local d'Ollama (per defecte; es pot canviar amb ASSISTANT_OLLAMA_URL)
 OLLAMA_URL = "http://localhost:11434/api/generate"
 
 # Model que s'utilitzarà per generar respostes
 OLLAMA_MODEL = "llama3.1:8b"
 
+# Temps màxims en streaming: connexió i espera entre dos fragments (no el total)
+OLLAMA_STREAM_TIMEOUT = (5, 60)
+
+# Client HTTP asíncron compartit: (event loop del servidor ASGI, client httpx)
+_shared_client = None
+
+
+def _ollama_url() -> str:
+    return getattr(settings, "ASSISTANT_OLLAMA_URL", OLLAMA_URL)
+
+
+def _payload(prompt: str, stream: bool) -> dict:
+    """
+    Payload de /api/generate amb els paràmetres del model.
+    """
+    return {
+        "model": OLLAMA_MODEL,
+        "prompt": prompt,
+        "stream": stream,
+        "options": {
+            "temperature": 0.2,  # Control de creativitat (baix = més determinista)
+            "top_p": 0.9,        # Sampling nucleus
+            "num_ctx": 2048      # Mida màxima del context
+        }
+    }
+
 
 def generate(prompt: str) -> str:
     """
@@ -27,21 +60,12 @@ def generate(prompt: str) -> str:
         str | None: Text generat pel model o None si hi ha error
     """
 
-    # Construcció del payload amb configuració del model
-    payload = {
-        "model": OLLAMA_MODEL,
-        "prompt": prompt,
-        "stream": False,  # Es demana resposta completa (no streaming)
-        "options": {
-            "temperature": 0.2,  # Control de creativitat (baix = més determinista)
-            "top_p": 0.9,        # Sampling nucleus
-            "num_ctx": 2048      # Mida màxima del context
-        }
-    }
+    # Construcció del payload (es demana resposta completa, no streaming)
+    payload = _payload(prompt, stream=False)
 
     try:
         # Enviem la petició al servidor d'Ollama
-        resp = requests.post(OLLAMA_URL, json=payload, timeout=60)
+        resp = requests.post(_ollama_url(), json=payload, timeout=60)
 
         # Llança excepció si el codi HTTP indica error
         resp.raise_for_status()
@@ -61,4 +85,155 @@ def generate(prompt: str) -> str:
         return None
 
     # Retornem el text netejat (sense espais extres)
-    return text.strip()
\ No newline at end of file
+    return text.strip()
+
+
+def generate_stream(prompt: str):
+    """
+    Envia un prompt a Ollama en mode streaming i va retornant els tokens generats.
+
+    Ollama respon amb NDJSON: una línia JSON per fragment amb el text nou a
+    "response" i "done": true a l'última. Els fragments es retornen a mesura
+    que arriben, sense esperar la resposta completa.
+
+    Si hi ha un error (Ollama no disponible, tall de connexió o línia no
+    vàlida), el generador s'atura: qui el consumeix veu una resposta buida o
+    incompleta, com el None de generate().
+
+    Args:
+        prompt (str): Text d'entrada que es vol enviar al model
+
+    Yields:
+        str: Fragments de text generats pel model
+    """
+    try:
+        with requests.post(_ollama_url(), json=_payload(prompt, stream=True),
+                           stream=True, timeout=OLLAMA_STREAM_TIMEOUT) as resp:
+            resp.raise_for_status()
+
+            for line in resp.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get("response"):
+                    yield data["response"]
+                if data.get("done"):
+                    return
+
+    except (requests.RequestException, ValueError):
+        logger.warning("Error llegint la resposta en streaming d'Ollama", exc_info=True)
+
+
+def _new_async_client():
+    import httpx
+
+    max_connections = getattr(settings, "ASSISTANT_OLLAMA_MAX_CONNECTIONS", 256)
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(60, connect=5),
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+    )
+
+
+def share_async_client():
+    """
+    Crea el client HTTP asíncron compartit a l'event loop del servidor ASGI.
+
+    La crida l'aplicació ASGI (assistant_chat.asgi) a cada petició: el loop
+    del servidor viu tant com el procés, de manera que totes les peticions
+    reutilitzen les mateixes connexions keep-alive amb Ollama, fins a
+    ASSISTANT_OLLAMA_MAX_CONNECTIONS simultànies (les altres esperen una
+    connexió lliure).
+    """
+    global _shared_client
+
+    loop = asyncio.get_running_loop()
+    if _shared_client is None or _shared_client[0] is not loop:
+        _shared_client = (loop, _new_async_client())
+
+
+async def close_async_client():
+    """
+    Tanca el client compartit (en aturar el servidor ASGI, via lifespan).
+    """
+    global _shared_client
+
+    if _shared_client is not None and _shared_client[0] is asyncio.get_running_loop():
+        client = _shared_client[1]
+        _shared_client = None
+        await client.aclose()
+
+
+@asynccontextmanager
+async def async_client():
+    """
+    Client HTTP asíncron per a una crida a Ollama.
+
+    Al loop del servidor ASGI és el client compartit. Fora d'aquest loop
+    (una vista asíncrona servida per WSGI, que crea un loop per petició) es
+    crea un client temporal que es tanca en acabar la crida.
+    """
+    shared = _shared_client
+    if shared is not None and shared[0] is asyncio.get_running_loop():
+        yield shared[1]
+        return
+
+    async with _new_async_client() as client:
+        yield client
+
+
+async def agenerate(prompt: str) -> str:
+    """
+    Versió asíncrona de generate(): mentre Ollama genera, l'event loop
+    atén altres peticions en lloc de bloquejar un fil.
+
+    Args:
+        prompt (str): Text d'entrada que es vol enviar al model
+
+    Returns:
+        str | None: Text generat pel model o None si hi ha error
+    """
+    import httpx
+
+    try:
+        async with async_client() as client:
+            resp = await client.post(_ollama_url(), json=_payload(prompt, stream=False))
+            resp.raise_for_status()
+            data = resp.json()
+
+    except (httpx.HTTPError, ValueError):
+        # Error de xarxa o resposta no vàlida
+        return None
+
+    text = data.get("response")
+    if not text:
+        return None
+
+    return text.strip()
+
+
+async def agenerate_stream(prompt: str):
+    """
+    Versió asíncrona de generate_stream(): llegeix el NDJSON d'Ollama amb
+    httpx sense bloquejar l'event loop.
+
+    Yields:
+        str: Fragments de text generats pel model
+    """
+    import httpx
+
+    try:
+        async with async_client() as client:
+            async with client.stream("POST", _ollama_url(), json=_payload(prompt, stream=True)) as resp:
+                resp.raise_for_status()
+
+                async for line in resp.aiter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if data.get("response"):
+                        yield data["response"]
+                    if data.get("done"):
+                        return
+
+    except (httpx.HTTPError, ValueError):
+        logger.warning("Error llegint la resposta en streaming d'Ollama", exc_info=True)
@@ -1,9 +1,9 @@
 # assistant_chat > Services > retriever.py
 
 from django.utils import timezone
-from events.models import Event
 from semantic_search.services.embeddings import embed_text
-from semantic_search.services.ranker import cosine_top_k
+from semantic_search.services.hybrid import hybrid_search
+from semantic_search.services.index import get_index, hydrate_events
 
 
 def retrieve_events(
@@ -14,16 +14,16 @@ def retrieve_events(
 ):
     """
     Recupera esdeveniments rellevants a partir d'una consulta de text utilitzant embeddings
-    i similitud cosinus.
+    i similitud cosinus, combinats amb una cerca per paraules (BM25).
 
     Procés:
     1. Converteix la query en un vector (embedding)
-    2. Obté els esdeveniments de la base de dades
-    3. Filtra opcionalment els esdeveniments futurs
-    4. Selecciona només aquells amb embeddings vàlids i compatibles
-    5. Calcula la similitud cosinus i ordena els resultats
-    6. Aplica un llindar mínim de score
-    7. Retorna els k millors resultats
+    2. Restringeix opcionalment la cerca als esdeveniments futurs
+    3. Calcula la similitud cosinus contra l'índex vectorial resident
+    4. Aplica un llindar mínim de score als candidats semàntics (i un de
+       relatiu als de BM25)
+    5. Ordena per la fusió del rànquing semàntic amb el de BM25 (RRF)
+    6. Carrega de la BD només els k millors esdeveniments
 
     Args:
         query (str): Text de cerca introduït per l'usuari
@@ -32,48 +32,23 @@ def retrieve_events(
         min_score (float): Llindar mínim de similitud per considerar un resultat vàlid
 
     Returns:
-        list[tuple[Event, float]]: Llista d'esdeveniments amb el seu score de similitud
+        list[tuple[Event, float | None]]: Llista d'esdeveniments amb la seva similitud
+        cosinus (None si només els ha trobat la cerca per paraules)
     """
 
-    # Genera l'embedding de la query
-    qVec = embed_text(query)
+    # Genera l'embedding de la query (amb el mateix model que l'índex)
+    qVec = embed_text(query, model=get_index().model)
 
     # Si no s'ha pogut generar l'embedding (error o text buit), retornem buit
     if not qVec:
         return []
 
-    # Obtenim tots els esdeveniments
-    qSet = Event.objects.all()
+    # Filtre opcional per només esdeveniments futurs (s'aplica dins l'índex)
+    scheduled_from = timezone.now() if only_future else None
 
-    # Filtre opcional per només esdeveniments futurs
-    if only_future:
-        qSet = qSet.filter(scheduled_date__gte=timezone.now())
+    # Millors candidats segons similitud cosinus i BM25 (ordenats amb RRF);
+    # els candidats amb score baix (soroll) es descarten abans
+    hits = hybrid_search(query, qVec, k=k, min_score=min_score, scheduled_from=scheduled_from)
 
-    items = []
-
-    # Iterem sobre els esdeveniments per preparar-los per al càlcul de similitud
-    for evt in qSet:
-        # Obtenim l'embedding de l'event (si existeix)
-        emb = getattr(evt, "embedding", None)
-
-        # Validem que:
-        # - sigui una llista
-        # - tingui la mateixa dimensió que la query
-        if isinstance(emb, list) and len(emb) == len(qVec):
-            items.append((evt, emb))
-
-    # Calculem més resultats dels necessaris per compensar el filtratge posterior
-    initial_k = max(k * 3, 20)
-
-    # Obtenim els millors candidats segons similitud cosinus
-    ranked = cosine_top_k(qVec, items, k=initial_k)
-
-    # Eliminem resultats amb score baix (soroll)
-    ranked = [
-        (evt, score)
-        for (evt, score) in ranked
-        if score >= min_score
-    ]
-
-    # Retornem només els k millors resultats finals
-    return ranked[:k]
\ No newline at end of file
+    # Només carreguem de la BD els k esdeveniments finals
+    return hydrate_events(hits)
@@ -0,0 +1,101 @@
+# assistant_chat > Services > streaming.py
+
+import json
+import re
+
+# Inici del valor de "answer" dins la resposta JSON del model
+_ANSWER_START = re.compile(r'"answer"\s*:\s*"')
+
+
+def _is_high_surrogate(digits: str) -> bool:
+    """
+    Indica si un escape \\uXXXX és la primera meitat d'una parella suplent.
+    """
+    try:
+        return 0xD800 <= int(digits, 16) <= 0xDBFF
+    except ValueError:
+        return False
+
+
+def sse_frame(event: str, data: dict) -> bytes:
+    """
+    Codifica un missatge Server-Sent Events (`event` + una línia `data` JSON).
+    """
+    payload = json.dumps(data, ensure_ascii=False)
+    # Un suplent solt (escape trencat del model) no és UTF-8 vàlid: es substitueix
+    return f"event: {event}\ndata: {payload}\n\n".encode("utf-8", "replace")
+
+
+class AnswerExtractor:
+    """
+    Extreu incrementalment el text del camp "answer" de la resposta JSON del model.
+
+    El model respon amb un objecte JSON ({"answer": ..., "recommended_ids":
+    ..., "follow_up": ...}) que arriba token a token. Al navegador només se
+    li envia el text de la resposta a mesura que es genera, ja descodificat
+    (sense cometes ni escapes). Un escape partit entre dos tokens s'espera
+    fins que arriba sencer.
+
+    La resposta JSON completa es continua parsejant al final (les
+    recomanacions i el follow_up s'envien en l'últim missatge).
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = None     # Posició del següent caràcter del valor (None = encara no trobat)
+        self.done = False   # El valor ja s'ha tancat
+
+    def feed(self, token: str) -> str:
+        """
+        Afegeix un token i retorna el text nou de "answer" que es pot mostrar.
+        """
+        self.buffer += token
+        if self.done:
+            return ""
+
+        if self.pos is None:
+            match = _ANSWER_START.search(self.buffer)
+            if match is None:
+                return ""
+            self.pos = match.end()
+
+        out = []
+        buf, i = self.buffer, self.pos
+        while i < len(buf):
+            char = buf[i]
+            if char == '"':
+                self.done = True
+                i += 1
+                break
+            if char != "\\":
+                out.append(char)
+                i += 1
+                continue
+
+            # Escape: \n, \", \uXXXX (i parelles suplents, per als emojis)
+            if i + 1 >= len(buf):
+                break
+            if buf[i + 1] != "u":
+                length = 2
+            elif i + 6 > len(buf):
+                break
+            elif not _is_high_surrogate(buf[i + 2:i + 6]):
+                length = 6
+            elif not "\\u".startswith(buf[i + 6:i + 8]):
+                # Meitat suplent sense parella: no es pot codificar en UTF-8
+                i += 6
+                continue
+            elif i + 12 > len(buf):
+                break
+            else:
+                length = 12
+
+            try:
+                out.append(json.loads(f'"{buf[i:i + length]}"'))
+            except ValueError:
+                # Escape invàlid: es mostra tal qual
+                out.append(buf[i:i + length])
+            i += length
+
+        self.pos = i
+        return "".join(out)
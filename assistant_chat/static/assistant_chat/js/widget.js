@@ -64,7 +64,37 @@ document.addEventListener('DOMContentLoaded', function () {
         messages.scrollTop = messages.scrollHeight;
     }
 
+    // ─── Llegir un flux Server-Sent Events ────────────────────
+    // Crida onEvent(nom, dades) per a cada missatge complet del flux
+    async function readEvents(resp, onEvent) {
+        const reader = resp.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            let end;
+            while ((end = buffer.indexOf('\n\n')) !== -1) {
+                const frame = buffer.slice(0, end);
+                buffer = buffer.slice(end + 2);
+
+                let name = 'message';
+                let data = '';
+                frame.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) name = line.slice(6).trim();
+                    else if (line.startsWith('data:')) data += line.slice(5).trim();
+                });
+                if (data) onEvent(name, JSON.parse(data));
+            }
+        }
+    }
+
     // ─── Enviar missatge ──────────────────────────────────────
+    // La resposta arriba en streaming: el text es mostra a mesura que el
+    // model el genera i les targetes d'events arriben a l'últim missatge
     async function sendMessage() {
         const msg = input.value.trim();
         if (!msg) return;
@@ -74,23 +104,41 @@ document.addEventListener('DOMContentLoaded', function () {
         input.value = '';
         input.style.height = 'auto';
 
-        const thinking = addMessage('Pensant...', false);
+        const reply = addMessage('Pensant...', false);
+        let started = false;
+        let finished = false;
 
         try {
-            const resp = await fetch('/assistant/api/chat/', {
+            const resp = await fetch('/assistant/api/chat/stream/', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({ message: msg, only_future: onlyFuture })
             });
-            const data = await resp.json();
-            thinking.remove();
-            addMessage(data.answer || '', false);
-            addEventCards(data.events || []);
-            if (data.follow_up) {
-                addMessage(data.follow_up, false);
-            }
+            if (!resp.ok) throw new Error(resp.status);
+
+            await readEvents(resp, function (name, data) {
+                if (name === 'token') {
+                    if (!started) {
+                        reply.innerText = '';
+                        started = true;
+                    }
+                    reply.innerText += data.text;
+                    messages.scrollTop = messages.scrollHeight;
+                } else if (name === 'done') {
+                    // La resposta final validada substitueix el text parcial
+                    finished = true;
+                    reply.innerText = data.answer || '';
+                    addEventCards(data.events || []);
+                    if (data.follow_up) {
+                        addMessage(data.follow_up, false);
+                    }
+                }
+            });
+
+            if (!finished) throw new Error('incomplete');
         } catch (err) {
-            thinking.innerText = 'Error de connexió. Torna-ho a provar.';
+            if (!started) reply.innerText = 'Error de connexió. Torna-ho a provar.';
+            else addMessage('Error de connexió. Torna-ho a provar.', false);
         }
     }
 });
\ No newline at end of file
@@ -1,3 +1,174 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.core import signals
+from django.core.asgi import get_asgi_application
+from django.test import SimpleTestCase
+from . import views
+from .asgi import AssistantASGIApplication
+from .services.streaming import AnswerExtractor
 
-# Create your tests here.
+
+def _scope(path: str, root_path: str = "") -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "root_path": root_path,
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 5000),
+        "server": ("testserver", 80),
+    }
+
+
+async def _fake_stream(prompt):
+    for token in ['{"answer": "Hola', ' món", "recommended_ids": []}']:
+        yield token
+
+
+class AssistantASGIDispatchTests(SimpleTestCase):
+    """
+    L'aplicació ASGI envia la URL del flux a chat_stream_asgi i la resta a Django.
+    """
+
+    def _dispatch(self, scope) -> str:
+        calls = []
+
+        async def django_app(scope, receive, send):
+            calls.append("django")
+
+        async def stream(handler, scope, receive, send):
+            calls.append("stream")
+
+        app = AssistantASGIApplication(django_app)
+        with mock.patch("assistant_chat.asgi.chat_stream_asgi", stream):
+            async_to_sync(app)(scope, None, None)
+        return calls[0]
+
+    def test_stream_route(self):
+        self.assertEqual(self._dispatch(_scope("/assistant/api/chat/stream/")), "stream")
+
+    def test_stream_route_under_root_path(self):
+        scope = _scope("/agenda/assistant/api/chat/stream/", root_path="/agenda")
+        self.assertEqual(self._dispatch(scope), "stream")
+
+    def test_other_routes_go_to_django(self):
+        self.assertEqual(self._dispatch(_scope("/assistant/api/chat/")), "django")
+
+
+class ChatStreamASGITests(SimpleTestCase):
+    """
+    Flux SSE servit per chat_stream_asgi.
+    """
+
+    def _run(self, body: dict):
+        messages = []
+        body_sent = []
+
+        async def receive():
+            if not body_sent:
+                body_sent.append(True)
+                return {"type": "http.request", "body": json.dumps(body).encode("utf-8"), "more_body": False}
+            # Client connectat fins al final del flux
+            await asyncio.sleep(3600)
+
+        async def send(message):
+            messages.append(message)
+
+        async_to_sync(views.chat_stream_asgi)(
+            get_asgi_application(), _scope("/assistant/api/chat/stream/"), receive, send
+        )
+        return messages
+
+    def test_streams_tokens_and_sends_request_signals(self):
+        fired = []
+        threads = []
+
+        def on_started(**kwargs):
+            fired.append("started")
+
+        def on_finished(**kwargs):
+            fired.append("finished")
+
+        def close_connections():
+            threads.append(threading.get_ident())
+
+        signals.request_started.connect(on_started)
+        signals.request_finished.connect(on_finished)
+        self.addCleanup(signals.request_started.disconnect, on_started)
+        self.addCleanup(signals.request_finished.disconnect, on_finished)
+
+        with mock.patch.object(views, "_retrieve_candidates", return_value=[]), \
+                mock.patch.object(views, "agenerate_stream", _fake_stream), \
+                mock.patch.object(views, "close_old_connections", close_connections):
+            messages = self._run({"message": "concerts"})
+
+        self.assertEqual(fired, ["started", "finished"])
+        # Les connexions es tanquen al fil del pool, abans i després de l'ORM
+        self.assertEqual(len(threads), 2)
+        self.assertNotEqual(threads[0], threading.get_ident())
+
+        self.assertEqual(messages[0]["status"], 200)
+        body = b"".join(m["body"] for m in messages[1:]).decode("utf-8")
+        self.assertIn('event: token\ndata: {"text": "Hola"}', body)
+        self.assertIn("event: done", body)
+
+    def test_invalid_request(self):
+        with mock.patch.object(views, "_retrieve_candidates") as retrieve:
+            messages = self._run({"message": ""})
+
+        self.assertEqual(messages[0]["status"], 400)
+        retrieve.assert_not_called()
+
+
+class AnswerExtractorTests(SimpleTestCase):
+    """
+    Extracció incremental del camp "answer" de la resposta JSON del model.
+    """
+
+    ANSWER = 'Línia 1\nDiu "hola" \\ camí 😀 fi'
+
+    def _response(self) -> str:
+        # ensure_ascii: accents i emojis com a escapes \uXXXX (l'emoji, parella suplent)
+        return json.dumps({"answer": self.ANSWER, "recommended_ids": [1, 2]}, ensure_ascii=True)
+
+    def _extract(self, tokens) -> list[str]:
+        extractor = AnswerExtractor()
+        return [extractor.feed(token) for token in tokens]
+
+    def test_one_character_per_token(self):
+        parts = self._extract(self._response())
+
+        self.assertEqual("".join(parts), self.ANSWER)
+        # El text surt a mesura que arriba, no tot al final
+        self.assertGreater(len([part for part in parts if part]), 20)
+
+    def test_every_split_point(self):
+        response = self._response()
+        for split in range(len(response)):
+            with self.subTest(split=split):
+                parts = self._extract([response[:split], response[split:]])
+                self.assertEqual("".join(parts), self.ANSWER)
+
+    def test_surrogate_pair_split_across_tokens(self):
+        tokens = ['{"answer": "a \\ud83d', '\\ude00', ' b"}']
+
+        self.assertEqual(self._extract(tokens), ["a ", "😀", " b"])
+
+    def test_lone_surrogate_is_dropped(self):
+        parts = self._extract(['{"answer": "a\\ud83d b"}'])
+
+        self.assertEqual("".join(parts), "a b")
+
+    def test_text_after_answer_is_ignored(self):
+        extractor = AnswerExtractor()
+
+        self.assertEqual(extractor.feed('{"follow_up": "x", "answer": "ok"'), "ok")
+        self.assertTrue(extractor.done)
+        self.assertEqual(extractor.feed(', "recommended_ids": []}'), "")
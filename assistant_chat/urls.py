@@ -1,9 +1,11 @@
 from django.urls import path
-from .views import chat_page, chat_api
+from .views import chat_page, chat_api, chat_api_async, chat_stream
 
 app_name = "assistant_chat"
 
 urlpatterns = [
     path("assistant/", chat_page, name="page"),
     path("assistant/api/chat/", chat_api, name="api_chat"),
+    path("assistant/api/chat/async/", chat_api_async, name="api_chat_async"),
+    path("assistant/api/chat/stream/", chat_stream, name="api_chat_stream"),
 ]
\ No newline at end of file
@@ -1,10 +1,21 @@
+import asyncio
 import json
-from django.http import JsonResponse
+import logging
+import time
+from contextlib import aclosing
+from asgiref.sync import sync_to_async
+from django.core import signals
+from django.core.exceptions import RequestAborted
+from django.db import close_old_connections
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.views.decorators.csrf import csrf_exempt
 from .services.retriever import retrieve_events
 from .services.prompts import build_prompt
-from .services.llm_ollama import generate
+from .services.llm_ollama import agenerate, agenerate_stream, generate, generate_stream
+from .services.streaming import AnswerExtractor, sse_frame
+
+logger = logging.getLogger(__name__)
 
 
 def chat_page(request):
@@ -20,37 +31,23 @@ def chat_page(request):
     return render(request, "assistant_chat/chat.html")
 
 
-@csrf_exempt
-def chat_api(request):
+def _parse_message(request):
     """
-    API per al xat que rep missatges de l'usuari i retorna respostes generades
-    pel model LLM basat en els esdeveniments disponibles.
-
-    Procés:
-    1. Verifica que la petició sigui POST
-    2. Parseja el JSON rebut
-    3. Recupera els esdeveniments rellevants amb retrieve_events
-    4. Genera el prompt amb build_prompt
-    5. Obté la resposta del model amb generate
-    6. Valida i filtra la resposta
-    7. Retorna JSON amb la resposta i esdeveniments recomanats
-
-    Args:
-        request (HttpRequest): Petició POST amb un JSON {"message": "...", "only_future": bool}
+    Valida la petició del xat (POST amb JSON) i n'extreu el missatge.
 
     Returns:
-        JsonResponse: Resposta amb clau "answer", "follow_up" i "events"
+        tuple: (missatge, only_future, None) o (None, None, JsonResponse d'error)
     """
 
     # Només acceptem POST
     if request.method != "POST":
-        return JsonResponse({"error": "POST only"}, status=405)
+        return None, None, JsonResponse({"error": "POST only"}, status=405)
 
     # Parsejem el cos de la petició
     try:
         payload = json.loads(request.body.decode("utf-8"))
     except Exception:
-        return JsonResponse({"error": "Invalid JSON"}, status=400)
+        return None, None, JsonResponse({"error": "Invalid JSON"}, status=400)
 
     # Extraiem el missatge i opció de només futurs
     msg = (payload.get("message") or "").strip()
@@ -58,12 +55,15 @@ def chat_api(request):
 
     # Validació: missatge buit
     if not msg:
-        return JsonResponse({"error": "Empty message"}, status=400)
+        return None, None, JsonResponse({"error": "Empty message"}, status=400)
 
-    # Recuperem els esdeveniments més rellevants
-    ranked = retrieve_events(msg, only_future=only_future, k=8)
+    return msg, only_future, None
 
-    # Preparem els candidats per enviar al model
+
+def _build_candidates(ranked) -> list:
+    """
+    Converteix els esdeveniments recuperats en els candidats que veu el model.
+    """
     candidates = []
     for evt, score in ranked:
         candidates.append({
@@ -73,22 +73,31 @@ def chat_api(request):
             "category": evt.category,
             "tags": evt.tags or "",
             "url": evt.get_absolute_url(),
-            "score": round(float(score), 3),
+            # Similitud cosinus (None si només coincideix per paraules)
+            "score": round(float(score), 3) if score is not None else None,
         })
+    return candidates
 
-    # Construïm el prompt per al model
-    prompt = build_prompt(msg, candidates)
 
-    # Obtenim la resposta del model
-    llm_text = generate(prompt)
+def _final_payload(llm_text, candidates: list) -> dict:
+    """
+    Valida i filtra la resposta del model i hi afegeix les targetes d'events.
+
+    Args:
+        llm_text (str | None): Text generat pel model (None si no està disponible)
+        candidates (list): Candidats enviats al model
+
+    Returns:
+        dict: Resposta amb claus "answer", "follow_up" i "events"
+    """
 
     # Control de None — Ollama no disponible o error
     if llm_text is None:
-        return JsonResponse({
+        return {
             "answer": "L'assistent no està disponible en aquest moment. Torna-ho a provar.",
             "follow_up": "",
             "events": candidates[:3],  # mostrem els primers 3 com fallback
-        })
+        }
 
     # Intentem parsejar la resposta JSON del model
     try:
@@ -110,9 +119,291 @@ def chat_api(request):
     if not cards:
         cards = candidates[:3]  # fallback si el model no recomana cap id vàlid
 
-    # Retorn final com a JSON
-    return JsonResponse({
+    return {
         "answer": llm_json.get("answer", ""),
         "follow_up": llm_json.get("follow_up", ""),
         "events": cards,
-    })
\ No newline at end of file
+    }
+
+
+def _retrieve_candidates(msg: str, only_future: bool) -> list:
+    """
+    Recupera els esdeveniments més rellevants i en construeix els candidats.
+    """
+    return _build_candidates(retrieve_events(msg, only_future=only_future, k=8))
+
+
+def _retrieve_candidates_pooled(msg: str, only_future: bool) -> list:
+    """
+    _retrieve_candidates per a un fil del pool (sync_to_async sense thread_sensitive).
+
+    Les connexions de la BD són per fil i els signals de la petició només
+    tanquen les del fil on s'executen: aquí es tanquen les caducades (o
+    totes, amb CONN_MAX_AGE = 0) abans i després de fer servir l'ORM.
+    """
+    close_old_connections()
+    try:
+        return _retrieve_candidates(msg, only_future)
+    finally:
+        close_old_connections()
+
+
+@csrf_exempt
+def chat_api(request):
+    """
+    API per al xat que rep missatges de l'usuari i retorna respostes generades
+    pel model LLM basat en els esdeveniments disponibles.
+
+    Procés:
+    1. Verifica que la petició sigui POST
+    2. Parseja el JSON rebut
+    3. Recupera els esdeveniments rellevants amb retrieve_events
+    4. Genera el prompt amb build_prompt
+    5. Obté la resposta del model amb generate
+    6. Valida i filtra la resposta
+    7. Retorna JSON amb la resposta i esdeveniments recomanats
+
+    Args:
+        request (HttpRequest): Petició POST amb un JSON {"message": "...", "only_future": bool}
+
+    Returns:
+        JsonResponse: Resposta amb clau "answer", "follow_up" i "events"
+    """
+
+    msg, only_future, error = _parse_message(request)
+    if error is not None:
+        return error
+
+    # Recuperem els esdeveniments més rellevants
+    candidates = _retrieve_candidates(msg, only_future)
+
+    # Construïm el prompt per al model
+    prompt = build_prompt(msg, candidates)
+
+    # Obtenim la resposta del model i la retornem com a JSON
+    return JsonResponse(_final_payload(generate(prompt), candidates))
+
+
+async def chat_api_async(request):
+    """
+    Variant asíncrona de chat_api per servir amb ASGI (config/asgi.py).
+
+    Mentre s'espera Ollama no s'ocupa cap fil: la petició queda suspesa a
+    l'event loop i el procés pot atendre centenars d'esperes alhora. La
+    recuperació d'esdeveniments (ORM i índex) és síncrona i s'executa amb
+    sync_to_async en un fil del pool; la crida a Ollama usa el client
+    asíncron compartit (agenerate). La resposta és la mateixa que la de chat_api.
+
+    Args:
+        request (HttpRequest): Petició POST amb un JSON {"message": "...", "only_future": bool}
+
+    Returns:
+        JsonResponse: Resposta amb clau "answer", "follow_up" i "events"
+    """
+
+    msg, only_future, error = _parse_message(request)
+    if error is not None:
+        return error
+
+    # Només lectures: la recuperació pot anar a qualsevol fil del pool, en
+    # lloc de fer cua al fil únic de les vistes síncrones (thread_sensitive)
+    candidates = await sync_to_async(_retrieve_candidates_pooled, thread_sensitive=False)(msg, only_future)
+
+    prompt = build_prompt(msg, candidates)
+
+    return JsonResponse(_final_payload(await agenerate(prompt), candidates))
+
+
+# A Django 3.2 el decorador csrf_exempt converteix la vista en síncrona
+chat_api_async.csrf_exempt = True
+
+
+class _AnswerRelay:
+    """
+    Converteix els tokens del model en missatges Server-Sent Events.
+
+    - event "token": text nou de la resposta ({"text": ...}), a mesura que el
+      model el genera
+    - event "done": resposta final validada, amb les targetes d'events (el
+      mateix JSON que chat_api)
+
+    En acabar es registra el temps fins al primer token (des de l'arribada
+    de la petició) i el temps total. El fan servir la vista síncrona
+    (chat_stream) i l'asíncrona (chat_stream_asgi).
+    """
+
+    def __init__(self, candidates: list, started: float, retrieval_ms: float):
+        self.candidates = candidates
+        self.started = started
+        self.retrieval_ms = retrieval_ms
+        self.extractor = AnswerExtractor()
+        self.first_token_ms = None
+        self.tokens = 0
+
+    def feed(self, token: str):
+        """
+        Missatge "token" amb el text nou (None si el token no n'afegeix).
+        """
+        if self.first_token_ms is None:
+            self.first_token_ms = (time.perf_counter() - self.started) * 1000.0
+        self.tokens += 1
+
+        text = self.extractor.feed(token)
+        return sse_frame("token", {"text": text}) if text else None
+
+    def finish(self) -> bytes:
+        """
+        Missatge "done" final; registra els temps de la resposta.
+        """
+        frame = sse_frame("done", _final_payload(self.extractor.buffer.strip() or None, self.candidates))
+
+        logger.info(
+            "Assistent (streaming): recuperació %.0f ms, primer token %s, %d tokens, total %.0f ms",
+            self.retrieval_ms,
+            f"{self.first_token_ms:.0f} ms" if self.first_token_ms is not None else "cap",
+            self.tokens,
+            (time.perf_counter() - self.started) * 1000.0,
+        )
+        return frame
+
+
+def _stream_answer(prompt: str, relay: _AnswerRelay):
+    """
+    Generador síncron de la resposta en Server-Sent Events (per a WSGI).
+    """
+    for token in generate_stream(prompt):
+        frame = relay.feed(token)
+        if frame:
+            yield frame
+
+    yield relay.finish()
+
+
+# Capçaleres del flux: sense cache ni buffering als proxies (nginx) perquè
+# els tokens arribin de seguida
+_STREAM_HEADERS = {
+    "Content-Type": "text/event-stream",
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+
+@csrf_exempt
+def chat_stream(request):
+    """
+    Variant en streaming de chat_api: retorna la resposta com a Server-Sent Events.
+
+    La validació, la recuperació d'esdeveniments i el prompt són els de
+    chat_api. La resposta d'Ollama es llegeix en streaming (NDJSON) i el text
+    de la resposta s'envia al navegador token a token; les targetes d'events
+    recomanats i el follow_up arriben a l'últim missatge ("done").
+
+    Aquesta vista és la de WSGI: el generador fa crides bloquejants a
+    Ollama i ocupa un fil mentre dura la resposta. Amb ASGI, Django 3.2
+    iteraria el generador dins l'event loop i el bloquejaria; per això
+    l'aplicació de config/asgi.py serveix aquesta mateixa URL amb
+    chat_stream_asgi.
+
+    Args:
+        request (HttpRequest): Petició POST amb un JSON {"message": "...", "only_future": bool}
+
+    Returns:
+        StreamingHttpResponse: Flux text/event-stream (o JsonResponse si la petició no és vàlida)
+    """
+    started = time.perf_counter()
+
+    msg, only_future, error = _parse_message(request)
+    if error is not None:
+        return error
+
+    # Recuperem els esdeveniments abans de començar el flux
+    candidates = _retrieve_candidates(msg, only_future)
+    relay = _AnswerRelay(candidates, started, (time.perf_counter() - started) * 1000.0)
+
+    prompt = build_prompt(msg, candidates)
+
+    response = StreamingHttpResponse(_stream_answer(prompt, relay))
+    for header, value in _STREAM_HEADERS.items():
+        response[header] = value
+    return response
+
+
+async def chat_stream_asgi(handler, scope, receive, send):
+    """
+    Versió ASGI de chat_stream, sense bloquejar l'event loop.
+
+    Django 3.2 no accepta iteradors asíncrons a StreamingHttpResponse, així
+    que el flux s'envia directament amb els missatges ASGI. La petició es
+    llegeix i es valida amb el handler de Django (read_body, create_request,
+    send_response per als errors); la recuperació d'esdeveniments s'executa
+    en un fil del pool (sync_to_async) i la resposta d'Ollama es llegeix amb
+    httpx (agenerate_stream). Si el navegador tanca la connexió, es deixa de
+    llegir Ollama.
+
+    Els middlewares de Django no s'apliquen a aquesta URL (la vista ja és
+    csrf_exempt i no usa la sessió). Els signals request_started i
+    request_finished sí que s'envien, com fa el handler de Django.
+
+    Args:
+        handler (ASGIHandler): handler de Django de l'aplicació
+        scope, receive, send: connexió ASGI d'una petició HTTP
+    """
+    started = time.perf_counter()
+
+    try:
+        body_file = await handler.read_body(receive)
+    except RequestAborted:
+        return
+
+    await sync_to_async(signals.request_started.send, thread_sensitive=True)(
+        sender=handler.__class__, scope=scope
+    )
+    try:
+        await _stream_asgi_response(handler, scope, body_file, send, receive, started)
+    finally:
+        await sync_to_async(signals.request_finished.send, thread_sensitive=True)(
+            sender=handler.__class__
+        )
+
+
+async def _stream_asgi_response(handler, scope, body_file, send, receive, started: float):
+    """
+    Cos de chat_stream_asgi entre els signals de la petició.
+    """
+    request, error = handler.create_request(scope, body_file)
+    if request is None:
+        await handler.send_response(error, send)
+        return
+
+    msg, only_future, error = _parse_message(request)
+    if error is not None:
+        await handler.send_response(error, send)
+        return
+
+    # Només lectures: la recuperació pot anar a qualsevol fil del pool
+    candidates = await sync_to_async(_retrieve_candidates_pooled, thread_sensitive=False)(msg, only_future)
+    relay = _AnswerRelay(candidates, started, (time.perf_counter() - started) * 1000.0)
+
+    prompt = build_prompt(msg, candidates)
+
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(name.lower().encode("latin-1"), value.encode("latin-1"))
+                    for name, value in _STREAM_HEADERS.items()],
+    })
+
+    # Després del cos, receive() només retorna quan el client es desconnecta
+    disconnected = asyncio.ensure_future(receive())
+    try:
+        async with aclosing(agenerate_stream(prompt)) as tokens:
+            async for token in tokens:
+                if disconnected.done():
+                    return
+                frame = relay.feed(token)
+                if frame:
+                    await send({"type": "http.response.body", "body": frame, "more_body": True})
+
+        await send({"type": "http.response.body", "body": relay.finish(), "more_body": False})
+    finally:
+        disconnected.cancel()
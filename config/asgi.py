@@ -13,4 +13,12 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Servidor ASGI (p. ex. `uvicorn config.asgi:application`): les vistes
+# asíncrones (chat_api_async) i el flux de l'assistent (chat_stream_asgi)
+# esperen Ollama a l'event loop sense ocupar cap fil. Els imports de l'app
+# van després de get_asgi_application(), que configura Django.
+from assistant_chat.asgi import AssistantASGIApplication  # noqa: E402
+
+application = AssistantASGIApplication(django_application)
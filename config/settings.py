@@ -135,6 +135,93 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cerca semàntica
+# Motor d'embeddings: 'sentence-transformers' (PyTorch), 'onnx' (ONNX Runtime,
+# opcionalment int8) o 'hashing' (determinista, sense model; per a dev/benchmarks)
+SEMANTIC_SEARCH_BACKEND = 'sentence-transformers'
+# Model inicial; després el model actiu es canvia amb backfill_event_embeddings --activate
+SEMANTIC_SEARCH_MODEL = 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
+# Directori amb model.onnx i tokenizer.json del model exportat (backend 'onnx')
+SEMANTIC_SEARCH_ONNX_DIR = BASE_DIR / 'var' / 'onnx'
+SEMANTIC_SEARCH_ONNX_QUANTIZED = False
+SEMANTIC_SEARCH_ONNX_THREADS = 0
+# Fragmentació dels textos llargs: tokens per fragment (None = els que llegeix
+# el model) i fragments màxims per event; cada fragment té el seu vector
+SEMANTIC_SEARCH_CHUNK_TOKENS = None
+SEMANTIC_SEARCH_MAX_CHUNKS = 8
+# Events relacionats: veïns precalculats per event (build_related_events) i
+# quants se'n mostren al detall (la resta cobreix els esborrats o cancel·lats)
+SEMANTIC_SEARCH_RELATED_COUNT = 12
+SEMANTIC_SEARCH_RELATED_SHOWN = 4
+# Quasi duplicats: similitud mínima i finestra (hores) entre dates d'events
+# del mateix creador, tant en crear/editar com a dedup_report
+SEMANTIC_SEARCH_DUPLICATE_THRESHOLD = 0.9
+SEMANTIC_SEARCH_DUPLICATE_WINDOW_HOURS = 72
+# Socket Unix del servidor d'embeddings compartit (run_embedding_server); amb
+# None cada procés carrega el seu model. Timeout en segons de cada petició.
+SEMANTIC_SEARCH_EMBEDDING_SOCKET = None
+SEMANTIC_SEARCH_EMBEDDING_TIMEOUT = 5.0
+# Directori del snapshot d'embeddings compartit pels workers (None = desactivat)
+SEMANTIC_SEARCH_SNAPSHOT_DIR = BASE_DIR / 'var' / 'embeddings'
+# Comprova el checksum del snapshot en carregar-lo (un cop per versió i procés)
+SEMANTIC_SEARCH_SNAPSHOT_VERIFY = True
+# Cada quants segons un worker comprova si hi ha snapshot nou o canvis a la BD (0 = mai)
+SEMANTIC_SEARCH_REFRESH_SECONDS = 30
+# Els esborrats es llegeixen del registre EventDeletion; cada quants segons es
+# comparen a més tots els ids de l'índex amb els de la BD (0 = només en carregar)
+SEMANTIC_SEARCH_RECONCILE_SECONDS = 3600
+# Dies que es conserven les files del registre d'esborrats
+SEMANTIC_SEARCH_DELETION_LOG_DAYS = 7
+# Directori dels checkpoints de backfill_event_embeddings (reprendre execucions)
+SEMANTIC_SEARCH_CHECKPOINT_DIR = BASE_DIR / 'var' / 'checkpoints'
+# Motor de cerca: 'exact' (força bruta) o 'ivf' (aproximat, per a milions d'events)
+SEMANTIC_SEARCH_ENGINE = 'exact'
+# Nombre de llistes IVF (0 = automàtic, ≈ 4·sqrt(N)) i llistes explorades per query
+SEMANTIC_SEARCH_IVF_NLIST = 0
+SEMANTIC_SEARCH_IVF_NPROBE = 16
+# Per sota d'aquest nombre d'events sempre es fa la cerca exacta
+SEMANTIC_SEARCH_ANN_MIN_ROWS = 50000
+# Quantització de la matriu per a la cerca exacta (None o 'int8') i nombre de
+# candidats que es reordenen amb els scores float32
+SEMANTIC_SEARCH_QUANTIZATION = None
+SEMANTIC_SEARCH_RERANK_CANDIDATES = 256
+# Cerca híbrida: BM25 (paraules) + cosinus fusionats amb Reciprocal Rank Fusion
+SEMANTIC_SEARCH_HYBRID = True
+SEMANTIC_SEARCH_HYBRID_CANDIDATES = 100
+SEMANTIC_SEARCH_RRF_K = 60
+# Els resultats de BM25 per sota d'aquesta fracció del millor score de la query
+# es descarten abans de la fusió (equivalent al min_score dels cosinus)
+SEMANTIC_SEARCH_LEXICAL_MIN_RATIO = 0.3
+# Cache LRU+TTL dels embeddings de queries (mida, segons de vida i àlies
+# opcional de CACHES per a un segon nivell compartit entre workers)
+SEMANTIC_SEARCH_QUERY_CACHE_SIZE = 1024
+SEMANTIC_SEARCH_QUERY_CACHE_TTL = 3600
+SEMANTIC_SEARCH_QUERY_CACHE_ALIAS = None
+# Rànquings cachejats per (query, filtres) i invalidats quan canvia la revisió
+# de l'índex: resultats guardats per query, mida de la cache i resultats per pàgina
+SEMANTIC_SEARCH_RESULT_DEPTH = 200
+SEMANTIC_SEARCH_RESULT_CACHE_SIZE = 256
+SEMANTIC_SEARCH_PAGE_SIZE = 20
+# Micro-batching de queries concurrents: segons que s'espera a agrupar-les
+# (0 = desactivat; només val la pena amb moltes queries simultànies, p.ex. 0.005),
+# màxim de textos per encode, màxim de textos a la cua (els que no hi caben
+# s'embedeixen directament) i segons màxims d'espera del resultat abans
+# d'embedir la query directament. També l'usa run_embedding_server.
+SEMANTIC_SEARCH_MICROBATCH_MAX_WAIT = 0
+SEMANTIC_SEARCH_MICROBATCH_MAX_SIZE = 32
+SEMANTIC_SEARCH_MICROBATCH_MAX_PENDING = 256
+SEMANTIC_SEARCH_MICROBATCH_TIMEOUT = 5.0
+# Embeddings dels events nous o editats en un fil de fons (en lloc del backfill)
+SEMANTIC_SEARCH_ASYNC_EMBEDDINGS = True
+SEMANTIC_SEARCH_QUEUE_BATCH_SIZE = 32
+SEMANTIC_SEARCH_QUEUE_MAX_WAIT = 0.5
+
+# Assistent
+# Endpoint /api/generate d'Ollama
+ASSISTANT_OLLAMA_URL = 'http://localhost:11434/api/generate'
+# Connexions simultànies màximes del client asíncron compartit (chat_api_async)
+ASSISTANT_OLLAMA_MAX_CONNECTIONS = 256
+
 from django.contrib.messages import constants as messages
 MESSAGE_TAGS = {
     messages.DEBUG: 'debug',
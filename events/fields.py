@@ -0,0 +1,73 @@
+from base64 import b64decode, b64encode
+import numpy as np
+from django.db import models
+
+
+class VectorField(models.BinaryField):
+    """
+    Camp que guarda un vector de floats com a bytes empaquetats.
+
+    A la BD és un binari (BSON binary a MongoDB) de `dim * 4` bytes amb
+    float32, o `dim * 2` amb float16. En llegir-lo es decodifica amb
+    np.frombuffer, que no copia les dades: el valor a Python és un
+    np.ndarray de només lectura en lloc d'una llista de floats.
+
+    Accepta assignar-hi llistes, arrays o bytes. Els valors antics guardats
+    com a llista JSON també es llegeixen (es converteixen a array).
+    """
+
+    DTYPES = {
+        "float32": "<f4",
+        "float16": "<f2",
+    }
+
+    def __init__(self, *args, dtype="float32", **kwargs):
+        if dtype not in self.DTYPES:
+            raise ValueError(f"dtype no suportat: {dtype!r} (float32 o float16)")
+        self.dtype = dtype
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.dtype != "float32":
+            kwargs["dtype"] = self.dtype
+        return name, path, args, kwargs
+
+    # -------------------------
+    # BD → Python
+    # -------------------------
+    def to_vector(self, value):
+        """
+        Converteix el valor guardat en un np.ndarray (o None).
+        """
+        if value is None:
+            return None
+        if isinstance(value, np.ndarray):
+            return value
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return np.frombuffer(value, dtype=self.DTYPES[self.dtype])
+        # Files encara en el format antic (llista de floats)
+        return np.asarray(value, dtype=np.float32)
+
+    def from_db_value(self, value, expression, connection):
+        return self.to_vector(value)
+
+    def to_python(self, value):
+        # Les serialitzacions (fixtures, dumpdata) guarden els bytes en base64
+        if isinstance(value, str):
+            value = b64decode(value.encode("ascii"))
+        return self.to_vector(value)
+
+    # -------------------------
+    # Python → BD
+    # -------------------------
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return bytes(value)
+        return np.asarray(value, dtype=self.DTYPES[self.dtype]).reshape(-1).tobytes()
+
+    def value_to_string(self, obj):
+        value = self.get_prep_value(self.value_from_object(obj))
+        return None if value is None else b64encode(value).decode("ascii")
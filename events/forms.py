@@ -1,7 +1,49 @@
+import logging
 from django import forms
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from .models import Event
+from .signals import near_duplicates_requested
+
+logger = logging.getLogger(__name__)
+
+
+def check_near_duplicates(form, creator, exclude_id=None):
+    """
+    Afegeix un error al formulari si l'event sembla un duplicat d'un altre
+    del mateix creador programat a prop.
+
+    La cerca la fan els receivers del signal near_duplicates_requested
+    (semantic_search). Si un receiver falla, l'error es registra i el
+    formulari es valida igualment: la comprovació mai impedeix publicar.
+
+    L'usuari pot publicar-lo igualment marcant `allow_duplicate`; els
+    duplicats trobats queden a `form.near_duplicates` per a la plantilla.
+    """
+    form.near_duplicates = []
+    data = form.cleaned_data
+    if data.get('allow_duplicate') or form.errors:
+        return
+
+    responses = near_duplicates_requested.send_robust(
+        sender=Event, fields=data, creator=creator,
+        scheduled_date=data.get('scheduled_date'), exclude_id=exclude_id,
+    )
+    for receiver, response in responses:
+        if isinstance(response, Exception):
+            logger.warning("La comprovació de duplicats ha fallat", exc_info=response)
+            continue
+        form.near_duplicates.extend(response or [])
+
+    form.near_duplicates.sort(key=lambda item: item[1], reverse=True)
+
+    if form.near_duplicates:
+        duplicate, _ = form.near_duplicates[0]
+        form.add_error(None, forms.ValidationError(
+            'Sembla un duplicat de «%(title)s» (%(date)s). Si és un esdeveniment diferent, '
+            'marca «Publicar igualment».',
+            params={'title': duplicate.title, 'date': timezone.localtime(duplicate.scheduled_date).strftime('%d/%m/%Y %H:%M')},
+        ))
 
 # ==============================
 # 4.1 EventCreationForm
@@ -15,9 +57,16 @@ class EventCreationForm(forms.ModelForm):
     Inclou validacions personalitzades per assegurar:
       - títols únics per usuari,
       - dates no anteriors al present,
-      - nombre d'espectadors dins dels límits establerts.
+      - nombre d'espectadors dins dels límits establerts,
+      - que no sigui un quasi duplicat d'un altre esdeveniment de l'usuari.
     """
 
+    # Permet publicar un esdeveniment detectat com a possible duplicat
+    allow_duplicate = forms.BooleanField(
+        required=False,
+        label='Publicar igualment'
+    )
+
     class Meta:
         model = Event
         fields = [
@@ -108,6 +157,14 @@ class EventCreationForm(forms.ModelForm):
                 "El nombre màxim d'espectadors ha d'estar entre 1 i 1000."
             )
         return max_viewers
+
+    def clean(self):
+        """
+        Validació: detecta quasi duplicats (mateix creador, dates properes, text similar).
+        """
+        cleaned_data = super().clean()
+        check_near_duplicates(self, self.user)
+        return cleaned_data
     
 
 # ==============================
@@ -120,9 +177,16 @@ class EventUpdateForm(forms.ModelForm):
     
     Inclou validacions per assegurar:
       - només el creador pot canviar l'estat,
-      - la data no es pot modificar si l'esdeveniment ja està en directe.
+      - la data no es pot modificar si l'esdeveniment ja està en directe,
+      - el text o la data nous no el converteixen en un quasi duplicat.
     """
 
+    # Permet desar un esdeveniment detectat com a possible duplicat
+    allow_duplicate = forms.BooleanField(
+        required=False,
+        label='Publicar igualment'
+    )
+
     class Meta:
         model = Event
         fields = [
@@ -205,6 +269,17 @@ class EventUpdateForm(forms.ModelForm):
                 "No es pot canviar la data d'un esdeveniment que ja està en directe."
             )
         return scheduled_date
+
+    def clean(self):
+        """
+        Validació: si canvien el text o la data, detecta quasi duplicats.
+        """
+        cleaned_data = super().clean()
+        self.near_duplicates = []
+        watched = {'title', 'description', 'category', 'tags', 'scheduled_date'}
+        if watched & set(self.changed_data):
+            check_near_duplicates(self, self.instance.creator, exclude_id=self.instance.pk)
+        return cleaned_data
     
 
 # ==============================
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.8 on 2026-10-17 07:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0002_auto_20260319_1931'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='embedding_text_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='embedding_stale',
+            field=models.BooleanField(default=True),
+        ),
+    ]
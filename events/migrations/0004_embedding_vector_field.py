@@ -0,0 +1,19 @@
+# Generated by Django 3.2.8 on 2026-10-17 07:52
+
+from django.db import migrations
+import events.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0003_embedding_text_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='embedding_vector',
+            field=events.fields.VectorField(blank=True, null=True),
+        ),
+    ]
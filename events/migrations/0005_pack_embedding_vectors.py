@@ -0,0 +1,66 @@
+# Generated by Django 3.2.8 on 2026-10-17 07:53
+
+from django.db import DatabaseError, migrations, transaction
+import events.fields
+
+# Files convertides per cada escriptura massiva
+BATCH_SIZE = 500
+
+
+def _save(Event, batch, field):
+    try:
+        with transaction.atomic():
+            Event.objects.bulk_update(batch, [field], batch_size=len(batch))
+    except DatabaseError:
+        for e in batch:
+            e.save(update_fields=[field])
+
+
+def _convert(apps, source, target):
+    """
+    Copia els embeddings de `source` a `target` per batches.
+
+    El camp de destí s'encarrega de codificar-los (bytes empaquetats o
+    llista JSON de floats).
+    """
+    Event = apps.get_model("events", "Event")
+    is_vector = isinstance(Event._meta.get_field(target), events.fields.VectorField)
+
+    batch = []
+    for e in Event.objects.only("id", source).order_by("id").iterator():
+        value = getattr(e, source)
+        if value is None or len(value) == 0:
+            continue
+
+        if not is_vector:
+            value = [float(x) for x in value]
+        setattr(e, target, value)
+        batch.append(e)
+
+        if len(batch) >= BATCH_SIZE:
+            _save(Event, batch, target)
+            batch = []
+
+    if batch:
+        _save(Event, batch, target)
+
+
+def pack_embeddings(apps, schema_editor):
+    _convert(apps, "embedding", "embedding_vector")
+
+
+def unpack_embeddings(apps, schema_editor):
+    _convert(apps, "embedding_vector", "embedding")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0004_embedding_vector_field'),
+    ]
+
+    # Només dades: si la conversió falla a mitges, les dues columnes
+    # continuen existint i la migració es pot tornar a executar
+    operations = [
+        migrations.RunPython(pack_embeddings, unpack_embeddings),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.2.8 on 2026-10-17 07:54
+
+from django.db import migrations
+import events.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0005_pack_embedding_vectors'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='event',
+            name='embedding',
+        ),
+        # La columna nova conserva el nom `embedding_vector`: djongo no suporta
+        # bé RenameField, així que el canvi de nom només es fa a l'estat del model
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RenameField(
+                    model_name='event',
+                    old_name='embedding_vector',
+                    new_name='embedding',
+                ),
+                migrations.AlterField(
+                    model_name='event',
+                    name='embedding',
+                    field=events.fields.VectorField(blank=True, db_column='embedding_vector', null=True),
+                ),
+            ],
+        ),
+    ]
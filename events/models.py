@@ -3,7 +3,47 @@ from django.conf import settings
 from django.urls import reverse
 from urllib.parse import urlparse, parse_qs
 
-from django.db.models import JSONField
+from .fields import VectorField
+
+
+class EventQuerySet(models.QuerySet):
+    """
+    QuerySet d'Event amb suport per tornar a incloure l'embedding.
+    """
+
+    # Columnes de vectors, diferides per defecte
+    VECTOR_FIELDS = frozenset({"embedding", "embedding_chunks"})
+
+    def with_embedding(self):
+        """
+        Inclou les columnes `embedding` i `embedding_chunks` (diferides per defecte).
+
+        Només les necessita el codi de cerca semàntica; la resta de vistes
+        no llegeixen ni decodifiquen els vectors de cada fila.
+        """
+        clone = self._chain()
+        names, defer = clone.query.deferred_loading
+        if defer:
+            # Mode defer(): es treuen els vectors dels camps diferits
+            clone.query.deferred_loading = (frozenset(names) - self.VECTOR_FIELDS, True)
+        elif names:
+            # Mode only(): s'afegeixen els vectors als camps carregats
+            clone.query.deferred_loading = (frozenset(names) | self.VECTOR_FIELDS, False)
+        return clone
+
+
+class EventManager(models.Manager.from_queryset(EventQuerySet)):
+    """
+    Manager per defecte d'Event: difereix els vectors (l'embedding i els
+    dels fragments) a totes les consultes.
+
+    Les llistes, el detall, els formularis i les relacions (user.events)
+    no carreguen els vectors; la cerca el demana amb with_embedding() o
+    el llegeix amb values_list().
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().defer(*EventQuerySet.VECTOR_FIELDS)
 
 
 class Event(models.Model):
@@ -97,9 +137,24 @@ class Event(models.Model):
     )
 
     # Camps d'embedding
-    embedding = JSONField(blank=True, null=True)
+    # Vector float32 empaquetat en binari (no una llista JSON de floats); la
+    # columna es diu `embedding_vector` perquè la migració 0004 no la reanomena
+    embedding = VectorField(db_column="embedding_vector", blank=True, null=True)
+    # Vectors dels fragments 2..n dels events amb text llarg, concatenats
+    # (el primer fragment és `embedding`); nul si el text cap en un de sol
+    embedding_chunks = VectorField(blank=True, null=True)
     embedding_model = models.CharField(max_length=200, blank=True, null=True)
     embedding_updated_at = models.DateTimeField(blank=True, null=True)
+    # Hash del text a partir del qual s'ha calculat l'embedding
+    embedding_text_hash = models.CharField(max_length=64, blank=True, null=True)
+    # Marca que el text o el model han canviat i cal tornar a embedir
+    embedding_stale = models.BooleanField(default=True)
+
+    # -------------------------
+    # Manager
+    # -------------------------
+    # Difereix l'embedding per defecte (vegeu EventManager)
+    objects = EventManager()
 
     # -------------------------
     # Configuració
@@ -0,0 +1,14 @@
+# events > signals.py
+
+from django.dispatch import Signal
+
+# Es dispara en validar un formulari d'event per buscar-ne possibles duplicats
+# (vegeu forms.check_near_duplicates). Arguments: fields, creator,
+# scheduled_date i exclude_id. Cada receiver retorna [(Event, score), ...].
+# Així l'app events no depèn de qui fa la comprovació (semantic_search).
+near_duplicates_requested = Signal()
+
+# Es dispara en mostrar el detall d'un event per obtenir-ne els events
+# similars (vegeu views.event_detail_view). Argument: event. Cada receiver
+# retorna una llista d'Event, de més a menys similar.
+related_events_requested = Signal()
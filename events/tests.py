@@ -1,3 +1,108 @@
-from django.test import TestCase
+from datetime import timedelta
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from .models import Event
+from .signals import related_events_requested
 
-# Create your tests here.
+
+def _event(creator, title: str, **fields) -> Event:
+    defaults = {
+        "description": "Descripció de prova",
+        "category": "music",
+        "status": "scheduled",
+        "scheduled_date": timezone.now() + timedelta(days=7),
+    }
+    defaults.update(fields)
+    return Event.objects.create(title=title, creator=creator, **defaults)
+
+
+@override_settings(SEMANTIC_SEARCH_ASYNC_EMBEDDINGS=False)
+class EventDetailRelatedTests(TestCase):
+    """
+    Events similars a la pàgina de detall (signal related_events_requested).
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("creador", password="x")
+        self.event = _event(self.user, "Concert de jazz")
+        self.similar = _event(self.user, "Nit de jazz al port")
+
+    def _connect(self, receiver):
+        related_events_requested.connect(receiver, sender=Event)
+        self.addCleanup(related_events_requested.disconnect, receiver, sender=Event)
+
+    def test_shows_events_from_receivers(self):
+        self._connect(lambda sender, event, **kwargs: [self.similar] if event.pk == self.event.pk else [])
+
+        response = self.client.get(reverse("events:event_detail", args=[self.event.pk]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["related_events"], [self.similar])
+        self.assertContains(response, "Nit de jazz al port")
+
+    def test_failing_receiver_does_not_break_the_page(self):
+        def broken(sender, event, **kwargs):
+            raise RuntimeError("índex no disponible")
+
+        self._connect(broken)
+
+        with self.assertLogs("events.views", level="WARNING"):
+            response = self.client.get(reverse("events:event_detail", args=[self.event.pk]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["related_events"], [])
+
+
+class EmbeddingVectorMigrationTests(TransactionTestCase):
+    """
+    Migracions 0004–0006: embeddings de llista JSON a bytes empaquetats, i tornada enrere.
+    """
+
+    before = [("events", "0003_embedding_text_hash")]
+    after = [("events", "0006_remove_embedding_json")]
+
+    def setUp(self):
+        self.executor = MigrationExecutor(connection)
+        self.addCleanup(self._migrate, self.executor.loader.graph.leaf_nodes())
+
+    def _migrate(self, targets):
+        """
+        Aplica o desfà migracions fins a `targets` i retorna l'estat dels models.
+        """
+        self.executor.loader.build_graph()
+        self.executor.migrate(targets)
+        return self.executor.loader.project_state(targets).apps
+
+    def _create(self, apps, **fields):
+        User = apps.get_model(settings.AUTH_USER_MODEL)
+        Event = apps.get_model("events", "Event")
+        creator, _ = User.objects.get_or_create(username="creador")
+        return Event.objects.create(
+            title="Concert", description="Jazz", creator=creator, category="music",
+            status="scheduled", scheduled_date=timezone.now(), **fields
+        )
+
+    def test_forward_and_back(self):
+        apps = self._migrate(self.before)
+        values = [0.25, -1.5, 3.0]
+        with_vector = self._create(apps, embedding=values)
+        without_vector = self._create(apps, embedding=None)
+
+        apps = self._migrate(self.after)
+        Event = apps.get_model("events", "Event")
+        packed = Event.objects.get(pk=with_vector.pk).embedding
+        self.assertIsInstance(packed, np.ndarray)
+        self.assertEqual(packed.dtype, np.float32)
+        np.testing.assert_array_equal(packed, values)
+        self.assertIsNone(Event.objects.get(pk=without_vector.pk).embedding)
+
+        apps = self._migrate(self.before)
+        Event = apps.get_model("events", "Event")
+        self.assertEqual(Event.objects.get(pk=with_vector.pk).embedding, values)
+        self.assertIsNone(Event.objects.get(pk=without_vector.pk).embedding)
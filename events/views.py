@@ -1,3 +1,4 @@
+import logging
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
@@ -5,8 +6,29 @@ from django.core.paginator import Paginator
 from django.http import Http404
 from .models import Event
 from .forms import EventCreationForm, EventUpdateForm, EventSearchForm
+from .signals import related_events_requested
 from xaty.forms import ChatMessageForm
 
+logger = logging.getLogger(__name__)
+
+
+def related_events(event):
+    """
+    Events similars a un event, per a la pàgina de detall.
+
+    Els calculen els receivers del signal related_events_requested
+    (semantic_search); si no n'hi ha cap o un falla, la llista queda buida
+    i la pàgina es mostra igualment.
+    """
+    related = []
+    responses = related_events_requested.send_robust(sender=Event, event=event)
+    for receiver, response in responses:
+        if isinstance(response, Exception):
+            logger.warning("No s'han pogut obtenir els events similars", exc_info=response)
+            continue
+        related.extend(response or [])
+    return related
+
 # ===========================================
 # 5.1 Vista de Llistat d'Esdeveniments
 # ===========================================
@@ -82,13 +104,15 @@ def event_detail_view(request, pk):
     Mostra informació completa d'un esdeveniment.
     Verifica si l'usuari és el creador per mostrar opcions d'edició.
     Gestiona esdeveniments no trobats amb 404.
+    Mostra els esdeveniments similars (signal related_events_requested).
     """
     event = get_object_or_404(Event, pk=pk)
     is_creator = request.user == event.creator
     context = {
         'event': event,
         'is_creator': is_creator,
-        'chat_form': ChatMessageForm()   # ← afegit
+        'chat_form': ChatMessageForm(),   # ← afegit
+        'related_events': related_events(event),
     }
     return render(
         request,
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class SemanticSearchConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'semantic_search'
+
+    def ready(self):
+        # Registra els signals que mantenen l'índex vectorial actualitzat
+        from . import signals  # noqa: F401
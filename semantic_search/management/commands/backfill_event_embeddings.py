@@ -1,8 +1,38 @@
-from django.core.management.base import BaseCommand
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from itertools import islice
+from pathlib import Path
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
 from django.utils import timezone
 from events.models import Event
-from semantic_search.services.embeddings import embed_text, model_name
-from semantic_search.views import _event_text
+from semantic_search.services.chunking import embed_chunks, split_events
+from semantic_search.services.embeddings import model_name
+from semantic_search.services.pool import encode_batch, init_worker
+from semantic_search.services.storage import save_embeddings
+from semantic_search.services.text import event_text
+from semantic_search.services.versions import activate_model, model_coverage, pending_event_ids
+
+# Columnes necessàries per construir el text de l'event
+TEXT_FIELDS = ["id", "title", "description", "category", "tags"]
+
+
+def _parse_shard(value: str):
+    """
+    Converteix "i/N" en (i, N) validant-ne el rang.
+    """
+    try:
+        index, count = (int(p) for p in value.split("/"))
+    except ValueError:
+        raise CommandError("--shard ha de tenir el format i/N (p.ex. 0/4).")
+    if count < 1 or not 0 <= index < count:
+        raise CommandError("--shard fora de rang: cal 0 <= i < N.")
+    return index, count
 
 
 class Command(BaseCommand):
@@ -10,11 +40,33 @@ class Command(BaseCommand):
     Comanda de gestió per generar i desar embeddings per a Events.
 
     Funciona com a script independent, executat amb:
-        python manage.py <nom_comanda> [--force] [--limit N]
+        python manage.py <nom_comanda> [--force | --stale-only] [--limit N] [--batch-size N]
+            [--workers N] [--shard i/N] [--reset]
+        python manage.py <nom_comanda> --model NOM [--activate]
 
     Opcions:
     --force : recalcula embeddings encara que ja existeixin
-    --limit : limita el nombre d'events processats (0 = tots)
+    --stale-only : només els events marcats com a obsolets (text o model canviats)
+    --limit : limita el nombre d'events processats (0 = tots); si en queden
+              per processar, el checkpoint es conserva per a la pròxima execució
+    --batch-size : events que s'embedeixen i s'escriuen de cop
+    --workers : processos que embedeixen en paral·lel (cadascun carrega el model)
+    --shard : processa només els events amb id % N == i (repartiment entre màquines)
+    --checkpoint : fitxer on es desa l'últim pk processat
+    --reset : ignora el checkpoint existent i comença de zero
+    --snapshot : en acabar, publica un snapshot en disc per als workers
+    --model : model a omplir (per defecte, l'actiu). Si no és l'actiu, els
+              vectors només es desen com a EventEmbedding (índex en ombra) i
+              el model actiu continua servint les cerques
+    --activate : amb --model, activa el model si la cobertura arriba al 100%
+
+    Si l'execució s'interromp, la següent continua a partir de l'últim
+    batch desat (checkpoint), en lloc de tornar a recórrer tota la taula.
+
+    Els events amb text més llarg que el model es divideixen en fragments
+    (un vector per fragment). Els fragments de tot el batch s'embedeixen
+    ordenats per longitud, de manera que cada crida al model agrupa textos
+    de mida semblant i gairebé no hi ha padding.
     """
 
     help = "Genera i desa embeddings per a Events."
@@ -28,53 +80,326 @@ class Command(BaseCommand):
             action="store_true",
             help="Recalcula encara que ja hi hagi embedding"
         )
+        parser.add_argument(
+            "--stale-only",
+            action="store_true",
+            help="Només els events amb el text o el model canviats"
+        )
         parser.add_argument(
             "--limit",
             type=int,
             default=0,
             help="Limita el nombre d'events (0 = tots)"
         )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=64,
+            help="Nombre d'events per batch (encode + escriptura)"
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Processos que embedeixen en paral·lel"
+        )
+        parser.add_argument(
+            "--shard",
+            default="0/1",
+            help="Fragment a processar, en format i/N"
+        )
+        parser.add_argument(
+            "--checkpoint",
+            default=None,
+            help="Fitxer de checkpoint (per defecte a SEMANTIC_SEARCH_CHECKPOINT_DIR)"
+        )
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Ignora el checkpoint i comença de zero"
+        )
+        parser.add_argument(
+            "--snapshot",
+            action="store_true",
+            help="Genera el snapshot d'embeddings en acabar"
+        )
+        parser.add_argument(
+            "--model",
+            default=None,
+            help="Model a omplir (per defecte, l'actiu)"
+        )
+        parser.add_argument(
+            "--activate",
+            action="store_true",
+            help="Activa el model de --model quan tots els events el tenen"
+        )
+
+    # -------------------------
+    # Checkpoint
+    # -------------------------
+    def _checkpoint_path(self, options, shard):
+        if options["checkpoint"]:
+            return Path(options["checkpoint"])
+        directory = getattr(settings, "SEMANTIC_SEARCH_CHECKPOINT_DIR", None)
+        if not directory:
+            return None
+        index, count = shard
+        return Path(directory) / f"backfill-{index}-of-{count}.json"
+
+    def _read_checkpoint(self, path, mode):
+        """
+        Retorna l'últim pk processat o None si no hi ha checkpoint vàlid.
+
+        Un checkpoint d'un altre model o d'un altre mode (--force, --stale-only)
+        no es reutilitza.
+        """
+        if path is None:
+            return None
+        try:
+            with open(path, encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        if data.get("model") != self.model or data.get("mode") != mode:
+            return None
+        return data.get("last_pk")
+
+    def _write_checkpoint(self, path, last_pk, mode, total):
+        if path is None:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({
+                "model": self.model,
+                "mode": mode,
+                "last_pk": last_pk,
+                "processed": total,
+                "updated_at": timezone.now().isoformat(),
+            }, fh)
+        os.replace(tmp, path)
+
+    # -------------------------
+    # Lectura i escriptura
+    # -------------------------
+    def _iter_batches(self, ids: list[int], batch_size: int, force: bool):
+        """
+        Genera batches [(event, text), ...] a partir d'una llista d'ids.
+
+        Cada batch es carrega amb una sola consulta i només amb les columnes
+        necessàries. Cada element del generador és (batch, últim pk llegit).
+        """
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start:start + batch_size]
+            events = Event.objects.only(*TEXT_FIELDS)
+            if not force:
+                # Cal l'embedding per saltar els events que ja en tenen
+                events = events.with_embedding()
+            events = events.filter(id__in=chunk).order_by("id")
+
+            batch = []
+            for e in events:
+                if not force and e.embedding is not None and len(e.embedding):
+                    continue
+                # Text agregat de l'event (title + description + category + tags)
+                text = event_text(e)
+                if text:
+                    batch.append((e, text))
+
+            yield batch, chunk[-1]
 
     def handle(self, *args, **options):
         """
         Lògica principal de la comanda:
-        1. Obté events segons filtres.
-        2. Genera embeddings amb el model carregat.
-        3. Desa embeddings i metadades a la BD.
+        1. Selecciona els ids del shard, a partir del checkpoint si n'hi ha.
+        2. Llegeix els events per batches amb només les columnes necessàries.
+        3. Fragmenta i embedeix cada batch (en paral·lel si --workers > 1).
+        4. Desa cada batch amb bulk_update, en ordre, i actualitza el checkpoint.
+        5. Amb --model, mostra la cobertura i, amb --activate, canvia de model.
         """
 
         force = options["force"]
+        stale_only = options["stale_only"]
+        if force and stale_only:
+            raise CommandError("--force i --stale-only són incompatibles.")
+
+        # El model es fixa un cop per a tota l'execució
+        self.model = options["model"] or model_name()
+        shadow = self.model != model_name()
+        if options["activate"] and not options["model"]:
+            raise CommandError("--activate requereix --model.")
+        if shadow and stale_only:
+            raise CommandError("--stale-only només s'aplica al model actiu.")
+        if shadow:
+            self.stdout.write(f"Omplint el model {self.model} en ombra (actiu: {model_name()})")
+        mode = "force" if force else "stale" if stale_only else "missing"
         limit = options["limit"]
+        batch_size = max(1, options["batch_size"])
+        workers = max(1, options["workers"])
+        shard = _parse_shard(options["shard"])
+
+        checkpoint = self._checkpoint_path(options, shard)
+        last_pk = None if options["reset"] else self._read_checkpoint(checkpoint, mode)
+
+        # Selecció dels ids a processar (només la columna id)
+        qs = Event.objects.order_by("id")
+        if last_pk is not None:
+            qs = qs.filter(id__gt=last_pk)
+            self.stdout.write(f"Reprenent des del pk {last_pk} (checkpoint {checkpoint})")
+
+        index, count = shard
+        ids = (pk for pk in qs.values_list("id", flat=True).iterator() if pk % count == index)
+
+        if shadow and not force:
+            # Events sense vector del model nou, o amb un vector d'un text antic
+            pending = pending_event_ids(self.model)
+            ids = (
+                pk for pk in pending
+                if pk % count == index and (last_pk is None or pk > last_pk)
+            )
 
-        # Query inicial: tots els events ordenats per data de creació
-        qs = Event.objects.all()
+        if stale_only:
+            # Es filtra a Python: djongo no tradueix bé els filtres amb NOT
+            current = model_name()
+            rows = qs.values_list("id", "embedding_stale", "embedding_model").iterator()
+            ids = (
+                pk for pk, stale, model in rows
+                if pk % count == index and (stale or model != current)
+            )
 
-        # Aplica límit si s'ha passat com a opció
+        # Aplica límit si s'ha passat com a opció (un id de més indica si en queden)
         if limit and limit > 0:
-            qs = qs[:limit]
+            ids = list(islice(ids, limit + 1))
+            partial = len(ids) > limit
+            ids = ids[:limit]
+        else:
+            ids = list(ids)
+            partial = False
 
         total = 0  # Comptador d'embeddings generats
+        self.fragments = 0  # Fragments embedits (>= events si n'hi ha de llargs)
+        started = time.perf_counter()
+        batches = self._iter_batches(ids, batch_size, force or stale_only or shadow)
 
-        for e in qs:
-            if not force and e.embedding:
-                continue
-            # Text agregat de l'event (title + description + category + tags)
-            text = _event_text(e)
-            if not text:
-                # Si el text és buit, ignora l'event
-                continue
+        if workers == 1:
+            for batch, batch_last_pk in batches:
+                chunk_lists = split_events([e for e, _ in batch], self.model)
+                self.fragments += sum(len(chunks) for chunks in chunk_lists)
+                vecs = embed_chunks(chunk_lists, batch_size=batch_size, model=self.model)
+                total += len(save_embeddings(batch, vecs, model=self.model))
+                self._write_checkpoint(checkpoint, batch_last_pk, mode, total)
+                self._progress(total, started)
+        else:
+            total = self._run_pool(batches, workers, batch_size, checkpoint, mode, started)
 
-            # Genera embedding
-            vec = embed_text(text)
-            # Desa embedding i informació del model
-            e.embedding = vec
-            e.embedding_model = model_name()
-            e.embedding_updated_at = timezone.now()
+        # S'ha recorregut tot el rang d'ids: el checkpoint ja no és necessari.
+        # Amb --limit i events pendents es conserva perquè la pròxima execució continuï.
+        if checkpoint is not None and checkpoint.exists():
+            if partial:
+                self.stdout.write(f"Límit assolit: la pròxima execució continuarà des de {checkpoint}")
+            else:
+                checkpoint.unlink()
 
-            # Desa només els camps modificats (més eficient)
-            e.save(update_fields=["embedding", "embedding_model", "embedding_updated_at"])
+        # Mostra resultat per consola
+        elapsed = time.perf_counter() - started
+        rate = total / elapsed if elapsed else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f"Embeddings generats: {total} en {self.fragments} fragments "
+            f"({elapsed:.1f}s, {rate:.1f} events/s)"
+        ))
 
-            total += 1
+        if options["model"]:
+            self._report_coverage()
 
-        # Mostra resultat per consola
-        self.stdout.write(self.style.SUCCESS(f"Embeddings generats: {total}"))
\ No newline at end of file
+        if options["activate"]:
+            self._activate()
+
+        # Publica el snapshot que compartiran tots els workers
+        if options["snapshot"]:
+            call_command("build_embedding_snapshot", stdout=self.stdout)
+
+    def _report_coverage(self):
+        """
+        Mostra la cobertura de cada model (events amb vector / total).
+        """
+        for stats in model_coverage():
+            marker = "*" if stats["active"] else " "
+            self.stdout.write(
+                f" {marker} {stats['model']}: {stats['embedded']}/{stats['events']} "
+                f"({stats['coverage']:.1%})"
+            )
+
+    def _activate(self):
+        """
+        Activa el model si tots els events en tenen un vector al dia.
+        """
+        if self.model == model_name():
+            self.stdout.write(f"El model {self.model} ja és l'actiu.")
+            return
+
+        pending = pending_event_ids(self.model)
+        if pending:
+            self.stdout.write(self.style.WARNING(
+                f"No s'activa {self.model}: {len(pending)} events sense vector al dia "
+                "(torna a executar la comanda)."
+            ))
+            return
+
+        result = activate_model(self.model)
+        snapshot_note = f", snapshot {result['snapshot']}" if result["snapshot"] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"Model actiu: {result['model']} (abans {result['previous']}{snapshot_note}; "
+            f"{result['copied']} vectors copiats a Event.embedding, "
+            f"{result['caught_up']} events embedits després del canvi)"
+        ))
+
+    def _run_pool(self, batches, workers, batch_size, checkpoint, mode, started) -> int:
+        """
+        Embedeix els batches en un pool de processos.
+
+        El procés principal llegeix i escriu la BD i fragmenta els textos; els
+        workers només executen el model. Es mantenen com a molt 2·workers batches en vol per limitar
+        la memòria, i els resultats es desen en ordre perquè el checkpoint
+        (últim pk desat) sigui sempre correcte.
+        """
+        # Les connexions obertes no s'han de compartir amb els processos fills
+        connections.close_all()
+
+        # Els fills configuren Django ells mateixos (necessari amb spawn: Windows, macOS)
+        initargs = (self.model, settings.SETTINGS_MODULE)
+
+        total = 0
+        pending = deque()
+
+        with multiprocessing.Pool(workers, initializer=init_worker, initargs=initargs) as pool:
+            for batch, batch_last_pk in batches:
+                chunk_lists = split_events([e for e, _ in batch], self.model)
+                self.fragments += sum(len(chunks) for chunks in chunk_lists)
+                job = pool.apply_async(encode_batch, ((chunk_lists, batch_size, self.model),))
+                pending.append((batch, batch_last_pk, job))
+
+                while len(pending) >= 2 * workers:
+                    total += self._drain_one(pending, checkpoint, mode, total, started)
+
+            while pending:
+                total += self._drain_one(pending, checkpoint, mode, total, started)
+
+        return total
+
+    def _drain_one(self, pending, checkpoint, mode, total, started) -> int:
+        """
+        Espera el batch més antic en vol, el desa i actualitza el checkpoint.
+        """
+        batch, batch_last_pk, result = pending.popleft()
+        saved = len(save_embeddings(batch, result.get(), model=self.model))
+        self._write_checkpoint(checkpoint, batch_last_pk, mode, total + saved)
+        self._progress(total + saved, started)
+        return saved
+
+    def _progress(self, total: int, started: float):
+        """
+        Mostra el progrés acumulat i el throughput.
+        """
+        elapsed = time.perf_counter() - started
+        rate = total / elapsed if elapsed else 0.0
+        self.stdout.write(f"  {total} events · {rate:.1f} events/s")
@@ -0,0 +1,171 @@
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from semantic_search.services.ann import IVFIndex
+from semantic_search.services.benchmarks import (
+    latency_summary,
+    noisy_queries,
+    recall_at_k,
+    synthetic_embeddings,
+    timed,
+)
+from semantic_search.services.index import get_index
+from semantic_search.services.ranker import top_k_indices
+
+
+class Command(BaseCommand):
+    """
+    Benchmark de recall@k i latència de l'índex IVF contra la cerca exacta.
+
+    Funciona com a script independent, executat amb:
+        python manage.py benchmark_ann [--source index|synthetic] [--nprobe 1,4,16]
+
+    Serveix per triar SEMANTIC_SEARCH_IVF_NLIST i SEMANTIC_SEARCH_IVF_NPROBE
+    a partir de dades i no a ull.
+
+    Amb --source index (per defecte) es mesura la cerca real de l'índex del
+    procés: les llistes IVF s'entrenen amb la base, els events esborrats
+    (tombstones) queden fora i les files del segment delta es puntuen
+    exactament, igual que a producció. Les queries són files vives de
+    l'índex amb soroll. Si l'índex és buit, es fan servir vectors sintètics.
+
+    Els vectors sintètics per defecte (pocs temes amples i queries amb
+    força soroll) no se separen trivialment: el recall depèn de nprobe.
+
+    Opcions:
+    --source  : "index" (embeddings reals) o "synthetic" (sense BD ni model)
+    --rows    : nombre de vectors sintètics
+    --dim     : dimensió dels vectors sintètics
+    --clusters: nombre de temes dels vectors sintètics
+    --noise   : soroll afegit a les queries (0 = la mateixa fila)
+    --queries : nombre de queries
+    --k       : mida del top-k
+    --nlist   : nombre de llistes IVF (0 = automàtic)
+    --nprobe  : llista de valors de nprobe a provar (separats per comes)
+    """
+
+    help = "Compara recall@k i latència de la cerca IVF amb la cerca exacta."
+
+    def add_arguments(self, parser):
+        """
+        Defineix arguments opcionals per la comanda.
+        """
+        parser.add_argument("--source", choices=["synthetic", "index"], default="index")
+        parser.add_argument("--rows", type=int, default=200000)
+        parser.add_argument("--dim", type=int, default=384)
+        parser.add_argument("--clusters", type=int, default=64)
+        parser.add_argument("--noise", type=float, default=1.5)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--k", type=int, default=20)
+        parser.add_argument("--nlist", type=int, default=0)
+        parser.add_argument("--nprobe", default="1,2,4,8,16,32,64")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def _synthetic(self, options):
+        """
+        Funcions de cerca (exacta i IVF) sobre una matriu sintètica.
+        """
+        matrix = synthetic_embeddings(
+            options["rows"], options["dim"], options["clusters"], options["seed"]
+        )
+        ann, train_seconds = timed(IVFIndex.train, matrix, nlist=options["nlist"], seed=options["seed"])
+
+        def exact(q, k):
+            return top_k_indices(matrix @ q, k)
+
+        def approx(q, k, nprobe):
+            return ann.search(matrix, q, k, nprobe)[0]
+
+        return matrix, ann, train_seconds, exact, approx
+
+    def _from_index(self, index, options):
+        """
+        Funcions de cerca (exacta i IVF) amb EmbeddingIndex.search: base amb
+        tombstones, segment delta i fragments, com a producció.
+        """
+        with index._lock:
+            parts = [np.asarray(index._base_matrix[index._base_alive], dtype=np.float32)]
+            if index._delta is not None and index._delta.size:
+                parts.append(index._delta.matrix[:index._delta.size].copy())
+        live = np.concatenate(parts)
+
+        ann, train_seconds = timed(
+            IVFIndex.train, np.asarray(index._base_matrix, dtype=np.float32),
+            nlist=options["nlist"], seed=options["seed"],
+        )
+        saved = index._ann, index._quant
+
+        def ids(hits):
+            return [event_id for event_id, _ in hits]
+
+        def exact(q, k):
+            index._ann, index._quant = None, None
+            try:
+                return ids(index.search(q, k))
+            finally:
+                index._ann, index._quant = saved
+
+        def approx(q, k, nprobe):
+            index._ann = ann
+            try:
+                with override_settings(SEMANTIC_SEARCH_IVF_NPROBE=nprobe):
+                    return ids(index.search(q, k))
+            finally:
+                index._ann = saved[0]
+
+        return live, ann, train_seconds, exact, approx
+
+    def handle(self, *args, **options):
+        """
+        Lògica principal de la comanda:
+        1. Prepara les dades (índex del procés o vectors sintètics) i les queries.
+        2. Calcula la veritat exacta (força bruta) i la seva latència.
+        3. Entrena l'IVF i mesura recall@k i latència per a cada nprobe.
+        """
+        k = options["k"]
+
+        source = options["source"]
+        index = get_index() if source == "index" else None
+        if index is not None and (index._base_matrix is None or index._base_live == 0):
+            self.stdout.write(self.style.WARNING("L'índex no té embeddings: es fan servir vectors sintètics."))
+            source = "synthetic"
+
+        if source == "index":
+            matrix, ann, train_seconds, exact_search, ann_search = self._from_index(index, options)
+        else:
+            matrix, ann, train_seconds, exact_search, ann_search = self._synthetic(options)
+
+        queries = noisy_queries(matrix, options["queries"], noise=options["noise"], seed=options["seed"] + 1)
+
+        # Cerca exacta: referència de recall i de latència
+        exact, exact_times = [], []
+        for q in queries:
+            top, seconds = timed(exact_search, q, k)
+            exact.append(top)
+            exact_times.append(seconds)
+        exact_lat = latency_summary(exact_times)
+
+        self.stdout.write(
+            f"Font: {source}  files: {matrix.shape[0]}  dim: {matrix.shape[1]}  nlist: {ann.nlist}  "
+            f"entrenament: {train_seconds:.2f}s"
+        )
+        self.stdout.write(
+            f"{'engine':<12}{'recall@' + str(k):>12}{'p50 ms':>10}{'p95 ms':>10}{'speedup':>10}"
+        )
+        self.stdout.write(
+            f"{'exact':<12}{1.0:>12.3f}{exact_lat['p50']:>10.2f}{exact_lat['p95']:>10.2f}{1.0:>10.1f}"
+        )
+
+        for nprobe in [int(p) for p in options["nprobe"].split(",") if p.strip()]:
+            recalls, times = [], []
+            for q, expected in zip(queries, exact):
+                found, seconds = timed(ann_search, q, k, nprobe)
+                recalls.append(recall_at_k(found, expected))
+                times.append(seconds)
+
+            lat = latency_summary(times)
+            speedup = exact_lat["p50"] / lat["p50"] if lat["p50"] else 0.0
+            self.stdout.write(
+                f"{'ivf/' + str(nprobe):<12}{np.mean(recalls):>12.3f}"
+                f"{lat['p50']:>10.2f}{lat['p95']:>10.2f}{speedup:>10.1f}"
+            )
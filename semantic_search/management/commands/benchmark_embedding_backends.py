@@ -0,0 +1,142 @@
+import multiprocessing
+import time
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from semantic_search.services.backends import BACKENDS
+from semantic_search.services.benchmarks import latency_summary, timed
+
+# Vocabulari per generar textos sintètics semblants a títols i descripcions
+_WORDS = (
+    "concert jazz directe música festival rock entrevista xerrada tecnologia "
+    "programació python partit futbol bàsquet esports torneig videojocs gaming "
+    "art pintura taller educació classe història ciència podcast humor cinema "
+    "estrena comunitat barcelona girona valència nit cap setmana dissabte gratuït"
+).split()
+
+
+def synthetic_texts(count: int, seed: int = 0) -> list[str]:
+    """
+    Genera textos curts reproduïbles (5-15 paraules) per als benchmarks.
+    """
+    rng = np.random.default_rng(seed)
+    return [
+        " ".join(rng.choice(_WORDS, size=int(rng.integers(5, 16))))
+        for _ in range(count)
+    ]
+
+
+def _rss_mb() -> float:
+    """
+    Memòria resident actual del procés en MB (Linux), o el pic si no hi ha /proc.
+    """
+    try:
+        with open("/proc/self/status", encoding="ascii") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure_backend(kind, options):
+    """
+    S'executa en un procés nou per backend, perquè la memòria i el temps
+    d'importació de cadascun no contaminin els altres.
+    """
+    from semantic_search.services.backends import create_backend
+
+    result = {"backend": kind}
+    try:
+        rss_start = _rss_mb()
+        started = time.perf_counter()
+        backend = create_backend(
+            kind, options["model"], onnx_dir=options["onnx_dir"],
+            onnx_quantized=options["quantized"],
+        ).load()
+        result["load_s"] = time.perf_counter() - started
+
+        queries = synthetic_texts(options["queries"], seed=1)
+        backend.encode(queries[:4])  # escalfament
+
+        times = [timed(backend.encode, [q])[1] for q in queries]
+        result["latency"] = latency_summary(times)
+
+        batch = synthetic_texts(options["batch_texts"], seed=2)
+        _, seconds = timed(backend.encode, batch, batch_size=64)
+        result["throughput"] = len(batch) / seconds if seconds else 0.0
+
+        result["rss_mb"] = _rss_mb()
+        result["rss_delta_mb"] = result["rss_mb"] - rss_start
+    except Exception as exc:  # backend no instal·lat o model absent
+        result["error"] = f"{type(exc).__name__}: {exc}"
+
+    return result
+
+
+class Command(BaseCommand):
+    """
+    Benchmark de latència per query i memòria resident dels backends d'embeddings.
+
+    Funciona com a script independent, executat amb:
+        python manage.py benchmark_embedding_backends [--backends hashing,onnx] [--quantized]
+
+    Cada backend es mesura en un procés nou (spawn): temps de càrrega
+    (importació + model), latència d'una query (p50/p95), throughput en
+    batch i memòria resident (RSS) un cop carregat.
+
+    Opcions:
+    --backends    : backends a comparar (separats per comes)
+    --queries     : nombre de queries individuals
+    --batch-texts : textos del test de throughput
+    --quantized   : usa el model ONNX int8
+    """
+
+    help = "Compara latència i memòria dels backends d'embeddings."
+
+    def add_arguments(self, parser):
+        """
+        Defineix arguments opcionals per la comanda.
+        """
+        parser.add_argument("--backends", default=",".join(BACKENDS))
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--batch-texts", type=int, default=512)
+        parser.add_argument("--quantized", action="store_true")
+
+    def handle(self, *args, **options):
+        """
+        Lògica principal de la comanda:
+        1. Llança un procés per backend.
+        2. Mostra una taula amb càrrega, latència, throughput i memòria.
+        """
+        params = {
+            "model": getattr(settings, "SEMANTIC_SEARCH_MODEL", ""),
+            "onnx_dir": getattr(settings, "SEMANTIC_SEARCH_ONNX_DIR", None),
+            "quantized": options["quantized"],
+            "queries": options["queries"],
+            "batch_texts": options["batch_texts"],
+        }
+
+        self.stdout.write(
+            f"{'backend':<24}{'càrrega s':>10}{'p50 ms':>9}{'p95 ms':>9}"
+            f"{'textos/s':>10}{'RSS MB':>9}{'+MB':>8}"
+        )
+
+        context = multiprocessing.get_context("spawn")
+        for kind in [b.strip() for b in options["backends"].split(",") if b.strip()]:
+            with context.Pool(1) as pool:
+                result = pool.apply(_measure_backend, (kind, params))
+
+            label = kind + ("/int8" if kind == "onnx" and options["quantized"] else "")
+            if "error" in result:
+                self.stdout.write(f"{label:<24}no disponible ({result['error']})")
+                continue
+
+            lat = result["latency"]
+            self.stdout.write(
+                f"{label:<24}{result['load_s']:>10.2f}{lat['p50']:>9.2f}{lat['p95']:>9.2f}"
+                f"{result['throughput']:>10.0f}{result['rss_mb']:>9.0f}{result['rss_delta_mb']:>8.0f}"
+            )
@@ -0,0 +1,98 @@
+import json
+import tracemalloc
+import numpy as np
+from django.core.management.base import BaseCommand
+from events.fields import VectorField
+from events.models import Event
+from semantic_search.services.benchmarks import synthetic_embeddings, timed
+from semantic_search.services.index import load_embedding_arrays
+
+
+class Command(BaseCommand):
+    """
+    Benchmark del cost de carregar embeddings segons el format d'emmagatzematge.
+
+    Funciona com a script independent, executat amb:
+        python manage.py benchmark_embedding_storage [--rows N] [--db]
+
+    Compara, per a N vectors sintètics, el format antic (JSONField: llista
+    de floats) amb el binari empaquetat de VectorField (float32 i float16):
+    bytes per fila, temps de decodificar totes les files i muntar la matriu
+    de l'índex, i memòria de pic dels valors decodificats.
+
+    Opcions:
+    --rows : nombre de vectors (per defecte 10000)
+    --dim  : dimensió dels vectors
+    --db   : a més, mesura load_embedding_arrays() sobre la BD configurada
+    """
+
+    help = "Compara el temps de càrrega d'embeddings en JSON i en binari."
+
+    def add_arguments(self, parser):
+        """
+        Defineix arguments opcionals per la comanda.
+        """
+        parser.add_argument("--rows", type=int, default=10000)
+        parser.add_argument("--dim", type=int, default=384)
+        parser.add_argument("--db", action="store_true")
+
+    def _measure(self, decode, stored):
+        """
+        Decodifica totes les files i les apila en una matriu float32.
+
+        Returns:
+            tuple[float, int]: (segons, bytes de pic segons tracemalloc)
+        """
+        def load():
+            values = [decode(value) for value in stored]
+            return np.asarray(values, dtype=np.float32)
+
+        # Una passada d'escalfament perquè el temps no inclogui allocacions inicials
+        load()
+
+        _, seconds = timed(load)
+
+        tracemalloc.start()
+        load()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return seconds, peak
+
+    def handle(self, *args, **options):
+        """
+        Lògica principal de la comanda:
+        1. Genera els vectors i els codifica en cada format.
+        2. Mesura decodificació + muntatge de la matriu per a cada format.
+        3. Opcionalment, mesura la càrrega real des de la BD.
+        """
+        rows, dim = options["rows"], options["dim"]
+        matrix = synthetic_embeddings(rows, dim)
+
+        # Què rep from_db_value de cada camp per a una fila
+        formats = [
+            ("json", [json.dumps(v.tolist()) for v in matrix], json.loads),
+        ]
+        for dtype in ("float32", "float16"):
+            field = VectorField(dtype=dtype)
+            stored = [field.get_prep_value(v) for v in matrix]
+            formats.append((dtype, stored, lambda value, f=field: f.from_db_value(value, None, None)))
+
+        self.stdout.write(f"Files: {rows}  dim: {dim}")
+        self.stdout.write(f"{'format':<10}{'bytes/fila':>12}{'càrrega ms':>12}{'pic MB':>10}{'speedup':>10}")
+
+        baseline = None
+        for name, stored, decode in formats:
+            seconds, peak = self._measure(decode, stored)
+            baseline = baseline or seconds
+            size = int(np.mean([len(value) for value in stored]))
+            self.stdout.write(
+                f"{name:<10}{size:>12}{seconds * 1000:>12.1f}"
+                f"{peak / 2**20:>10.1f}{baseline / seconds:>10.1f}"
+            )
+
+        if options["db"]:
+            (ids, _, _), seconds = timed(load_embedding_arrays, Event.objects.all())
+            self.stdout.write(
+                f"BD: {ids.shape[0]} embeddings carregats en {seconds * 1000:.1f} ms"
+            )
@@ -0,0 +1,93 @@
+import tracemalloc
+import numpy as np
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.core.paginator import Paginator
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from events.forms import EventSearchForm
+from events.models import Event
+from semantic_search.services.benchmarks import latency_summary, timed
+
+
+class Command(BaseCommand):
+    """
+    Benchmark del render de les pàgines del llistat d'events amb i sense embedding.
+
+    Funciona com a script independent, executat amb:
+        python manage.py benchmark_event_list [--pages N] [--repeat R]
+
+    Reprodueix el que fa event_list_view (paginació de 12, destacats
+    primer) i renderitza la plantilla per a cada pàgina amb dos querysets:
+
+    - with_embedding : Event.objects.with_embedding(), com abans que el
+                       manager diferís l'embedding
+    - deferred       : Event.objects (manager per defecte)
+
+    Mostra el temps per pàgina (consulta + render, p50/p95) i el pic de
+    memòria de renderitzar una pàgina segons tracemalloc.
+
+    Opcions:
+    --pages  : pàgines del llistat a renderitzar
+    --repeat : repeticions de cada pàgina
+    """
+
+    help = "Compara temps i memòria del llistat d'events amb l'embedding carregat o diferit."
+
+    def add_arguments(self, parser):
+        """
+        Defineix arguments opcionals per la comanda.
+        """
+        parser.add_argument("--pages", type=int, default=10)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def _render_page(self, queryset, number, request):
+        """
+        Renderitza una pàgina del llistat com ho fa event_list_view.
+        """
+        paginator = Paginator(queryset.order_by("-is_featured", "-created_at"), 12)
+        context = {"form": EventSearchForm(None), "events": paginator.get_page(number)}
+        return render_to_string("events/event_list.html", context, request)
+
+    def handle(self, *args, **options):
+        """
+        Lògica principal de la comanda:
+        1. Prepara una petició anònima i les pàgines a renderitzar.
+        2. Mesura temps i memòria de pic per a cada queryset.
+        3. Mostra la taula comparativa.
+        """
+        total = Event.objects.count()
+        if not total:
+            raise CommandError("No hi ha events per renderitzar.")
+
+        pages = min(options["pages"], (total + 11) // 12)
+        request = RequestFactory().get("/events/")
+        request.user = AnonymousUser()
+
+        modes = [
+            ("with_embedding", Event.objects.with_embedding()),
+            ("deferred", Event.objects.all()),
+        ]
+
+        self.stdout.write(f"{total} events, {pages} pàgines x {options['repeat']} repeticions\n")
+        self.stdout.write(f"{'queryset':<16}{'p50 ms':>10}{'p95 ms':>10}{'pic KB':>10}")
+
+        for name, queryset in modes:
+            self._render_page(queryset, 1, request)  # escalfament
+
+            times = []
+            for _ in range(options["repeat"]):
+                for number in range(1, pages + 1):
+                    times.append(timed(self._render_page, queryset, number, request)[1])
+
+            peaks = []
+            for number in range(1, pages + 1):
+                tracemalloc.start()
+                self._render_page(queryset, number, request)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+
+            lat = latency_summary(times)
+            self.stdout.write(
+                f"{name:<16}{lat['p50']:>10.2f}{lat['p95']:>10.2f}{np.mean(peaks) / 1024:>10.1f}"
+            )
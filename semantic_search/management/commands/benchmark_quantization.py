@@ -0,0 +1,137 @@
+import numpy as np
+from django.core.management.base import BaseCommand
+from semantic_search.services.benchmarks import (
+    latency_summary,
+    noisy_queries,
+    recall_at_k,
+    synthetic_embeddings,
+    timed,
+)
+from semantic_search.services.index import get_index
+from semantic_search.services.quantize import Int8Matrix, rerank_top_k, spill_to_disk
+from semantic_search.services.ranker import top_k_indices
+
+
+class Command(BaseCommand):
+    """
+    Benchmark de memòria, latència i recall@k de la cerca quantitzada int8.
+
+    Funciona com a script independent, executat amb:
+        python manage.py benchmark_quantization [--rows N] [--rerank 0,64,256]
+
+    Compara la cerca exacta float32 amb la puntuació int8, sense reordenar
+    (rerank 0) i reordenant a float32 els millors candidats. Serveix per
+    triar SEMANTIC_SEARCH_RERANK_CANDIDATES.
+
+    També mostra la memòria resident de l'índex quantitzat: la matriu
+    float32 només hi compta si no està mapejada des de disc. A producció
+    sempre ho està (snapshot o, si l'índex es construeix des de la BD,
+    fitxer temporal); amb --source synthetic la matriu es bolca igualment
+    a un fitxer temporal i la reordenació llegeix d'allà.
+
+    Opcions:
+    --source  : "synthetic" (per defecte, sense BD ni model) o "index" (embeddings reals)
+    --rows    : nombre de vectors sintètics
+    --dim     : dimensió dels vectors sintètics
+    --clusters: nombre de temes dels vectors sintètics
+    --queries : nombre de queries
+    --k       : mida del top-k
+    --rerank  : candidats reordenats a float32 (separats per comes)
+    """
+
+    help = "Compara memòria, latència i recall de la cerca int8 amb la float32."
+
+    def add_arguments(self, parser):
+        """
+        Defineix arguments opcionals per la comanda.
+        """
+        parser.add_argument("--source", choices=["synthetic", "index"], default="synthetic")
+        parser.add_argument("--rows", type=int, default=200000)
+        parser.add_argument("--dim", type=int, default=384)
+        parser.add_argument("--clusters", type=int, default=2000)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--k", type=int, default=20)
+        parser.add_argument("--rerank", default="0,64,256,1024")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def _load_matrix(self, options):
+        """
+        Retorna la matriu d'embeddings sobre la qual es fa el benchmark.
+        """
+        if options["source"] == "index":
+            return get_index()._base_matrix
+
+        return synthetic_embeddings(
+            options["rows"], options["dim"], options["clusters"], options["seed"]
+        )
+
+    def handle(self, *args, **options):
+        """
+        Lògica principal de la comanda:
+        1. Prepara la matriu, les queries i la veritat exacta float32.
+        2. Quantitza la matriu a int8.
+        3. Mesura recall@k i latència per a cada nombre de candidats reordenats.
+        """
+        k = options["k"]
+        matrix = self._load_matrix(options)
+        if matrix is None or matrix.shape[0] == 0:
+            self.stdout.write(self.style.WARNING("No hi ha embeddings per fer el benchmark."))
+            return
+
+        queries = noisy_queries(matrix, options["queries"], seed=options["seed"] + 1)
+
+        exact, exact_times = [], []
+        for q in queries:
+            top, seconds = timed(lambda: top_k_indices(matrix @ q, k))
+            exact.append(top)
+            exact_times.append(seconds)
+        exact_lat = latency_summary(exact_times)
+
+        quant, quant_seconds = timed(Int8Matrix.from_matrix, matrix)
+
+        # Com a producció: la matriu float32 es llegeix d'un fitxer mapejat
+        if not isinstance(matrix, np.memmap):
+            if options["source"] == "index":
+                self.stdout.write(self.style.WARNING(
+                    "La matriu float32 de l'índex és resident (índex sense quantitzar?)."
+                ))
+            else:
+                matrix = spill_to_disk(matrix)
+
+        mapped = isinstance(matrix, np.memmap)
+        resident = quant.nbytes + (0 if mapped else matrix.nbytes)
+
+        self.stdout.write(
+            f"Files: {matrix.shape[0]}  dim: {matrix.shape[1]}  "
+            f"float32: {matrix.nbytes / 2**20:.1f} MB  int8: {quant.nbytes / 2**20:.1f} MB  "
+            f"quantització: {quant_seconds:.2f}s"
+        )
+        self.stdout.write(
+            f"Memòria resident amb int8: {resident / 2**20:.1f} MB "
+            f"(float32 {'mapejada des de disc' if mapped else 'a memòria'})"
+        )
+        self.stdout.write(
+            f"{'engine':<14}{'recall@' + str(k):>12}{'p50 ms':>10}{'p95 ms':>10}{'speedup':>10}"
+        )
+        self.stdout.write(
+            f"{'float32':<14}{1.0:>12.3f}{exact_lat['p50']:>10.2f}{exact_lat['p95']:>10.2f}{1.0:>10.1f}"
+        )
+
+        for candidates in [int(c) for c in options["rerank"].split(",") if c.strip()]:
+            recalls, times = [], []
+            for q, expected in zip(queries, exact):
+                if candidates:
+                    (rows, _), seconds = timed(
+                        lambda: rerank_top_k(matrix, q, quant.scores(q), k, candidates)
+                    )
+                else:
+                    rows, seconds = timed(lambda: top_k_indices(quant.scores(q), k))
+                recalls.append(recall_at_k(rows, expected))
+                times.append(seconds)
+
+            lat = latency_summary(times)
+            speedup = exact_lat["p50"] / lat["p50"] if lat["p50"] else 0.0
+            self.stdout.write(
+                f"{'int8/' + str(candidates):<14}{np.mean(recalls):>12.3f}"
+                f"{lat['p50']:>10.2f}{lat['p95']:>10.2f}{speedup:>10.1f}"
+            )
@@ -0,0 +1,168 @@
+import datetime
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from events.models import Event
+from semantic_search.services.benchmarks import latency_summary, noisy_queries, timed
+from semantic_search.services.index import (
+    EmbeddingIndex,
+    _as_vector,
+    hydrate_events,
+    load_embedding_arrays,
+)
+from semantic_search.services.ranker import top_k_indices
+
+
+def _value_bytes(value) -> int:
+    """
+    Mida aproximada d'un valor tal com arriba de la BD.
+    """
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, (list, tuple)):
+        return sum(_value_bytes(v) for v in value)
+    if isinstance(value, (int, float, bool, datetime.date, datetime.datetime)):
+        return 8
+    return len(str(value).encode("utf-8"))
+
+
+def _payload_bytes(queryset, fields) -> int:
+    """
+    Bytes de les columnes `fields` de totes les files d'un queryset.
+    """
+    return sum(
+        sum(_value_bytes(v) for v in row)
+        for row in queryset.values_list(*fields).iterator()
+    )
+
+
+class Command(BaseCommand):
+    """
+    Benchmark de consultes i bytes llegits de la BD per resoldre una cerca.
+
+    Funciona com a script independent, executat amb:
+        python manage.py benchmark_search_fetch [--queries N] [-k K]
+
+    Compara tres maneres d'obtenir els k millors events per a una query:
+
+    - full      : itera Event.objects.with_embedding() (totes les columnes de totes
+                  les files) i puntua en Python, com feia la versió original
+    - projected : dues fases; puntua llegint només (id, embedding) i
+                  carrega els k guanyadors amb un sol in_bulk
+    - index     : puntua a l'índex resident (sense BD) i només fa l'in_bulk
+
+    Per a cada estratègia mostra consultes per cerca, bytes de payload per
+    cerca (mida dels valors de les columnes llegides, no del protocol) i
+    latència p50/p95.
+
+    Opcions:
+    --queries : nombre de queries sintètiques (derivades d'embeddings reals)
+    -k        : resultats per cerca
+    """
+
+    help = "Compara consultes i bytes llegits per cerca (files completes vs projecció vs índex)."
+
+    def add_arguments(self, parser):
+        """
+        Defineix arguments opcionals per la comanda.
+        """
+        parser.add_argument("--queries", type=int, default=20)
+        parser.add_argument("-k", type=int, default=20)
+
+    def _full(self, q, k):
+        """
+        Ranking original: objectes Event complets de totes les files.
+        """
+        events = list(Event.objects.with_embedding())
+        scored = [
+            (e, float(np.dot(vec, q)))
+            for e in events
+            if (vec := _as_vector(e.embedding, q.shape[0])) is not None
+        ]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:k]
+
+    def _projected(self, q, k):
+        """
+        Dues fases: (id, embedding) per puntuar i in_bulk dels k guanyadors.
+        """
+        ids, vecs = [], []
+        for event_id, embedding in Event.objects.values_list("id", "embedding").iterator():
+            vec = _as_vector(embedding, q.shape[0])
+            if vec is not None:
+                ids.append(event_id)
+                vecs.append(vec)
+
+        if not vecs:
+            return []
+
+        scores = np.stack(vecs) @ q
+        hits = [(ids[i], float(scores[i])) for i in top_k_indices(scores, k)]
+        return hydrate_events(hits)
+
+    def _run(self, strategy, queries, k):
+        """
+        Executa les queries i retorna (consultes per cerca, latències).
+        """
+        queries_per_search, times = [], []
+        for q in queries:
+            with CaptureQueriesContext(connection) as ctx:
+                _, seconds = timed(strategy, q, k)
+            queries_per_search.append(len(ctx.captured_queries))
+            times.append(seconds)
+        return float(np.mean(queries_per_search)), times
+
+    def handle(self, *args, **options):
+        """
+        Lògica principal de la comanda:
+        1. Llegeix els embeddings i genera queries properes a events reals.
+        2. Mesura cada estratègia (consultes, bytes i latència).
+        3. Mostra la taula comparativa.
+        """
+        ids, matrix, meta = load_embedding_arrays()
+        if ids.shape[0] == 0:
+            raise CommandError("No hi ha events amb embeddings; executa backfill_event_embeddings.")
+
+        k = options["k"]
+        queries = noisy_queries(matrix, options["queries"])
+        index = EmbeddingIndex(ids, matrix, meta=meta)
+
+        def indexed(q, k):
+            return hydrate_events(index.search(q, k=k))
+
+        # Columnes de la fila completa i les que llegeix hydrate_events()
+        all_fields = [f.attname for f in Event._meta.concrete_fields]
+        hydrated_fields = [name for name in all_fields if name != "embedding"]
+
+        top_ids = [event_id for event_id, _ in index.search(queries[0], k=k)]
+        hydrate_bytes = _payload_bytes(Event.objects.filter(id__in=top_ids), hydrated_fields)
+
+        strategies = [
+            ("full", self._full, _payload_bytes(Event.objects.all(), all_fields)),
+            ("projected", self._projected,
+             _payload_bytes(Event.objects.all(), ["id", "embedding"]) + hydrate_bytes),
+            ("index", indexed, hydrate_bytes),
+        ]
+
+        self.stdout.write(
+            f"{ids.shape[0]} events amb embedding, {len(queries)} queries, k={k}\n"
+        )
+        self.stdout.write(
+            f"{'estratègia':<12}{'consultes':>10}{'KB/cerca':>12}{'p50 ms':>10}{'p95 ms':>10}"
+        )
+
+        for name, strategy, payload in strategies:
+            strategy(queries[0], k)  # escalfament
+            per_search, times = self._run(strategy, queries, k)
+            lat = latency_summary(times)
+            self.stdout.write(
+                f"{name:<12}{per_search:>10.1f}{payload / 1024:>12.1f}"
+                f"{lat['p50']:>10.2f}{lat['p95']:>10.2f}"
+            )
@@ -0,0 +1,347 @@
+import json
+import platform
+import subprocess
+from datetime import timedelta
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import (
+    override_settings,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+from django.urls import reverse
+from django.utils import timezone
+from assistant_chat.services.retriever import retrieve_events
+from events.models import Event
+from semantic_search.services.benchmarks import (
+    latency_summary,
+    noisy_queries,
+    peak_rss_mb,
+    synthetic_embedding_batch,
+    synthetic_sentence,
+    synthetic_vocabulary,
+    timed,
+)
+from semantic_search.services.embeddings import get_query_cache, set_active_model
+from semantic_search.services.index import get_index, reset_index
+from semantic_search.services.lexical import get_lexical_index, reset_lexical_index
+from semantic_search.services.ranker import cosine_top_k
+from semantic_search.services.results import get_result_cache
+
+# Capes mesurades, de la més interna a la més externa
+LAYERS = ("ranker", "cosine_top_k", "retriever", "view")
+
+
+def _git_commit():
+    """
+    Commit actual del repositori (None si no és un checkout de git).
+    """
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+class Command(BaseCommand):
+    """
+    Benchmark de la cerca semàntica per capes sobre catàlegs sintètics.
+
+    Funciona com a script independent, executat amb:
+        python manage.py benchmark_semantic_suite [--sizes 1000,10000,100000]
+                                                  [--output results.json] [--compare old.json]
+
+    Crea una BD de test (com `manage.py test`) i hi genera events
+    reproduïbles (títols i descripcions d'un vocabulari inventat, embeddings
+    normalitzats agrupats en clústers) sense descarregar cap model: el model
+    actiu és "hashing-<dim>". El catàleg creix fins a cada mida i, per a
+    cadascuna, es reconstrueixen els índexs i es mesura cada capa per separat:
+
+    - ranker       : EmbeddingIndex.search amb vectors de query (sense BD)
+    - cosine_top_k : ranking en Python sobre una llista (id, vector), fins a --list-limit
+    - retriever    : retrieve_events (embedding de la query, cerca híbrida i in_bulk)
+    - view         : la pàgina de cerca sencera amb el client de test (render inclòs)
+
+    Les queries de text són diferents entre si i les caches de queries i
+    resultats es buiden per a cada mida, de manera que es mesuren fallades
+    de cache. Es mostra la latència p50/p95/p99 i la memòria resident de pic
+    després de cada capa, i es poden desar en JSON (amb el commit i la
+    configuració) per comparar execucions entre commits.
+
+    Opcions:
+    --sizes      : mides del catàleg separades per comes (1000000 per a 1M)
+    --queries    : queries per capa
+    -k           : resultats per cerca
+    --dim        : dimensió dels embeddings sintètics
+    --seed       : llavor de les dades i les queries
+    --list-limit : mida màxima per mesurar cosine_top_k (llista en memòria)
+    --output     : fitxer JSON on desar els resultats
+    --compare    : JSON d'una execució anterior per comparar p50/p95
+    --keepdb     : conserva la BD de test (i els events) entre execucions
+    """
+
+    help = "Mesura la cerca semàntica per capes (ranker, retriever, vista) amb events sintètics."
+
+    def add_arguments(self, parser):
+        """
+        Defineix arguments opcionals per la comanda.
+        """
+        parser.add_argument("--sizes", default="1000,10000,100000")
+        parser.add_argument("--queries", type=int, default=100)
+        parser.add_argument("-k", type=int, default=20)
+        parser.add_argument("--dim", type=int, default=384)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--list-limit", type=int, default=100000)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--output", default=None)
+        parser.add_argument("--compare", default=None)
+        parser.add_argument("--keepdb", action="store_true")
+
+    def _grow(self, creator, size, options, vocabulary):
+        """
+        Afegeix events sintètics fins que el catàleg té `size` files.
+
+        Cada batch depèn només de la seva posició, de manera que el catàleg
+        de 10k conté el de 1k i una BD conservada amb --keepdb es reaprofita.
+        """
+        existing = Event.objects.count()
+        now = timezone.now()
+        categories = [value for value, _ in Event.CATEGORY_CHOICES]
+        statuses = [value for value, _ in Event.STATUS_CHOICES]
+        model = f"hashing-{options['dim']}"
+
+        for start in range(existing, size, options["batch_size"]):
+            count = min(options["batch_size"], size - start)
+            rng = np.random.default_rng([options["seed"], start, 1])
+            vectors = synthetic_embedding_batch(start, count, dim=options["dim"], seed=options["seed"])
+            days = rng.integers(-365, 366, size=count)
+
+            Event.objects.bulk_create([
+                Event(
+                    title=synthetic_sentence(rng, vocabulary, 4).capitalize(),
+                    description=synthetic_sentence(rng, vocabulary, 40),
+                    creator=creator,
+                    category=categories[int(rng.integers(len(categories)))],
+                    status=statuses[int(rng.integers(len(statuses)))],
+                    scheduled_date=now + timedelta(days=int(days[i])),
+                    tags=", ".join(synthetic_sentence(rng, vocabulary, 3).split()),
+                    embedding=vectors[i],
+                    embedding_model=model,
+                    embedding_updated_at=now,
+                    embedding_stale=False,
+                )
+                for i in range(count)
+            ], batch_size=1000)
+
+    def _query_texts(self, count, vocabulary, seed):
+        """
+        Queries de text diferents entre si (cap encert a les caches).
+        """
+        rng = np.random.default_rng([seed, 2])
+        texts = []
+        while len(texts) < count:
+            text = synthetic_sentence(rng, vocabulary, int(rng.integers(2, 5)))
+            if text not in texts:
+                texts.append(text)
+        return texts
+
+    def _measure(self, fn, inputs):
+        """
+        Executa fn per a cada entrada i en resumeix la latència.
+
+        La primera entrada només escalfa (imports, plantilles, BLAS) i no es
+        mesura ni es repeteix, perquè no es serveixi de la cache.
+        """
+        fn(inputs[0])  # escalfament
+        times = [timed(fn, value)[1] for value in inputs[1:]]
+        summary = latency_summary(times)
+        summary["peak_rss_mb"] = peak_rss_mb()
+        return summary
+
+    def _run_size(self, size, creator, options, vocabulary):
+        """
+        Fa créixer el catàleg fins a `size` i mesura totes les capes.
+        """
+        k = options["k"]
+        _, insert_seconds = timed(self._grow, creator, size, options, vocabulary)
+
+        # Índexs i caches nous per a cada mida
+        reset_index()
+        reset_lexical_index()
+        get_result_cache().clear()
+        get_query_cache().clear()
+
+        index, index_seconds = timed(get_index)
+        _, lexical_seconds = timed(get_lexical_index)
+
+        texts = self._query_texts(2 * (options["queries"] + 1), vocabulary, options["seed"])
+        vectors = noisy_queries(index._base_matrix, options["queries"] + 1, seed=options["seed"] + 1)
+        url = reverse("semantic_search:semantic")
+        client = Client()
+
+        layers = {}
+        layers["ranker"] = self._measure(lambda q: index.search(q, k=k), vectors)
+
+        if size <= options["list_limit"]:
+            items = list(zip(index._base_ids.tolist(), index._base_matrix))
+            layers["cosine_top_k"] = self._measure(
+                lambda q: cosine_top_k(q, items, k=k), vectors,
+            )
+            del items
+
+        # Cada capa de text fa servir queries pròpies perquè la cache no les
+        # serveixi. Sense llindar: els vectors sintètics no s'assemblen als del
+        # model "hashing" i el llindar per defecte descartaria tots els candidats
+        half = len(texts) // 2
+        layers["retriever"] = self._measure(
+            lambda text: retrieve_events(text, k=k, min_score=0.0), texts[:half],
+        )
+
+        def view(text):
+            response = client.get(url, {"q": text})
+            if response.status_code != 200:
+                raise CommandError(f"La vista de cerca ha retornat {response.status_code}")
+
+        layers["view"] = self._measure(view, texts[half:])
+
+        return {
+            "size": size,
+            "insert_seconds": insert_seconds,
+            "index_build_ms": index_seconds * 1000.0,
+            "lexical_build_ms": lexical_seconds * 1000.0,
+            "layers": layers,
+        }
+
+    def _write_size(self, result):
+        """
+        Mostra la taula d'una mida.
+        """
+        self.stdout.write(
+            f"\n{result['size']} events (inserció {result['insert_seconds']:.1f}s, "
+            f"índex {result['index_build_ms']:.0f} ms, BM25 {result['lexical_build_ms']:.0f} ms)"
+        )
+        self.stdout.write(
+            f"{'capa':<14}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'RSS MB':>10}"
+        )
+        for name in LAYERS:
+            lat = result["layers"].get(name)
+            if lat is not None:
+                self.stdout.write(
+                    f"{name:<14}{lat['p50']:>10.2f}{lat['p95']:>10.2f}"
+                    f"{lat['p99']:>10.2f}{lat['peak_rss_mb']:>10.0f}"
+                )
+
+    def _write_comparison(self, previous, results):
+        """
+        Compara p50/p95 amb una execució anterior (ràtio > 1 = més lent ara).
+        """
+        old = {
+            (r["size"], name): lat
+            for r in previous.get("results", [])
+            for name, lat in r["layers"].items()
+        }
+        commit = previous.get("meta", {}).get("commit") or "anterior"
+
+        self.stdout.write(f"\nComparació amb {commit}")
+        self.stdout.write(
+            f"{'mida':>9} {'capa':<14}{'p50 abans':>11}{'p50 ara':>10}{'ràtio':>8}"
+            f"{'p95 abans':>11}{'p95 ara':>10}{'ràtio':>8}"
+        )
+        for result in results:
+            for name in LAYERS:
+                lat, before = result["layers"].get(name), old.get((result["size"], name))
+                if lat is None or before is None:
+                    continue
+                self.stdout.write(
+                    f"{result['size']:>9} {name:<14}"
+                    f"{before['p50']:>11.2f}{lat['p50']:>10.2f}{lat['p50'] / max(before['p50'], 1e-9):>8.2f}"
+                    f"{before['p95']:>11.2f}{lat['p95']:>10.2f}{lat['p95'] / max(before['p95'], 1e-9):>8.2f}"
+                )
+
+    def handle(self, *args, **options):
+        """
+        Lògica principal de la comanda:
+        1. Crea la BD de test i activa el model "hashing-<dim>".
+        2. Per a cada mida, fa créixer el catàleg i mesura cada capa.
+        3. Mostra les taules, desa el JSON i compara amb l'execució anterior.
+        4. Esborra la BD de test (tret de --keepdb).
+        """
+        try:
+            sizes = sorted({int(size) for size in options["sizes"].split(",") if size.strip()})
+        except ValueError:
+            raise CommandError("--sizes ha de ser una llista d'enters separats per comes.")
+        if not sizes or sizes[0] <= options["k"]:
+            raise CommandError("Cal almenys una mida més gran que k.")
+
+        previous = None
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as fh:
+                previous = json.load(fh)
+
+        # Sense snapshots, servidor d'embeddings, cua ni micro-batching: es
+        # mesura el camí síncron d'un sol procés
+        overrides = override_settings(
+            SEMANTIC_SEARCH_SNAPSHOT_DIR=None,
+            SEMANTIC_SEARCH_EMBEDDING_SOCKET=None,
+            SEMANTIC_SEARCH_ASYNC_EMBEDDINGS=False,
+            SEMANTIC_SEARCH_MICROBATCH_MAX_WAIT=0,
+            SEMANTIC_SEARCH_REFRESH_SECONDS=0,
+        )
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options["keepdb"])
+        results = []
+        try:
+            with overrides:
+                set_active_model(f"hashing-{options['dim']}")
+                creator, _ = get_user_model().objects.get_or_create(username="benchmark")
+                vocabulary = synthetic_vocabulary(seed=options["seed"])
+
+                self.stdout.write(
+                    f"{connection.vendor}, motor {getattr(settings, 'SEMANTIC_SEARCH_ENGINE', 'exact')}, "
+                    f"{options['queries']} queries per capa, k={options['k']}"
+                )
+                for size in sizes:
+                    result = self._run_size(size, creator, options, vocabulary)
+                    results.append(result)
+                    self._write_size(result)
+        finally:
+            reset_index()
+            reset_lexical_index()
+            teardown_databases(old_config, verbosity=0, keepdb=options["keepdb"])
+            teardown_test_environment()
+
+        report = {
+            "meta": {
+                "commit": _git_commit(),
+                "created_at": timezone.now().isoformat(),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "database": connection.vendor,
+                "engine": getattr(settings, "SEMANTIC_SEARCH_ENGINE", "exact"),
+                "quantization": getattr(settings, "SEMANTIC_SEARCH_QUANTIZATION", None),
+                "hybrid": getattr(settings, "SEMANTIC_SEARCH_HYBRID", True),
+                "dim": options["dim"],
+                "queries": options["queries"],
+                "k": options["k"],
+                "seed": options["seed"],
+            },
+            "results": results,
+        }
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"\nResultats desats a {options['output']}"))
+
+        if previous is not None:
+            self._write_comparison(previous, results)
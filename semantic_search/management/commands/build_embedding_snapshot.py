@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+from semantic_search.services import snapshot
+from semantic_search.services.index import write_index_snapshot
+
+
+class Command(BaseCommand):
+    """
+    Comanda de gestió per generar un snapshot en disc dels embeddings.
+
+    Funciona com a script independent, executat amb:
+        python manage.py build_embedding_snapshot [--dir PATH] [--verify]
+
+    El snapshot (ids + matriu float32 en format .npy, i les postings BM25
+    de la cerca híbrida) el mapegen tots els workers amb np.memmap, de manera que arrenquen en mil·lisegons i
+    comparteixen una sola còpia de les dades al page cache.
+
+    Opcions:
+    --dir    : directori de destinació (per defecte SEMANTIC_SEARCH_SNAPSHOT_DIR)
+    --verify : torna a llegir el snapshot publicat i en comprova el checksum
+               (els workers el comproven en carregar-lo, vegeu SEMANTIC_SEARCH_SNAPSHOT_VERIFY)
+    """
+
+    help = "Genera un snapshot en disc (memmap) dels embeddings dels Events."
+
+    def add_arguments(self, parser):
+        """
+        Defineix arguments opcionals per la comanda.
+        """
+        parser.add_argument(
+            "--dir",
+            default=None,
+            help="Directori on escriure el snapshot"
+        )
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Verifica el checksum del snapshot un cop publicat"
+        )
+
+    def handle(self, *args, **options):
+        """
+        Lògica principal de la comanda:
+        1. Llegeix (id, embedding) de tots els events (model actiu).
+        2. Entrena les llistes IVF i/o la matriu int8 si estan activades i
+           construeix les postings BM25 (cerca híbrida).
+        3. Escriu els fitxers versionats i publica el manifest.
+        4. Opcionalment verifica el resultat.
+        """
+        directory = options["dir"] or snapshot.snapshot_dir()
+        if directory is None:
+            raise CommandError("SEMANTIC_SEARCH_SNAPSHOT_DIR no està configurat.")
+
+        manifest = write_index_snapshot(directory=directory)
+
+        if options["verify"]:
+            if snapshot.load_snapshot(manifest, directory=directory, verify=True) is None:
+                raise CommandError("El snapshot publicat no supera la verificació.")
+
+        # Mostra resultat per consola
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshot {manifest['version']}: {manifest['rows']} embeddings "
+            f"(dim {manifest['dim']}) a {directory}"
+        ))
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+from semantic_search.services.related import build_related, last_computed_at
+
+
+class Command(BaseCommand):
+    """
+    Comanda de gestió per precalcular els events relacionats de cada event.
+
+    Funciona com a script independent, executat amb:
+        python manage.py build_related_events [--incremental] [--count N] [--block-rows N]
+
+    Pensada per executar-se cada nit (completa) i, si es vol, més sovint en
+    mode incremental. Calcula els veïns més similars de cada event amb
+    productes de matrius per blocs sobre els embeddings de l'índex i els desa
+    empaquetats a RelatedEvents, d'on els llegeix la pàgina de detall.
+
+    Opcions:
+    --incremental : només els events amb l'embedding canviat des de l'última
+                    execució i els seus veïns (completa si no n'hi ha cap)
+    --count       : veïns per event (per defecte SEMANTIC_SEARCH_RELATED_COUNT)
+    --block-rows  : files per bloc del producte de matrius (per defecte, segons memòria)
+    """
+
+    help = "Precalcula els events semànticament relacionats de cada event."
+
+    def add_arguments(self, parser):
+        """
+        Defineix arguments opcionals per la comanda.
+        """
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Només els events canviats des de l'última execució"
+        )
+        parser.add_argument(
+            "--count",
+            type=int,
+            default=None,
+            help="Veïns per event"
+        )
+        parser.add_argument(
+            "--block-rows",
+            type=int,
+            default=None,
+            help="Files per bloc"
+        )
+
+    def handle(self, *args, **options):
+        """
+        Lògica principal de la comanda:
+        1. Determina el punt de partida (tot o des de l'última execució).
+        2. Calcula els veïns per blocs i els desa.
+        3. Mostra el resum.
+        """
+        since = last_computed_at() if options["incremental"] else None
+        if options["incremental"] and since is None:
+            self.stdout.write("No hi ha cap càlcul previ: es fa el càlcul complet.")
+
+        stats = build_related(count=options["count"], since=since, block_rows=options["block_rows"])
+
+        # Mostra resultat per consola
+        mode = f"incremental des de {since:%Y-%m-%d %H:%M}" if since is not None else "complet"
+        self.stdout.write(self.style.SUCCESS(
+            f"Events relacionats ({mode}): {stats['computed']} llistes de {stats['count']} veïns "
+            f"sobre {stats['events']} events, blocs de {stats['block_rows']} files "
+            f"({stats['seconds']:.1f}s)"
+        ))
@@ -0,0 +1,90 @@
+import json
+from django.core.management.base import BaseCommand
+from events.models import Event
+from semantic_search.services.duplicates import duplicate_clusters
+
+
+class Command(BaseCommand):
+    """
+    Informe dels events quasi duplicats de tot el catàleg, agrupats en clústers.
+
+    Funciona com a script independent, executat amb:
+        python manage.py dedup_report [--threshold T] [--window-hours H] [--any-creator]
+            [--neighbours K] [--limit N] [--json PATH]
+
+    Cada event es compara amb els seus veïns més similars (productes de
+    matrius per blocs sobre els embeddings de l'índex) i les parelles que
+    superen el llindar s'agrupen en clústers. No modifica res.
+
+    Opcions:
+    --threshold    : similitud mínima (per defecte SEMANTIC_SEARCH_DUPLICATE_THRESHOLD)
+    --window-hours : distància màxima entre dates (0 = sense límit)
+    --any-creator  : agrupa també events de creadors diferents
+    --neighbours   : veïns que es comproven per event
+    --limit        : clústers que es mostren per consola
+    --json         : fitxer on escriure tots els clústers
+    """
+
+    help = "Mostra els clústers d'events quasi duplicats."
+
+    def add_arguments(self, parser):
+        """
+        Defineix arguments opcionals per la comanda.
+        """
+        parser.add_argument("--threshold", type=float, default=None)
+        parser.add_argument("--window-hours", type=float, default=None)
+        parser.add_argument("--any-creator", action="store_true")
+        parser.add_argument("--neighbours", type=int, default=10)
+        parser.add_argument("--limit", type=int, default=20)
+        parser.add_argument("--json", default=None)
+
+    def handle(self, *args, **options):
+        """
+        Lògica principal de la comanda:
+        1. Calcula els clústers de duplicats.
+        2. Carrega els events dels clústers (sense els vectors).
+        3. Mostra els més grans i, opcionalment, els escriu en JSON.
+        """
+        clusters = duplicate_clusters(
+            threshold=options["threshold"],
+            window_hours=options["window_hours"],
+            same_creator=not options["any_creator"],
+            neighbours=options["neighbours"],
+        )
+
+        ids = [event_id for cluster in clusters for event_id in cluster["ids"]]
+        events = Event.objects.select_related("creator").in_bulk(ids)
+
+        report = []
+        for cluster in clusters:
+            members = [events[event_id] for event_id in cluster["ids"] if event_id in events]
+            report.append({
+                "size": len(members),
+                "min_score": round(cluster["min_score"], 4),
+                "max_score": round(cluster["max_score"], 4),
+                "events": [
+                    {
+                        "id": e.pk,
+                        "title": e.title,
+                        "creator": e.creator.username,
+                        "scheduled_date": e.scheduled_date.isoformat() if e.scheduled_date else None,
+                        "status": e.status,
+                    }
+                    for e in members
+                ],
+            })
+
+        duplicates = sum(cluster["size"] - 1 for cluster in report)
+        self.stdout.write(f"{len(report)} clústers, {duplicates} events sobrants\n")
+
+        for cluster in report[:options["limit"]]:
+            self.stdout.write(
+                f"[{cluster['size']}] similitud {cluster['min_score']:.3f}–{cluster['max_score']:.3f}"
+            )
+            for e in cluster["events"]:
+                self.stdout.write(f"    #{e['id']} {e['title']} · {e['creator']} · {e['scheduled_date']}")
+
+        if options["json"]:
+            with open(options["json"], "w", encoding="utf-8") as fh:
+                json.dump(report, fh, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Informe complet a {options['json']}"))
@@ -0,0 +1,109 @@
+import json
+import signal
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from semantic_search.services.embedding_server import (
+    EmbeddingClient,
+    EmbeddingServer,
+    EmbeddingServerError,
+)
+from semantic_search.services.embeddings import get_model
+
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+class Command(BaseCommand):
+    """
+    Servidor local d'embeddings: un sol procés amb el model carregat.
+
+    Funciona com a script independent, executat amb:
+        python manage.py run_embedding_server [--socket PATH]
+        python manage.py run_embedding_server --check
+
+    Els workers web configurats amb SEMANTIC_SEARCH_EMBEDDING_SOCKET li
+    envien els textos pel socket Unix en lloc de carregar cadascun el seu
+    model (centenars de MB per procés).
+
+    Opcions:
+    --socket : ruta del socket (per defecte SEMANTIC_SEARCH_EMBEDDING_SOCKET)
+    --check  : no arrenca el servidor; consulta l'estat del que està en marxa
+    """
+
+    help = "Arrenca el servidor d'embeddings compartit o en comprova l'estat."
+
+    def add_arguments(self, parser):
+        """
+        Defineix arguments opcionals per la comanda.
+        """
+        parser.add_argument(
+            "--socket",
+            default=None,
+            help="Ruta del socket Unix"
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Mostra l'estat del servidor en marxa i surt"
+        )
+
+    def handle(self, *args, **options):
+        """
+        Lògica principal de la comanda:
+        1. Resol la ruta del socket.
+        2. Amb --check, consulta l'estat i en fa una prova d'embedding.
+        3. Altrament, carrega el model i atén peticions fins a SIGTERM/Ctrl+C.
+        """
+        path = options["socket"] or getattr(settings, "SEMANTIC_SEARCH_EMBEDDING_SOCKET", None)
+        if not path:
+            raise CommandError("Cal --socket o SEMANTIC_SEARCH_EMBEDDING_SOCKET.")
+
+        if options["check"]:
+            self._check(path)
+            return
+
+        started = time.perf_counter()
+        backend = get_model()
+        server = EmbeddingServer(
+            path, backend,
+            batch_wait=getattr(settings, "SEMANTIC_SEARCH_MICROBATCH_MAX_WAIT", 0),
+            batch_size=getattr(settings, "SEMANTIC_SEARCH_MICROBATCH_MAX_SIZE", 32),
+            batch_pending=getattr(settings, "SEMANTIC_SEARCH_MICROBATCH_MAX_PENDING", 256),
+        )
+
+        # SIGTERM (systemd, docker stop) tanca el servidor com Ctrl+C
+        signal.signal(signal.SIGTERM, _raise_interrupt)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Servidor d'embeddings a {path} ({backend.name}, "
+            f"model carregat en {time.perf_counter() - started:.1f}s)"
+        ))
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write("Servidor d'embeddings aturat.")
+
+    def _check(self, path):
+        """
+        Mostra l'estat del servidor i la latència d'un embedding de prova.
+        """
+        client = EmbeddingClient(path, timeout=5.0)
+        try:
+            health = client.health()
+            started = time.perf_counter()
+            vec = client.encode(["health check"])
+            latency = (time.perf_counter() - started) * 1000
+        except (OSError, EmbeddingServerError) as exc:
+            raise CommandError(f"Servidor d'embeddings no disponible a {path}: {exc}")
+        finally:
+            client.close()
+
+        health["dim"] = int(vec.shape[1])
+        health["probe_ms"] = round(latency, 2)
+        self.stdout.write(json.dumps(health, indent=2))
@@ -0,0 +1,80 @@
+# Generated by Django 3.2.8 on 2026-10-17 07:59
+
+from django.db import migrations, models
+from django.utils import timezone
+import django.db.models.deletion
+import events.fields
+
+# Files copiades per cada escriptura massiva
+BATCH_SIZE = 500
+
+
+def seed_model_embeddings(apps, schema_editor):
+    """
+    Copia els embeddings existents (Event.embedding) a EventEmbedding,
+    associats al model amb què es van calcular.
+    """
+    Event = apps.get_model("events", "Event")
+    EventEmbedding = apps.get_model("semantic_search", "EventEmbedding")
+
+    rows = Event.objects.order_by("id").values_list(
+        "id", "embedding", "embedding_model", "embedding_text_hash", "embedding_updated_at"
+    ).iterator()
+
+    batch = []
+    for event_id, embedding, model, text_hash, updated_at in rows:
+        if embedding is None or len(embedding) == 0 or not model:
+            continue
+
+        batch.append(EventEmbedding(
+            event_id=event_id, model=model, embedding=embedding,
+            text_hash=text_hash or "", updated_at=updated_at or timezone.now(),
+        ))
+        if len(batch) >= BATCH_SIZE:
+            EventEmbedding.objects.bulk_create(batch)
+            batch = []
+
+    if batch:
+        EventEmbedding.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('events', '0006_remove_embedding_json'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActiveEmbeddingModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('previous', models.CharField(blank=True, max_length=200, null=True)),
+                ('activated_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': "Model d'embeddings actiu",
+                'verbose_name_plural': "Model d'embeddings actiu",
+            },
+        ),
+        migrations.CreateModel(
+            name='EventEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(db_index=True, max_length=200)),
+                ('embedding', events.fields.VectorField()),
+                ('text_hash', models.CharField(max_length=64)),
+                ('updated_at', models.DateTimeField()),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='model_embeddings', to='events.event')),
+            ],
+            options={
+                'verbose_name': 'Embedding per model',
+                'verbose_name_plural': 'Embeddings per model',
+                'unique_together': {('event', 'model')},
+            },
+        ),
+        migrations.RunPython(seed_model_embeddings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.8 on 2026-10-17 08:07
+
+from django.db import migrations
+import events.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('semantic_search', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventembedding',
+            name='chunks',
+            field=events.fields.VectorField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.8 on 2026-10-17 08:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+import events.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0007_embedding_chunks'),
+        ('semantic_search', '0002_embedding_chunks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedEvents',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=200)),
+                ('neighbour_ids', models.BinaryField()),
+                ('scores', events.fields.VectorField(dtype='float16')),
+                ('computed_at', models.DateTimeField(db_index=True)),
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='related_list', to='events.event')),
+            ],
+            options={
+                'verbose_name': 'Events relacionats',
+                'verbose_name_plural': 'Events relacionats',
+            },
+        ),
+    ]
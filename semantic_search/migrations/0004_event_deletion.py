@@ -0,0 +1,25 @@
+# Generated by Django 3.2.8 on 2026-10-17 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('semantic_search', '0003_related_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Event esborrat',
+                'verbose_name_plural': 'Events esborrats',
+            },
+        ),
+    ]
@@ -1,3 +1,132 @@
 from django.db import models
 
-# Create your models here.
+from events.fields import VectorField
+
+
+class EventEmbedding(models.Model):
+    """
+    Embedding d'un event calculat amb un model concret.
+
+    N'hi ha com a molt un per parell (event, model), de manera que diversos
+    models poden conviure: el model actiu (el que serveix les cerques) i un
+    model nou que s'està omplint en segon pla abans del canvi.
+
+    Event.embedding és la còpia del model actiu que llegeix l'índex.
+    """
+
+    event = models.ForeignKey(
+        "events.Event",
+        on_delete=models.CASCADE,
+        related_name="model_embeddings"
+    )
+    model = models.CharField(
+        max_length=200,
+        db_index=True
+    )
+    embedding = VectorField()
+    # Vectors dels fragments addicionals (vegeu Event.embedding_chunks)
+    chunks = VectorField(
+        blank=True,
+        null=True
+    )
+    # Hash del text a partir del qual s'ha calculat (vegeu services.text.text_hash)
+    text_hash = models.CharField(
+        max_length=64
+    )
+    updated_at = models.DateTimeField(
+    )
+
+    class Meta:
+        unique_together = ("event", "model")
+        verbose_name = "Embedding per model"
+        verbose_name_plural = "Embeddings per model"
+
+    def __str__(self):
+        return f"{self.event_id} · {self.model}"
+
+
+class ActiveEmbeddingModel(models.Model):
+    """
+    Model d'embeddings que serveix les cerques (una sola fila).
+
+    Canviar-lo és una única escriptura, de manera que tots els processos
+    passen del model antic al nou a la vegada. Si no hi ha cap fila, el
+    model actiu és el configurat (SEMANTIC_SEARCH_MODEL).
+    """
+
+    name = models.CharField(
+        max_length=200
+    )
+    previous = models.CharField(
+        max_length=200,
+        blank=True,
+        null=True
+    )
+    activated_at = models.DateTimeField(
+    )
+
+    class Meta:
+        verbose_name = "Model d'embeddings actiu"
+        verbose_name_plural = "Model d'embeddings actiu"
+
+    def __str__(self):
+        return self.name
+
+
+class RelatedEvents(models.Model):
+    """
+    Veïns semàntics precalculats d'un event (vegeu services.related).
+
+    Els ids i els scores es guarden empaquetats en binari (int64 i float16),
+    de manera que la pàgina de detall llegeix tota la llista amb una sola
+    consulta per event_id, sense calcular res ni cridar el model.
+    """
+
+    event = models.OneToOneField(
+        "events.Event",
+        on_delete=models.CASCADE,
+        related_name="related_list"
+    )
+    model = models.CharField(
+        max_length=200
+    )
+    # Ids dels veïns, de més a menys similar (int64 empaquetats)
+    neighbour_ids = models.BinaryField(
+    )
+    scores = VectorField(
+        dtype="float16"
+    )
+    computed_at = models.DateTimeField(
+        db_index=True
+    )
+
+    class Meta:
+        verbose_name = "Events relacionats"
+        verbose_name_plural = "Events relacionats"
+
+    def __str__(self):
+        return f"{self.event_id} · {len(self.neighbour_ids) // 8} veïns"
+
+
+class EventDeletion(models.Model):
+    """
+    Registre dels events esborrats (vegeu signals.log_event_deletion).
+
+    Els índexs dels altres processos el llegeixen en el catch-up per
+    treure els events esborrats des de l'última sincronització, sense
+    comparar tots els ids de la BD. Les files antigues es purguen.
+    """
+
+    # No és una clau forana: l'event ja no existeix
+    event_id = models.BigIntegerField(
+    )
+    deleted_at = models.DateTimeField(
+        db_index=True
+    )
+
+    class Meta:
+        verbose_name = "Event esborrat"
+        verbose_name_plural = "Events esborrats"
+
+    def __str__(self):
+        return f"{self.event_id} · {self.deleted_at:%Y-%m-%d %H:%M}"
@@ -0,0 +1,152 @@
+# semantic_search > Services > ann.py
+
+import numpy as np
+from .ranker import top_k_indices
+
+# Files que es puntuen de cop en les operacions per blocs (limita la memòria temporal)
+_BLOCK_ROWS = 65536
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    Normalitza cada fila (norma = 1); les files nul·les queden a zero.
+    """
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def assign_to_centroids(matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """
+    Assigna cada fila al centroide més similar (producte per blocs).
+    """
+    n = matrix.shape[0]
+    labels = np.empty(n, dtype=np.int32)
+
+    for start in range(0, n, _BLOCK_ROWS):
+        block = np.asarray(matrix[start:start + _BLOCK_ROWS], dtype=np.float32)
+        labels[start:start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+
+    return labels
+
+
+def default_nlist(n: int) -> int:
+    """
+    Nombre de llistes per defecte: ≈ 4·sqrt(N), la regla habitual per a IVF.
+    """
+    return max(1, min(n, int(4 * np.sqrt(n))))
+
+
+class IVFIndex:
+    """
+    Índex aproximat IVF (inverted file) en NumPy pur.
+
+    Les files es reparteixen en `nlist` llistes segons el centroide
+    (k-means esfèric) més proper. Una cerca només puntua les files de les
+    `nprobe` llistes amb centroide més similar a la query, en lloc de
+    recórrer tota la matriu.
+
+    Les llistes es guarden en format CSR: `order` conté les files agrupades
+    per llista i `offsets[c]:offsets[c+1]` delimita la llista c.
+    """
+
+    def __init__(self, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.order = order
+        self.offsets = offsets
+
+    @property
+    def nlist(self):
+        return self.centroids.shape[0]
+
+    @classmethod
+    def train(cls, matrix: np.ndarray, nlist: int = 0, iterations: int = 10,
+              sample_size: int = 50000, seed: int = 0):
+        """
+        Entrena els centroides amb k-means esfèric sobre una mostra i
+        assigna totes les files a la seva llista.
+
+        Args:
+            matrix (np.ndarray): embeddings normalitzats (N, dim)
+            nlist (int): nombre de llistes (0 = automàtic)
+            iterations (int): iteracions de k-means
+            sample_size (int): màxim de files usades per entrenar
+            seed (int): llavor per a resultats reproduïbles
+        """
+        n = matrix.shape[0]
+        nlist = min(nlist or default_nlist(n), n)
+        rng = np.random.default_rng(seed)
+
+        # Mostra d'entrenament (com a mínim 39 files per centroide si n'hi ha)
+        size = min(n, max(sample_size, 39 * nlist))
+        sample_rows = np.sort(rng.choice(n, size=size, replace=False))
+        sample = np.asarray(matrix[sample_rows], dtype=np.float32)
+
+        centroids = sample[rng.choice(size, size=nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = assign_to_centroids(sample, centroids)
+
+            # Suma de les files de cada cluster i renormalització (k-means esfèric)
+            counts = np.bincount(labels, minlength=nlist)
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            empty = counts == 0
+
+            sums = np.zeros_like(centroids)
+            grouped = sample[np.argsort(labels, kind="stable")]
+            sums[~empty] = np.add.reduceat(grouped, starts[~empty], axis=0)
+
+            # Els clusters buits es reinicialitzen amb files aleatòries
+            if empty.any():
+                sums[empty] = sample[rng.choice(size, size=int(empty.sum()))]
+
+            centroids = _normalize_rows(sums).astype(np.float32)
+
+        return cls.from_centroids(matrix, centroids)
+
+    @classmethod
+    def from_centroids(cls, matrix: np.ndarray, centroids: np.ndarray):
+        """
+        Construeix les llistes invertides per a uns centroides donats.
+        """
+        labels = assign_to_centroids(matrix, centroids)
+        order = np.argsort(labels, kind="stable").astype(np.int64)
+        counts = np.bincount(labels, minlength=centroids.shape[0])
+        offsets = np.zeros(centroids.shape[0] + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return cls(centroids, order, offsets)
+
+    def candidates(self, q: np.ndarray, nprobe: int) -> np.ndarray:
+        """
+        Retorna les files de les `nprobe` llistes més properes a la query.
+        """
+        probe = top_k_indices(self.centroids @ q, nprobe)
+        return np.concatenate([
+            self.order[self.offsets[c]:self.offsets[c + 1]] for c in probe
+        ])
+
+    def search(self, matrix: np.ndarray, q: np.ndarray, k: int, nprobe: int, mask=None):
+        """
+        Cerca aproximada dels k veïns més similars.
+
+        Args:
+            matrix (np.ndarray): la mateixa matriu amb què s'han construït les llistes
+            q (np.ndarray): query normalitzada
+            k (int): nombre de resultats
+            nprobe (int): nombre de llistes a explorar (més = més recall i més cost)
+            mask (np.ndarray): booleans opcionals per fila (files permeses)
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: (files, scores) ordenats per score
+        """
+        rows = np.sort(self.candidates(q, nprobe))
+
+        if mask is not None:
+            rows = rows[mask[rows]]
+
+        if rows.shape[0] == 0:
+            return rows, np.empty(0, dtype=np.float32)
+
+        scores = np.asarray(matrix[rows], dtype=np.float32) @ q
+        top = top_k_indices(scores, k)
+        return rows[top], scores[top]
@@ -0,0 +1,262 @@
+# semantic_search > Services > backends.py
+
+import hashlib
+import re
+import threading
+from pathlib import Path
+import numpy as np
+from django.core.exceptions import ImproperlyConfigured
+from .text import tokenize
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    Normalitza cada fila (norma = 1); les files nul·les queden a zero.
+    """
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+# Aproximació de tokens per als motors sense tokenitzador: paraules i signes
+_APPROX_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+class EmbeddingBackend:
+    """
+    Interfície comuna dels motors d'embeddings.
+
+    - `name`: identificador del model que es guarda amb cada embedding
+      (Event.embedding_model); no ha de carregar res
+    - `load()`: carrega els pesos (idempotent i segur entre fils)
+    - `encode(texts, batch_size)`: retorna una matriu (N, dim) float32
+      amb les files normalitzades
+    - `max_tokens`: tokens que el model llegeix d'un text (la resta es
+      trunca); None si no en té límit
+    - `count_tokens(texts)`: tokens de cada text, sense els especials
+
+    La construcció ha de ser barata: model_name() crea el backend a cada
+    procés sense voler pagar la càrrega del model.
+    """
+
+    name = ""
+    max_tokens = None
+    # Tokens especials que el model afegeix a cada text ([CLS], [SEP])
+    special_tokens = 2
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def load(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._load()
+                    self._loaded = True
+        return self
+
+    def _load(self):
+        pass
+
+    def encode(self, texts: list[str], batch_size: int = 64) -> np.ndarray:
+        raise NotImplementedError
+
+    def count_tokens(self, texts: list[str]) -> list[int]:
+        return [len(_APPROX_TOKEN_RE.findall(text)) for text in texts]
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """
+    Model de sentence-transformers (PyTorch). És el motor per defecte.
+
+    La llibreria s'importa en carregar el model, de manera que els processos
+    que mai embedeixen (p.ex. els que només llegeixen l'índex) no paguen la
+    importació de torch.
+
+    Per comptar tokens sense carregar el model (p.ex. quan els vectors els
+    calcula el servidor d'embeddings) només es carrega el tokenitzador.
+    """
+
+    def __init__(self, model: str):
+        super().__init__()
+        self.name = model
+        self._model = None
+        self._tokenizer = None
+
+    @property
+    def max_tokens(self):
+        # Longitud màxima de seqüència (128 al model per defecte)
+        return self._model.max_seq_length if self._model is not None else 128
+
+    def _load(self):
+        from sentence_transformers import SentenceTransformer
+        self._model = SentenceTransformer(self.name)
+
+    def encode(self, texts, batch_size=64):
+        self.load()
+        vecs = self._model.encode(texts, batch_size=batch_size, normalize_embeddings=True)
+        return np.asarray(vecs, dtype=np.float32)
+
+    def _get_tokenizer(self):
+        if self._model is not None:
+            return self._model.tokenizer
+        if self._tokenizer is None:
+            from transformers import AutoTokenizer
+            self._tokenizer = AutoTokenizer.from_pretrained(self.name)
+        return self._tokenizer
+
+    def count_tokens(self, texts):
+        encoded = self._get_tokenizer()(list(texts), add_special_tokens=False)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+
+class OnnxBackend(EmbeddingBackend):
+    """
+    El mateix model exportat a ONNX i executat amb ONNX Runtime (CPU).
+
+    El directori ha de contenir `model.onnx` i `tokenizer.json` (p.ex.
+    generats amb `optimum-cli export onnx`). Amb `quantized=True` s'usa
+    `model_int8.onnx`, que es genera amb quantització dinàmica int8 la
+    primera vegada si no existeix.
+
+    Aplica el mateix mean pooling i normalització que sentence-transformers,
+    així que els vectors són compatibles amb els ja guardats (el nom del
+    model no canvia i no cal tornar a embedir).
+    """
+
+    # Longitud màxima de seqüència del model original
+    max_length = 128
+
+    def __init__(self, model: str, directory, quantized: bool = False, threads: int = 0):
+        super().__init__()
+        self.name = model
+        self.directory = Path(directory)
+        self.quantized = quantized
+        self.threads = threads
+        self._session = None
+        self._tokenizer = None
+        self._counter = None
+        self._inputs = ()
+
+    @property
+    def max_tokens(self):
+        return self.max_length
+
+    def _model_path(self) -> Path:
+        path = self.directory / "model.onnx"
+        if not self.quantized:
+            return path
+
+        quantized = self.directory / "model_int8.onnx"
+        if not quantized.exists():
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(str(path), str(quantized), weight_type=QuantType.QInt8)
+        return quantized
+
+    def _load(self):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        options = onnxruntime.SessionOptions()
+        if self.threads:
+            options.intra_op_num_threads = self.threads
+
+        self._session = onnxruntime.InferenceSession(
+            str(self._model_path()), options, providers=["CPUExecutionProvider"]
+        )
+        self._inputs = {i.name for i in self._session.get_inputs()}
+
+        self._tokenizer = Tokenizer.from_file(str(self.directory / "tokenizer.json"))
+        self._tokenizer.enable_truncation(self.max_length)
+        self._tokenizer.enable_padding()
+
+    def _encode_batch(self, texts):
+        encodings = self._tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        feed = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self._inputs:
+            feed["token_type_ids"] = np.zeros_like(ids)
+
+        hidden = self._session.run(None, feed)[0]
+
+        # Mean pooling sobre els tokens reals (sense padding)
+        weights = mask[:, :, None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        return _normalize_rows(pooled)
+
+    def encode(self, texts, batch_size=64):
+        self.load()
+        parts = [
+            self._encode_batch(texts[start:start + batch_size])
+            for start in range(0, len(texts), batch_size)
+        ]
+        return np.concatenate(parts) if parts else np.empty((0, 0), dtype=np.float32)
+
+    def count_tokens(self, texts):
+        # Tokenitzador propi sense truncament (el de l'encode talla a max_length)
+        if self._counter is None:
+            from tokenizers import Tokenizer
+            self._counter = Tokenizer.from_file(str(self.directory / "tokenizer.json"))
+            self._counter.no_truncation()
+            self._counter.no_padding()
+        encodings = self._counter.encode_batch(list(texts), add_special_tokens=False)
+        return [len(e.ids) for e in encodings]
+
+
+class HashingBackend(EmbeddingBackend):
+    """
+    Embedder determinista per hashing de paraules i bigrames (sense model).
+
+    Cada terme s'assigna a una dimensió i un signe amb un hash estable
+    (blake2b), de manera que textos amb paraules en comú tenen vectors
+    similars. No captura sinònims: serveix per a desenvolupament, tests i
+    benchmarks que no poden descarregar el model.
+    """
+
+    def __init__(self, dim: int = 384):
+        super().__init__()
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text: str):
+        tokens = tokenize(text)
+        yield from tokens
+        yield from (f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+
+    def _bucket(self, feature: str):
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dim, 1.0 if (value >> 63) & 1 else -1.0
+
+    def encode(self, texts, batch_size=64):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                column, sign = self._bucket(feature)
+                matrix[row, column] += sign
+        return _normalize_rows(matrix)
+
+
+# Motors disponibles per a SEMANTIC_SEARCH_BACKEND
+BACKENDS = ("sentence-transformers", "onnx", "hashing")
+
+
+def create_backend(kind: str, model: str, onnx_dir=None, onnx_quantized: bool = False,
+                   onnx_threads: int = 0, dim: int = 384) -> EmbeddingBackend:
+    """
+    Crea un backend a partir del seu nom (sense carregar cap model).
+    """
+    if kind == "sentence-transformers":
+        return SentenceTransformerBackend(model)
+    if kind == "onnx":
+        return OnnxBackend(model, onnx_dir, quantized=onnx_quantized, threads=onnx_threads)
+    if kind == "hashing":
+        return HashingBackend(dim)
+    raise ImproperlyConfigured(f"Backend d'embeddings desconegut: {kind!r} (opcions: {', '.join(BACKENDS)})")
@@ -0,0 +1,162 @@
+# semantic_search > Services > batching.py
+
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from .benchmarks import latency_summary
+
+# Mostres de retard que es conserven per calcular percentils
+_DELAY_SAMPLES = 2048
+
+
+class MicroBatcher:
+    """
+    Agrupa crides concurrents d'embedding en un sol encode batched.
+
+    Cada crida deixa el seu text a la cua i espera un Future. Un fil de fons
+    agafa el primer text pendent, espera com a molt `max_wait` segons (o fins
+    a tenir `max_batch` textos), embedeix tot el grup amb una sola crida i
+    reparteix cada vector al seu Future.
+
+    Sota càrrega, N queries simultànies costen un encode de N textos en lloc
+    de N encodes d'un text; sense concurrència, el cost extra és com a molt
+    `max_wait`.
+
+    Els Futures cancel·lats (una crida que s'ha cansat d'esperar) es
+    descarten sense embedir-los. Amb `max_pending` textos a la cua, els
+    nous s'embedeixen directament al fil de qui crida, en lloc d'allargar
+    la cua.
+    """
+
+    def __init__(self, encode, max_wait: float = 0.005, max_batch: int = 32, max_pending: int = 256):
+        """
+        Args:
+            encode: funció list[str] -> matriu (N, dim)
+            max_wait (float): segons que s'espera a omplir un batch
+            max_batch (int): textos màxims per encode
+            max_pending (int): textos màxims a la cua
+        """
+        self._encode = encode
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.overflows = 0
+        # Mida de batch (arrodonida a potència de 2) -> nombre de batches
+        self._histogram = Counter()
+        # Segons entre l'encuat i l'inici de l'encode
+        self._delays = deque(maxlen=_DELAY_SAMPLES)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name="embedding-batcher", daemon=True
+            )
+            self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        """
+        Encua un text i retorna el Future amb el seu vector.
+
+        Si la cua és plena, el text s'embedeix directament i el Future
+        retornat ja té el resultat.
+        """
+        future = Future()
+        with self._cond:
+            full = len(self._pending) >= self.max_pending
+            if full:
+                self.overflows += 1
+            else:
+                self._pending.append((text, future, time.monotonic()))
+                self._ensure_thread()
+                self._cond.notify()
+
+        if full:
+            future.set_running_or_notify_cancel()
+            try:
+                future.set_result(self._encode([text])[0])
+            except Exception as exc:
+                future.set_exception(exc)
+        return future
+
+    def encode(self, texts: list[str]):
+        """
+        Embedeix textos passant pel batcher i espera els resultats (en ordre).
+        """
+        futures = [self.submit(text) for text in texts]
+        return [future.result() for future in futures]
+
+    def _take_batch(self) -> list:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+
+            deadline = self._pending[0][2] + self.max_wait
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = []
+            while self._pending and len(batch) < self.max_batch:
+                item = self._pending.popleft()
+                # Marca el Future com a en curs; els cancel·lats ja no s'embedeixen
+                if item[1].set_running_or_notify_cancel():
+                    batch.append(item)
+                else:
+                    self.cancelled += 1
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                continue
+            started = time.monotonic()
+
+            try:
+                vecs = self._encode([text for text, _, _ in batch])
+            except Exception as exc:
+                self.errors += 1
+                for _, future, _ in batch:
+                    future.set_exception(exc)
+                continue
+
+            for (_, future, _), vec in zip(batch, vecs):
+                future.set_result(vec)
+
+            with self._cond:
+                self.batches += 1
+                self.items += len(batch)
+                self._histogram[1 << (len(batch) - 1).bit_length()] += 1
+                self._delays.extend(started - enqueued for _, _, enqueued in batch)
+
+    def stats(self) -> dict:
+        """
+        Histograma de mides de batch i retard d'encuat (ms) per ajustar la finestra.
+        """
+        with self._cond:
+            return {
+                "max_wait_ms": self.max_wait * 1000,
+                "max_batch": self.max_batch,
+                "pending": len(self._pending),
+                "batches": self.batches,
+                "items": self.items,
+                "errors": self.errors,
+                "max_pending": self.max_pending,
+                "cancelled": self.cancelled,
+                "overflows": self.overflows,
+                "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+                "batch_size_histogram": {
+                    f"<={size}": count for size, count in sorted(self._histogram.items())
+                },
+                "queue_delay_ms": latency_summary(list(self._delays)),
+            }
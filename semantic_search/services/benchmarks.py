@@ -0,0 +1,129 @@
+# semantic_search > Services > benchmarks.py
+
+import resource
+import sys
+import time
+import numpy as np
+
+# Síl·labes per generar un vocabulari sintètic (paraules i títols reproduïbles)
+_SYLLABLES = (
+    "ba", "be", "ca", "co", "da", "de", "fa", "fi", "ga", "gu", "la", "li", "ma", "mo",
+    "na", "ne", "pa", "po", "ra", "ri", "sa", "so", "ta", "te", "va", "vi", "xa", "xe",
+)
+
+
+def synthetic_embeddings(n: int, dim: int = 384, clusters: int = 0, seed: int = 0) -> np.ndarray:
+    """
+    Genera embeddings sintètics normalitzats (float32) reproduïbles.
+
+    Amb clusters > 0 els vectors s'agrupen al voltant de centres aleatoris,
+    que s'assembla més a embeddings reals (temes, categories) que el soroll
+    uniforme i fa que els resultats dels índexs aproximats siguin realistes.
+    """
+    rng = np.random.default_rng(seed)
+
+    if clusters:
+        centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+        labels = rng.integers(0, clusters, size=n)
+        matrix = centers[labels] + 1.2 * rng.standard_normal((n, dim)).astype(np.float32)
+    else:
+        matrix = rng.standard_normal((n, dim)).astype(np.float32)
+
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix
+
+
+def synthetic_embedding_batch(start: int, count: int, dim: int = 384, clusters: int = 64,
+                              seed: int = 0) -> np.ndarray:
+    """
+    Embeddings sintètics de les files start..start+count d'un catàleg.
+
+    Cada batch depèn només de (seed, start), de manera que un catàleg es pot
+    generar per parts i créixer (1k → 10k → ...) amb els mateixos vectors.
+    Els centres dels clústers són comuns a tots els batches.
+    """
+    centers = np.random.default_rng(seed).standard_normal((clusters, dim)).astype(np.float32)
+    rng = np.random.default_rng([seed, start])
+
+    labels = rng.integers(0, clusters, size=count)
+    matrix = centers[labels] + 1.2 * rng.standard_normal((count, dim)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix
+
+
+def synthetic_vocabulary(size: int = 2000, seed: int = 0) -> list[str]:
+    """
+    Vocabulari de paraules inventades (2-4 síl·labes), sense repeticions.
+    """
+    rng = np.random.default_rng(seed)
+    words = set()
+    while len(words) < size:
+        length = int(rng.integers(2, 5))
+        words.add("".join(_SYLLABLES[i] for i in rng.integers(0, len(_SYLLABLES), size=length)))
+    return sorted(words)
+
+
+def synthetic_sentence(rng: np.random.Generator, vocabulary: list[str], words: int) -> str:
+    """
+    Frase de paraules del vocabulari amb una distribució de Zipf (poques
+    paraules molt freqüents i moltes de rares, com un text real).
+    """
+    ranks = np.minimum(rng.zipf(1.3, size=words), len(vocabulary)) - 1
+    return " ".join(vocabulary[r] for r in ranks)
+
+
+def peak_rss_mb() -> float:
+    """
+    Memòria resident màxima del procés fins ara (MB).
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux la dona en KB i macOS en bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def noisy_queries(matrix: np.ndarray, count: int, noise: float = 0.8, seed: int = 1) -> np.ndarray:
+    """
+    Genera queries a partir de files existents amb soroll gaussià.
+    """
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, matrix.shape[0], size=count)
+    noise_vecs = noise * rng.standard_normal((count, matrix.shape[1])) / np.sqrt(matrix.shape[1])
+    queries = np.asarray(matrix[rows], dtype=np.float32) + noise_vecs.astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return queries
+
+
+def timed(fn, *args, **kwargs):
+    """
+    Executa fn i retorna (resultat, segons).
+    """
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def latency_summary(samples) -> dict:
+    """
+    Resumeix una llista de durades (segons) en percentils en mil·lisegons.
+    """
+    ms = np.asarray(samples, dtype=np.float64) * 1000.0
+    if ms.size == 0:
+        return {"n": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0}
+
+    return {
+        "n": int(ms.size),
+        "mean": float(ms.mean()),
+        "p50": float(np.percentile(ms, 50)),
+        "p95": float(np.percentile(ms, 95)),
+        "p99": float(np.percentile(ms, 99)),
+    }
+
+
+def recall_at_k(found, expected) -> float:
+    """
+    Fracció dels resultats exactes que apareixen als resultats aproximats.
+    """
+    expected = set(int(i) for i in expected)
+    if not expected:
+        return 1.0
+    return len(expected & set(int(i) for i in found)) / len(expected)
@@ -0,0 +1,82 @@
+# semantic_search > Services > chunking.py
+
+import numpy as np
+from django.conf import settings
+from .embeddings import _encode, get_backend, model_name, normalize_text
+from .text import event_chunks
+
+
+def _chunk_settings(model: str = None) -> dict:
+    """
+    Límit de tokens per fragment (per defecte, el del model) i fragments per event.
+    """
+    backend = get_backend(model)
+    max_tokens = getattr(settings, "SEMANTIC_SEARCH_CHUNK_TOKENS", None)
+    if max_tokens is None and backend.max_tokens is not None:
+        max_tokens = backend.max_tokens - backend.special_tokens
+
+    return {
+        "backend": backend,
+        "max_tokens": max_tokens,
+        "max_chunks": getattr(settings, "SEMANTIC_SEARCH_MAX_CHUNKS", 8),
+    }
+
+
+def split_events(events, model: str = None) -> list[list[str]]:
+    """
+    Fragments de cada event segons el tokenitzador del model (vegeu text.event_chunks).
+    """
+    conf = _chunk_settings(model)
+    return [
+        event_chunks(e, conf["backend"].count_tokens, conf["max_tokens"], conf["max_chunks"])
+        for e in events
+    ]
+
+
+def embed_chunks(chunk_lists: list[list[str]], batch_size: int = 64, model: str = None) -> list:
+    """
+    Embedeix els fragments de diversos events amb una sola crida al model.
+
+    Tots els fragments s'ordenen per longitud abans d'agrupar-los en
+    batches: cada batch té textos de mida semblant i el padding (tokens
+    buits fins al text més llarg del batch) és mínim. La longitud en
+    caràcters és una aproximació suficient de la de tokens.
+
+    Returns:
+        list[np.ndarray]: per a cada event, una matriu (fragments, dim)
+        float32; buida si l'event no té text
+    """
+    model = model or model_name()
+
+    flat, owners = [], []
+    for position, chunks in enumerate(chunk_lists):
+        for chunk in chunks:
+            text = normalize_text(chunk)
+            if text:
+                flat.append(text)
+                owners.append(position)
+
+    result = [np.empty((0, 0), dtype=np.float32) for _ in chunk_lists]
+    if not flat:
+        return result
+
+    order = sorted(range(len(flat)), key=lambda i: len(flat[i]))
+    encoded = _encode([flat[i] for i in order], batch_size=batch_size, model=model)
+    vecs = np.empty((len(flat), encoded.shape[1]), dtype=np.float32)
+    vecs[order] = encoded
+
+    # Els fragments de cada event són consecutius i en ordre
+    owners = np.asarray(owners)
+    starts = np.searchsorted(owners, np.arange(len(chunk_lists) + 1))
+    for position in range(len(chunk_lists)):
+        if starts[position + 1] > starts[position]:
+            result[position] = vecs[starts[position]:starts[position + 1]]
+
+    return result
+
+
+def embed_events(events, batch_size: int = 64, model: str = None) -> list:
+    """
+    Fragmenta i embedeix una llista d'events (vegeu embed_chunks).
+    """
+    return embed_chunks(split_events(events, model), batch_size=batch_size, model=model)
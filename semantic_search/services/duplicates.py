@@ -0,0 +1,188 @@
+# semantic_search > Services > duplicates.py
+
+import logging
+from datetime import timedelta
+from types import SimpleNamespace
+import numpy as np
+from django.conf import settings
+from events.models import Event
+from .embeddings import embed_text
+from .index import get_index, hydrate_events, load_embedding_arrays
+from .metadata import NO_DATE
+from .related import block_rows_for, nearest_neighbours
+from .text import TEXT_FIELDS, event_text
+
+logger = logging.getLogger(__name__)
+
+
+def _duplicate_settings() -> dict:
+    """
+    Llindar de similitud i finestra temporal per considerar dos events duplicats.
+    """
+    return {
+        "threshold": getattr(settings, "SEMANTIC_SEARCH_DUPLICATE_THRESHOLD", 0.9),
+        "window_hours": getattr(settings, "SEMANTIC_SEARCH_DUPLICATE_WINDOW_HOURS", 72),
+    }
+
+
+def find_near_duplicates(fields: dict, creator, scheduled_date, exclude_id: int = None,
+                         threshold: float = None, limit: int = 5) -> list[tuple[Event, float]]:
+    """
+    Events del mateix creador, programats a prop, amb un text gairebé igual.
+
+    1. Selecciona els events del creador dins la finestra temporal (una
+       consulta per creator i data). Si no n'hi ha cap, no es crida el model.
+    2. Embedeix el text del candidat (el mateix que event_text).
+    3. Consulta l'índex vectorial restringit a aquests ids i es queda amb
+       els que superen el llindar.
+
+    L'índex i el model es carreguen si el procés encara no els té (com a
+    la primera cerca), així que el resultat no depèn de quin worker rep la
+    petició. S'executa durant la validació del formulari: qualsevol error
+    es registra i retorna una llista buida, de manera que la detecció mai
+    impedeix publicar un event.
+
+    Args:
+        fields (dict): camps de text del candidat (title, description, category, tags)
+        creator: usuari creador
+        scheduled_date (datetime): data programada del candidat
+        exclude_id (int): event que s'està editant (no és duplicat de si mateix)
+        threshold (float): similitud mínima (per defecte SEMANTIC_SEARCH_DUPLICATE_THRESHOLD)
+
+    Returns:
+        list[tuple[Event, float]]: possibles duplicats, de més a menys similar
+    """
+    if creator is None or scheduled_date is None:
+        return []
+
+    try:
+        return _near_duplicates(fields, creator, scheduled_date, exclude_id, threshold, limit)
+    except Exception:
+        logger.warning("No s'ha pogut comprovar si l'event és un duplicat", exc_info=True)
+        return []
+
+
+def _near_duplicates(fields, creator, scheduled_date, exclude_id, threshold, limit):
+    """
+    Cos de find_near_duplicates (sense la gestió d'errors).
+    """
+    conf = _duplicate_settings()
+    threshold = conf["threshold"] if threshold is None else threshold
+
+    window = timedelta(hours=conf["window_hours"])
+    candidates = [
+        pk for pk in Event.objects.filter(
+            creator=creator,
+            scheduled_date__range=(scheduled_date - window, scheduled_date + window),
+        ).values_list("id", flat=True)
+        if pk != exclude_id
+    ]
+    if not candidates:
+        return []
+
+    text = event_text(SimpleNamespace(**{name: fields.get(name) for name in TEXT_FIELDS}))
+    if not text:
+        return []
+
+    # La query s'embedeix amb el model de l'índex (el mateix que els vectors)
+    index = get_index()
+    query_vec = embed_text(text, model=index.model)
+    hits = [
+        (event_id, score)
+        for event_id, score in index.search(query_vec, k=limit, allowed_ids=candidates)
+        if score >= threshold
+    ]
+    return hydrate_events(hits)
+
+
+class _UnionFind:
+    """
+    Conjunts disjunts sobre les files 0..n-1 (compressió de camins).
+    """
+
+    def __init__(self, n: int):
+        self.parent = np.arange(n)
+
+    def find(self, row: int) -> int:
+        root = row
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[row] != root:
+            self.parent[row], row = root, self.parent[row]
+        return root
+
+    def union(self, a: int, b: int):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+
+def duplicate_clusters(threshold: float = None, window_hours: float = None, same_creator: bool = True,
+                       neighbours: int = 10, block_rows: int = None) -> list[dict]:
+    """
+    Agrupa en clústers els events duplicats de tot el catàleg.
+
+    Per a cada event es calculen els veïns més similars amb productes de
+    matrius per blocs (vegeu related.nearest_neighbours). Dos events formen
+    una parella si superen el llindar i, opcionalment, són del mateix
+    creador i estan programats dins la finestra. Els clústers són les
+    components connexes de les parelles (A≈B i B≈C agrupa A, B i C).
+
+    Args:
+        threshold (float): similitud mínima
+        window_hours (float): distància màxima entre dates (0 = sense límit)
+        same_creator (bool): només parelles del mateix creador
+        neighbours (int): veïns que es comproven per event
+
+    Returns:
+        list[dict]: clústers {"ids", "min_score", "max_score"}, de més gran a més petit
+    """
+    conf = _duplicate_settings()
+    threshold = conf["threshold"] if threshold is None else threshold
+    window_hours = conf["window_hours"] if window_hours is None else window_hours
+
+    ids, matrix, meta = load_embedding_arrays()
+    n = ids.shape[0]
+    if n < 2:
+        return []
+
+    rows, scores = nearest_neighbours(matrix, np.arange(n), neighbours, block_rows or block_rows_for(n))
+    left = np.repeat(np.arange(n), rows.shape[1])
+    right = rows.reshape(-1)
+    scores = scores.reshape(-1)
+
+    # Una parella pot sortir dues vegades (A veí de B i B de A): no afecta els clústers
+    keep = scores >= threshold
+    if same_creator:
+        creators = dict(Event.objects.values_list("id", "creator_id").iterator())
+        owner = np.array([creators.get(int(event_id), -1) for event_id in ids], dtype=np.int64)
+        keep &= owner[left] == owner[right]
+    if window_hours:
+        # Els events sense data no es comparen per data
+        start, end = meta.scheduled[left], meta.scheduled[right]
+        dated = (start != NO_DATE) & (end != NO_DATE)
+        distance = np.abs(start - np.where(dated, end, start))
+        keep &= dated & (distance <= window_hours * 3600)
+
+    left, right, scores = left[keep], right[keep], scores[keep]
+
+    sets = _UnionFind(n)
+    for a, b in zip(left.tolist(), right.tolist()):
+        sets.union(a, b)
+
+    clusters = {}
+    for a, b, score in zip(left.tolist(), right.tolist(), scores.tolist()):
+        cluster = clusters.setdefault(sets.find(a), {"rows": set(), "scores": []})
+        cluster["rows"].update((a, b))
+        cluster["scores"].append(score)
+
+    result = [
+        {
+            "ids": [int(ids[row]) for row in sorted(cluster["rows"])],
+            "min_score": min(cluster["scores"]),
+            "max_score": max(cluster["scores"]),
+        }
+        for cluster in clusters.values()
+    ]
+    result.sort(key=lambda c: (-len(c["ids"]), -c["max_score"]))
+    return result
@@ -0,0 +1,247 @@
+# semantic_search > Services > embedding_server.py
+
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+import numpy as np
+from .batching import MicroBatcher
+
+# Protocol binari (little-endian) sobre un socket Unix. Cada missatge és una
+# capçalera <BI (operació o estat, longitud del payload) seguida del payload.
+#
+#   OP_ENCODE  petició : <H nombre de textos + per a cada text <I longitud + UTF-8
+#              resposta: <HH (files, dim) + files·dim float32
+#   OP_HEALTH  petició : buit
+#              resposta: JSON UTF-8 amb l'estat del servidor
+#
+# Les respostes porten STATUS_OK o STATUS_ERROR (payload = missatge UTF-8).
+OP_ENCODE = 1
+OP_HEALTH = 2
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+_HEADER = struct.Struct("<BI")
+_COUNT = struct.Struct("<H")
+_LENGTH = struct.Struct("<I")
+_SHAPE = struct.Struct("<HH")
+
+# Màxim de textos per petició (límit del camp <H)
+MAX_TEXTS = 65535
+
+
+class EmbeddingServerError(Exception):
+    """
+    El servidor ha respost amb un error o el protocol no és vàlid.
+    """
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    """
+    Llegeix exactament `size` bytes (o llança ConnectionError si es tanca).
+    """
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:], size - received)
+        if n == 0:
+            raise ConnectionError("Connexió tancada pel servidor d'embeddings")
+        received += n
+    return bytes(buffer)
+
+
+def _send_message(sock: socket.socket, code: int, payload: bytes = b""):
+    sock.sendall(_HEADER.pack(code, len(payload)) + payload)
+
+
+def _recv_message(sock: socket.socket):
+    code, length = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return code, _recv_exact(sock, length) if length else b""
+
+
+def encode_texts_payload(texts: list[str]) -> bytes:
+    parts = [_COUNT.pack(len(texts))]
+    for text in texts:
+        data = text.encode("utf-8")
+        parts.append(_LENGTH.pack(len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def decode_texts_payload(payload: bytes) -> list[str]:
+    (count,) = _COUNT.unpack_from(payload, 0)
+    offset = _COUNT.size
+    texts = []
+    for _ in range(count):
+        (length,) = _LENGTH.unpack_from(payload, offset)
+        offset += _LENGTH.size
+        texts.append(payload[offset:offset + length].decode("utf-8"))
+        offset += length
+    return texts
+
+
+# -------------------------
+# Servidor
+# -------------------------
+class _Handler(socketserver.BaseRequestHandler):
+    """
+    Atén una connexió persistent: processa peticions fins que el client tanca.
+    """
+
+    def handle(self):
+        while True:
+            try:
+                op, payload = _recv_message(self.request)
+            except (ConnectionError, OSError):
+                return
+
+            try:
+                if op == OP_ENCODE:
+                    vecs = self.server.encode(decode_texts_payload(payload))
+                    body = _SHAPE.pack(*vecs.shape) + vecs.astype("<f4", copy=False).tobytes()
+                elif op == OP_HEALTH:
+                    body = json.dumps(self.server.health()).encode("utf-8")
+                else:
+                    raise EmbeddingServerError(f"Operació desconeguda: {op}")
+                _send_message(self.request, STATUS_OK, body)
+            except Exception as exc:
+                _send_message(self.request, STATUS_ERROR, str(exc).encode("utf-8"))
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Servidor local que té l'únic model carregat i embedeix per als workers.
+
+    Cada connexió s'atén en un fil; les crides al model se serialitzen amb
+    un lock (el model ja paral·lelitza internament cada encode).
+
+    Amb `batch_wait` > 0, les peticions petites (queries d'un text) de
+    workers diferents s'agrupen amb un MicroBatcher en un sol encode; les
+    peticions grans (backfill) ja són un batch i van directament al model.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path: str, backend, batch_wait: float = 0, batch_size: int = 32,
+                 batch_pending: int = 256):
+        self.path = str(path)
+        self.backend = backend
+        self.started = time.time()
+        self.requests = 0
+        self.texts = 0
+        self._encode_lock = threading.Lock()
+        self.batcher = (
+            MicroBatcher(self._encode_locked, max_wait=batch_wait, max_batch=batch_size,
+                         max_pending=batch_pending)
+            if batch_wait else None
+        )
+
+        # Un socket antic (p.ex. d'una execució interrompuda) impediria el bind
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+        super().__init__(self.path, _Handler)
+
+    def _encode_locked(self, texts: list[str]) -> np.ndarray:
+        with self._encode_lock:
+            return self.backend.encode(texts)
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        if not texts:
+            vecs = np.empty((0, 0), dtype=np.float32)
+        elif self.batcher is not None and len(texts) < self.batcher.max_batch:
+            vecs = np.stack(self.batcher.encode(texts))
+        else:
+            vecs = self._encode_locked(texts)
+
+        with self._encode_lock:
+            self.requests += 1
+            self.texts += len(texts)
+        return vecs
+
+    def health(self) -> dict:
+        return {
+            "status": "ok",
+            "pid": os.getpid(),
+            "model": self.backend.name,
+            "backend": type(self.backend).__name__,
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "requests": self.requests,
+            "texts": self.texts,
+            "batcher": self.batcher.stats() if self.batcher is not None else {},
+        }
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+# -------------------------
+# Client
+# -------------------------
+class EmbeddingClient:
+    """
+    Client del servidor d'embeddings.
+
+    Manté una connexió oberta per fil (es reutilitza entre peticions) i,
+    si la connexió s'ha trencat, torna a connectar una vegada abans de
+    llançar l'error.
+    """
+
+    def __init__(self, path: str, timeout: float = 5.0):
+        self.path = str(path)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        self._local.sock = sock
+        return sock
+
+    def close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _request(self, op: int, payload: bytes = b"") -> bytes:
+        for attempt in range(2):
+            sock = getattr(self._local, "sock", None) or self._connect()
+            try:
+                _send_message(sock, op, payload)
+                status, body = _recv_message(sock)
+                break
+            except OSError:
+                # Connexió caducada (p.ex. el servidor s'ha reiniciat): reintenta
+                self.close()
+                if attempt:
+                    raise
+
+        if status != STATUS_OK:
+            raise EmbeddingServerError(body.decode("utf-8", "replace"))
+        return body
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        """
+        Embedeix una llista de textos al servidor (matriu (N, dim) float32).
+        """
+        if len(texts) > MAX_TEXTS:
+            raise ValueError(f"Com a molt {MAX_TEXTS} textos per petició")
+
+        body = self._request(OP_ENCODE, encode_texts_payload(texts))
+        rows, dim = _SHAPE.unpack_from(body, 0)
+        return np.frombuffer(body, dtype="<f4", offset=_SHAPE.size).reshape(rows, dim)
+
+    def health(self) -> dict:
+        return json.loads(self._request(OP_HEALTH).decode("utf-8"))
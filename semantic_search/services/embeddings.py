@@ -1,62 +1,464 @@
+import hashlib
+import logging
 import threading
-from sentence_transformers import SentenceTransformer
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import numpy as np
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+from ..models import ActiveEmbeddingModel
+from .backends import EmbeddingBackend, create_backend
+from .batching import MicroBatcher
+from .embedding_server import EmbeddingClient, EmbeddingServerError
 
-# Nom del model d'embeddings (multilingüe, lleuger i ràpid)
+logger = logging.getLogger(__name__)
+
+# Nom del model d'embeddings per defecte (multilingüe, lleuger i ràpid)
 _MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
 
 # Lock per evitar condicions de carrera en carregar el model en entorns multithread
 _lock = threading.Lock()
 
-# Instància global del model (lazy loading)
-_model = None
+# Instància global del backend configurat (lazy loading)
+_backend = None
+
+# Backends d'altres models (canvi de model en curs), per nom
+_backends = {}
+
+# Model actiu llegit de la BD i moment (monotonic) de l'última lectura
+_active_model = None
+_active_checked_at = 0.0
+
+# Client del servidor d'embeddings compartit (si SEMANTIC_SEARCH_EMBEDDING_SOCKET)
+_client = None
 
+# Micro-batchers de les queries concurrents per model (si SEMANTIC_SEARCH_MICROBATCH_MAX_WAIT > 0)
+_batchers = {}
+
+# Model que serveix el servidor d'embeddings (llegit del seu health)
+_server_model = None
+
+
+def _configured_backend() -> EmbeddingBackend:
+    """
+    Retorna el backend configurat (SEMANTIC_SEARCH_BACKEND / SEMANTIC_SEARCH_MODEL),
+    sense carregar-ne el model.
+    """
+    global _backend
+
+    if _backend is None:
+        with _lock:
+            if _backend is None:
+                _backend = create_backend(
+                    getattr(settings, "SEMANTIC_SEARCH_BACKEND", "sentence-transformers"),
+                    getattr(settings, "SEMANTIC_SEARCH_MODEL", _MODEL_NAME),
+                    onnx_dir=getattr(settings, "SEMANTIC_SEARCH_ONNX_DIR", None),
+                    onnx_quantized=getattr(settings, "SEMANTIC_SEARCH_ONNX_QUANTIZED", False),
+                    onnx_threads=getattr(settings, "SEMANTIC_SEARCH_ONNX_THREADS", 0),
+                )
+
+    return _backend
+
+
+def _create_model_backend(name: str) -> EmbeddingBackend:
+    """
+    Backend per a un model diferent del configurat.
 
-def get_model():
+    Els noms "hashing-<dim>" usen el HashingBackend; la resta, el model de
+    sentence-transformers amb aquest nom (el directori ONNX correspon
+    només al model configurat).
     """
-    Retorna una instància singleton del model.
+    if name.startswith("hashing-"):
+        return create_backend("hashing", name, dim=int(name.split("-", 1)[1]))
+    return create_backend("sentence-transformers", name)
 
-    Utilitza double-checked locking per:
+
+def get_backend(model: str = None) -> EmbeddingBackend:
+    """
+    Retorna el backend d'un model (per defecte, el model actiu), sense
+    carregar-ne els pesos.
+    """
+    configured = _configured_backend()
+    name = model or model_name()
+    if name == configured.name:
+        return configured
+
+    if name not in _backends:
+        with _lock:
+            if name not in _backends:
+                _backends[name] = _create_model_backend(name)
+
+    return _backends[name]
+
+
+def get_model(model: str = None) -> EmbeddingBackend:
+    """
+    Retorna el backend d'un model (per defecte, l'actiu) amb el model ja carregat.
+
+    Utilitza double-checked locking (dins de backend.load()) per:
     - Evitar carregar el model múltiples vegades
     - Ser segur en entorns amb múltiples fils
     """
-    global _model
+    return get_backend(model).load()
+
+
+def get_client():
+    """
+    Retorna el client del servidor d'embeddings local, o None si no està configurat.
+    """
+    global _client
+
+    path = getattr(settings, "SEMANTIC_SEARCH_EMBEDDING_SOCKET", None)
+    if not path:
+        return None
+
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = EmbeddingClient(
+                    path, timeout=getattr(settings, "SEMANTIC_SEARCH_EMBEDDING_TIMEOUT", 5.0)
+                )
+
+    return _client
+
+
+def _get_server_model(client):
+    """
+    Model que serveix el servidor d'embeddings (es consulta una vegada).
+    """
+    global _server_model
+    if _server_model is None:
+        _server_model = client.health().get("model")
+    return _server_model
+
+
+def _encode(texts: list[str], batch_size: int = 64, model: str = None):
+    """
+    Embedeix textos amb el servidor compartit o amb el model del procés.
+
+    Es fa servir el servidor si està configurat, serveix el mateix model i
+    aquest procés encara no ha carregat el model. Si el servidor no respon,
+    es carrega el model localment (i a partir d'aquí el procés ja no depèn
+    del servidor).
+    """
+    global _server_model
+
+    name = model or model_name()
+    backend = get_backend(name)
+    client = get_client()
+
+    if client is not None and not backend.loaded:
+        try:
+            if _get_server_model(client) == name:
+                parts = [
+                    client.encode(texts[start:start + batch_size])
+                    for start in range(0, len(texts), batch_size)
+                ]
+                return np.concatenate(parts)
+        except (OSError, EmbeddingServerError):
+            _server_model = None
+            logger.warning("Servidor d'embeddings no disponible; es carrega el model localment",
+                           exc_info=True)
+
+    return backend.load().encode(texts, batch_size=batch_size)
+
+
+def get_batcher(model: str):
+    """
+    Retorna el micro-batcher de queries d'un model, o None si està desactivat.
+    """
+    max_wait = getattr(settings, "SEMANTIC_SEARCH_MICROBATCH_MAX_WAIT", 0)
+    if not max_wait:
+        return None
+
+    if model not in _batchers:
+        with _lock:
+            if model not in _batchers:
+                _batchers[model] = MicroBatcher(
+                    lambda texts: _encode(texts, model=model),
+                    max_wait=max_wait,
+                    max_batch=getattr(settings, "SEMANTIC_SEARCH_MICROBATCH_MAX_SIZE", 32),
+                    max_pending=getattr(settings, "SEMANTIC_SEARCH_MICROBATCH_MAX_PENDING", 256),
+                )
+
+    return _batchers[model]
+
+
+def batcher_stats() -> dict:
+    """
+    Mètriques dels micro-batchers per model (buit si està desactivat o no s'ha usat).
+    """
+    return {model: batcher.stats() for model, batcher in list(_batchers.items())}
+
+
+class QueryEmbeddingCache:
+    """
+    Cache LRU + TTL en memòria per als embeddings de queries.
+
+    - Les entrades més antigues en ús s'eliminen quan se supera `maxsize`
+    - Les entrades caducades (`ttl` segons) es descarten en llegir-les
+    - Opcionalment consulta un segon nivell compartit (cache de Django),
+      de manera que una query calculada en un worker serveix a tots
+
+    Els comptadors (hits, misses, evictions...) permeten dimensionar-la.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600, shared_alias: str = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.shared_alias = shared_alias
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _shared(self):
+        """
+        Retorna la cache de Django configurada com a segon nivell (o None).
+        """
+        if not self.shared_alias:
+            return None
+        from django.core.cache import caches
+        return caches[self.shared_alias]
+
+    def _put_local(self, key: str, vec: np.ndarray):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, vec)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, key: str):
+        """
+        Retorna el vector guardat (np.ndarray float32) o None.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires, vec = entry
+                if expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return vec
+                del self._data[key]
+                self.expirations += 1
+
+        shared = self._shared()
+        if shared is not None:
+            raw = shared.get(key)
+            if raw is not None:
+                vec = np.frombuffer(raw, dtype=np.float32)
+                self._put_local(key, vec)
+                with self._lock:
+                    self.shared_hits += 1
+                return vec
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, vec: np.ndarray):
+        """
+        Guarda un vector als dos nivells de la cache.
+        """
+        vec = np.asarray(vec, dtype=np.float32)
+        vec.setflags(write=False)
+        self._put_local(key, vec)
+
+        shared = self._shared()
+        if shared is not None:
+            shared.set(key, vec.tobytes(), timeout=self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        """
+        Retorna els comptadors de la cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            }
 
-    # Primera comprovació (ràpida, sense lock)
-    if _model is None:
-        # Només un fil entra aquí alhora
+
+# Instància global de la cache de queries (lazy, per llegir la configuració)
+_query_cache = None
+
+
+def get_query_cache() -> QueryEmbeddingCache:
+    """
+    Retorna la cache de queries del procés (la crea la primera vegada).
+    """
+    global _query_cache
+
+    if _query_cache is None:
         with _lock:
-            # Segona comprovació (per si un altre fil ja l'ha carregat)
-            if _model is None:
-                _model = SentenceTransformer(_MODEL_NAME)
+            if _query_cache is None:
+                _query_cache = QueryEmbeddingCache(
+                    maxsize=getattr(settings, "SEMANTIC_SEARCH_QUERY_CACHE_SIZE", 1024),
+                    ttl=getattr(settings, "SEMANTIC_SEARCH_QUERY_CACHE_TTL", 3600),
+                    shared_alias=getattr(settings, "SEMANTIC_SEARCH_QUERY_CACHE_ALIAS", None),
+                )
+
+    return _query_cache
 
-    return _model
+
+def normalize_text(text: str) -> str:
+    """
+    Normalitza un text abans d'embedir-lo: Unicode NFC i espais col·lapsats.
+
+    Així "concerts " i "concerts", o un accent escrit amb caràcters combinats,
+    comparteixen entrada de cache (i el mateix vector).
+    """
+    text = unicodedata.normalize("NFC", text or "")
+    return " ".join(text.split())
 
 
-def embed_text(text: str) -> list[float]:
+def _cache_key(text: str, model: str) -> str:
+    """
+    Clau de cache: depèn del text normalitzat i del model.
+    """
+    digest = hashlib.sha1(f"{model}\0{text}".encode("utf-8")).hexdigest()
+    return f"semantic_search:query:{digest}"
+
+
+def embed_text(text: str, model: str = None) -> list[float]:
     """
     Converteix un text en un embedding (vector numèric).
 
     - Normalitza el vector (norma = 1) per poder usar directament similitud cosinus amb dot product
+    - Reutilitza el vector de la cache si el mateix text ja s'ha embedit
     - Retorna una llista de floats per facilitar serialització (JSON, BD, etc.)
+
+    `model` permet embedir amb el model de l'índex que es consultarà (per
+    defecte, el model actiu).
     """
     # Normalització bàsica de l'entrada
-    text = (text or "").strip()
+    text = normalize_text(text)
 
     # Evita processar textos buits
     if not text:
         return []
 
-    # Obté el model (lazy load)
-    model = get_model()
+    # Les queries repetides no passen pel model
+    model = model or model_name()
+    cache = get_query_cache()
+    key = _cache_key(text, model)
+    vec = cache.get(key)
 
-    # encode retorna una llista d'embeddings → [0] perquè només hi ha un text
-    vec = model.encode([text], normalize_embeddings=True)[0]
+    if vec is None:
+        batcher = get_batcher(model)
+        if batcher is not None:
+            # S'agrupa amb les altres queries que arriben alhora (un sol encode);
+            # si el fil del batcher no respon a temps, es cancel·la (perquè no
+            # l'embedeixi també) i s'embedeix directament
+            future = batcher.submit(text)
+            try:
+                vec = future.result(timeout=getattr(settings, "SEMANTIC_SEARCH_MICROBATCH_TIMEOUT", 5.0))
+            except FutureTimeoutError:
+                future.cancel()
+                logger.warning("El micro-batcher no ha respost a temps; s'embedeix la query directament")
+
+        if vec is None:
+            # Servidor compartit o model local (lazy load);
+            # encode retorna una matriu d'embeddings → [0] perquè només hi ha un text
+            vec = _encode([text], model=model)[0]
+        cache.set(key, vec)
 
     return vec.tolist()
 
 
+def embed_texts(texts: list[str], batch_size: int = 64, model: str = None) -> list[list[float]]:
+    """
+    Embedeix una llista de textos amb una sola crida batched al model.
+
+    Pensat per a processos massius (backfill): no passa per la cache de
+    queries. Els textos buits retornen una llista buida a la seva posició.
+    `model` per defecte és el model actiu.
+    """
+    texts = [normalize_text(t) for t in texts]
+    positions = [i for i, t in enumerate(texts) if t]
+    result = [[] for _ in texts]
+
+    if not positions:
+        return result
+
+    vecs = _encode([texts[i] for i in positions], batch_size=batch_size, model=model)
+
+    for i, vec in zip(positions, vecs):
+        result[i] = vec.tolist()
+
+    return result
+
+
+def configured_model_name() -> str:
+    """
+    Nom del model configurat (SEMANTIC_SEARCH_MODEL), actiu mentre no se n'activi un altre.
+    """
+    return _configured_backend().name
+
+
 def model_name() -> str:
     """
-    Retorna el nom del model actual (útil per logs o debug).
+    Retorna el nom del model actiu (útil per logs o debug).
+
+    És el valor que es guarda a Event.embedding_model i el model de l'índex
+    que serveix les cerques; no carrega el model. Es llegeix de la fila
+    ActiveEmbeddingModel com a molt cada SEMANTIC_SEARCH_REFRESH_SECONDS;
+    si no n'hi ha, és el model configurat.
+    """
+    global _active_model, _active_checked_at
+
+    interval = getattr(settings, "SEMANTIC_SEARCH_REFRESH_SECONDS", 30)
+    now = time.monotonic()
+
+    if _active_checked_at == 0.0 or (interval and now - _active_checked_at >= interval):
+        try:
+            row = ActiveEmbeddingModel.objects.order_by("-id").first()
+        except DatabaseError:
+            # Taula encara no migrada: es manté el model configurat
+            row = None
+        _active_model = row.name if row is not None else None
+        _active_checked_at = now
+
+    return _active_model or configured_model_name()
+
+
+def set_active_model(name: str):
+    """
+    Canvia el model actiu amb una sola escriptura (la fila ActiveEmbeddingModel).
+
+    Els altres processos ho veuen en la pròxima lectura de model_name().
     """
-    return _MODEL_NAME
\ No newline at end of file
+    global _active_model, _active_checked_at
+
+    previous = model_name()
+    row = ActiveEmbeddingModel.objects.order_by("-id").first()
+    if row is None:
+        row = ActiveEmbeddingModel()
+
+    row.name = name
+    row.previous = previous
+    row.activated_at = timezone.now()
+    row.save()
+
+    _active_model = name
+    _active_checked_at = time.monotonic()
@@ -0,0 +1,69 @@
+# semantic_search > Services > hybrid.py
+
+from django.conf import settings
+from .index import get_index
+from .lexical import get_lexical_index
+from .ranker import reciprocal_rank_fusion
+
+
+def _hybrid_settings():
+    """
+    Retorna la configuració de la cerca híbrida.
+    """
+    return {
+        "enabled": getattr(settings, "SEMANTIC_SEARCH_HYBRID", True),
+        "candidates": getattr(settings, "SEMANTIC_SEARCH_HYBRID_CANDIDATES", 100),
+        "rrf_k": getattr(settings, "SEMANTIC_SEARCH_RRF_K", 60),
+        "lexical_min_ratio": getattr(settings, "SEMANTIC_SEARCH_LEXICAL_MIN_RATIO", 0.3),
+    }
+
+
+def hybrid_search(query: str, query_vec, k: int = 20, min_score: float = None,
+                  category=None, status=None, scheduled_from=None) -> list[tuple[int, float]]:
+    """
+    Cerca híbrida: similitud cosinus (embeddings) + BM25 (paraules), fusionades amb RRF.
+
+    1. Obté els millors candidats de cada índex amb els mateixos filtres.
+    2. Descarta el soroll de cada rànquing: els candidats semàntics per sota
+       de `min_score` i els de BM25 per sota de SEMANTIC_SEARCH_LEXICAL_MIN_RATIO
+       vegades el millor score BM25 de la query.
+    3. Ordena per la fusió dels dos rànquings (Reciprocal Rank Fusion).
+
+    El score RRF només serveix per ordenar: cada resultat es retorna amb la
+    seva similitud cosinus, o None si només l'ha trobat BM25.
+
+    Amb SEMANTIC_SEARCH_HYBRID = False només es fa la cerca semàntica.
+
+    Args:
+        query (str): text de la query (per a BM25)
+        query_vec: embedding de la query (pot ser buit)
+        k (int): nombre màxim de resultats
+        min_score (float): llindar de similitud cosinus opcional
+        category, status, scheduled_from: filtres (vegeu EmbeddingIndex.search)
+
+    Returns:
+        list[tuple[int, float | None]]: [(event_id, cosinus), ...] en ordre de rànquing
+    """
+    conf = _hybrid_settings()
+    filters = {"category": category, "status": status, "scheduled_from": scheduled_from}
+
+    candidates = max(k, conf["candidates"]) if conf["enabled"] else k
+
+    vector_hits = []
+    if query_vec:
+        vector_hits = get_index().search(query_vec, k=candidates, **filters)
+        if min_score is not None:
+            vector_hits = [(event_id, score) for event_id, score in vector_hits if score >= min_score]
+
+    if not conf["enabled"]:
+        return vector_hits[:k]
+
+    lexical_hits = get_lexical_index().search(query, k=candidates, **filters)
+    if lexical_hits:
+        floor = conf["lexical_min_ratio"] * lexical_hits[0][1]
+        lexical_hits = [(event_id, score) for event_id, score in lexical_hits if score >= floor]
+
+    fused = reciprocal_rank_fusion([vector_hits, lexical_hits], k=conf["rrf_k"], limit=k)
+
+    cosine = dict(vector_hits)
+    return [(event_id, cosine.get(event_id)) for event_id, _ in fused]
@@ -0,0 +1,938 @@
+# semantic_search > Services > index.py
+
+import logging
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from events.models import Event
+from ..models import EventEmbedding
+from .embeddings import model_name
+from .ann import IVFIndex
+from .lexical import load_postings, postings_extras
+from .metadata import META_FIELDS, MetaArrays, deleted_event_ids, encode_meta, load_meta_arrays
+from .quantize import Int8Matrix, rerank_top_k, spill_to_disk
+from .ranker import group_max, max_sim, top_k_indices
+from . import snapshot
+
+logger = logging.getLogger(__name__)
+
+
+def _as_vector(embedding, dim: int = None):
+    """
+    Converteix un embedding (array o llista de floats) a un vector float32 normalitzat.
+
+    Retorna None si l'embedding és buit, nul o no té la dimensió esperada.
+    """
+    if embedding is None or len(embedding) == 0:
+        return None
+
+    vec = np.asarray(embedding, dtype=np.float32).reshape(-1)
+
+    if dim is not None and vec.shape[0] != dim:
+        return None
+
+    norm = np.linalg.norm(vec)
+    if norm == 0 or not np.isfinite(norm):
+        return None
+
+    # Normalitzem perquè el dot product sigui exactament la similitud cosinus
+    return vec / norm
+
+
+def _as_matrix(chunks, dim: int):
+    """
+    Converteix els vectors de fragments (concatenats) en una matriu (M, dim)
+    float32 amb les files normalitzades, o None si no n'hi ha cap de vàlid.
+    """
+    if chunks is None or dim is None or len(chunks) == 0 or len(chunks) % dim:
+        return None
+
+    matrix = np.asarray(chunks, dtype=np.float32).reshape(-1, dim)
+    norms = np.linalg.norm(matrix, axis=1)
+    valid = (norms > 0) & np.isfinite(norms)
+    if not valid.any():
+        return None
+
+    return matrix[valid] / norms[valid, None]
+
+
+def embedding_dimension(queryset=None, model: str = None):
+    """
+    Dimensió majoritària dels vectors d'un model (None si no n'hi ha cap).
+
+    Es compten les longituds dels vectors d'Event.embedding d'aquest model
+    o, si no n'hi ha cap (p.ex. un model encara no activat), les
+    d'EventEmbedding. Així uns quants vectors antics amb una altra
+    dimensió no decideixen la mida de la matriu.
+    """
+    if queryset is None:
+        queryset = Event.objects.all()
+
+    counts = Counter()
+    for embedding, embedding_model in queryset.values_list("embedding", "embedding_model").iterator():
+        if embedding is not None and len(embedding) and (model is None or embedding_model == model):
+            counts[len(embedding)] += 1
+
+    if not counts and model is not None:
+        stored = EventEmbedding.objects.filter(model=model).values_list("embedding", flat=True)
+        for embedding in stored.iterator():
+            if embedding is not None and len(embedding):
+                counts[len(embedding)] += 1
+
+    if not counts:
+        return None
+    return counts.most_common(1)[0][0]
+
+
+def load_embedding_arrays(queryset=None, model: str = None):
+    """
+    Llegeix (id, embedding) de la BD i els empaqueta en arrays contigus.
+
+    Només es demanen aquestes columnes i les filtrables (categoria, estat i
+    data), ordenades per id, i es descarten els embeddings buits o amb una
+    dimensió diferent de la majoritària (vegeu embedding_dimension), que
+    es compta abans de reservar la matriu.
+
+    Amb `model`, Event.embedding només es fa servir si és d'aquest model;
+    per a la resta d'events el vector es llegeix d'EventEmbedding (p.ex.
+    just després d'activar un model nou, o per construir-ne l'índex abans
+    d'activar-lo). Els events sense vector d'aquest model queden fora.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, MetaArrays]: ids (N,) int64, matriu
+        (N, dim) float32 i metadades filtrables de cada fila
+    """
+    if queryset is None:
+        queryset = Event.objects.all()
+
+    queryset = queryset.order_by("id")
+    dim = embedding_dimension(queryset, model)
+    if dim is None:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32), MetaArrays.empty(0)
+
+    capacity = queryset.count()
+    ids = np.empty(capacity, dtype=np.int64)
+    matrix = np.empty((capacity, dim), dtype=np.float32)
+    meta = MetaArrays.empty(capacity)
+    n = 0
+    mismatched = 0
+
+    # Events amb el vector d'un altre model: {id: metadades}
+    other_model = {}
+
+    def put(event_id, embedding, event_meta_codes):
+        nonlocal n, mismatched
+        if embedding is None or len(embedding) == 0:
+            return
+        if len(embedding) != dim:
+            mismatched += 1
+            return
+
+        vec = _as_vector(embedding, dim)
+        if vec is None:
+            return
+
+        ids[n] = event_id
+        matrix[n] = vec
+        meta.set(n, event_meta_codes)
+        n += 1
+
+    rows = queryset.values_list("id", "embedding", "embedding_model", *META_FIELDS).iterator()
+    for event_id, embedding, embedding_model, category, status, scheduled_date in rows:
+        if n + mismatched + len(other_model) >= capacity:
+            # S'han creat events durant la lectura; els recuperarà el catch-up
+            break
+
+        codes = encode_meta(category, status, scheduled_date)
+        if model is not None and embedding_model != model:
+            other_model[event_id] = codes
+            continue
+
+        put(event_id, embedding, codes)
+
+    if other_model:
+        pending = list(other_model)
+        for start in range(0, len(pending), 1000):
+            chunk = pending[start:start + 1000]
+            stored = (
+                EventEmbedding.objects
+                .filter(model=model, event_id__in=chunk)
+                .values_list("event_id", "embedding")
+            )
+            for event_id, embedding in stored:
+                put(event_id, embedding, other_model[event_id])
+
+    if mismatched:
+        logger.warning(
+            "%d embeddings descartats de l'índex: no tenen la dimensió del model (%d)",
+            mismatched, dim,
+        )
+
+    ids, matrix, meta = ids[:n], matrix[:n], meta.take(slice(0, n))
+
+    if other_model:
+        # Les files afegides des d'EventEmbedding trenquen l'ordre per id
+        order = np.argsort(ids, kind="stable")
+        ids, matrix, meta = ids[order], matrix[order], meta.take(order)
+
+    return ids, matrix, meta
+
+
+def load_chunk_arrays(dim: int, model: str = None):
+    """
+    Llegeix els vectors dels fragments addicionals dels events amb text llarg.
+
+    Es llegeixen d'EventEmbedding (on són per a tots els models), només
+    les files que en tenen, ordenades per event.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: ids de l'event de cada fragment (M,)
+        int64, agrupats, i matriu (M, dim) float32
+    """
+    model = model or model_name()
+    ids, parts = [], []
+
+    if dim:
+        rows = (
+            EventEmbedding.objects.filter(model=model, chunks__isnull=False)
+            .order_by("event_id").values_list("event_id", "chunks").iterator()
+        )
+        for event_id, chunks in rows:
+            matrix = _as_matrix(chunks, dim)
+            if matrix is not None:
+                ids.append(np.full(matrix.shape[0], event_id, dtype=np.int64))
+                parts.append(matrix)
+
+    if not parts:
+        return np.empty(0, dtype=np.int64), np.empty((0, dim or 0), dtype=np.float32)
+
+    return np.concatenate(ids), np.concatenate(parts)
+
+
+def _ann_settings():
+    """
+    Retorna la configuració del motor de cerca (exacte o IVF).
+    """
+    return {
+        "engine": getattr(settings, "SEMANTIC_SEARCH_ENGINE", "exact"),
+        "nlist": getattr(settings, "SEMANTIC_SEARCH_IVF_NLIST", 0),
+        "nprobe": getattr(settings, "SEMANTIC_SEARCH_IVF_NPROBE", 16),
+        "min_rows": getattr(settings, "SEMANTIC_SEARCH_ANN_MIN_ROWS", 50000),
+        "quantization": getattr(settings, "SEMANTIC_SEARCH_QUANTIZATION", None),
+        "rerank": getattr(settings, "SEMANTIC_SEARCH_RERANK_CANDIDATES", 256),
+    }
+
+
+def build_ann(matrix: np.ndarray):
+    """
+    Entrena l'índex IVF per a la matriu base si el motor configurat és "ivf"
+    i hi ha prou files perquè valgui la pena; altrament retorna None.
+    """
+    conf = _ann_settings()
+    if conf["engine"] != "ivf" or matrix is None or matrix.shape[0] < conf["min_rows"]:
+        return None
+    return IVFIndex.train(matrix, nlist=conf["nlist"])
+
+
+def build_quantized(matrix: np.ndarray):
+    """
+    Quantitza la matriu base a int8 si SEMANTIC_SEARCH_QUANTIZATION = "int8";
+    altrament retorna None.
+    """
+    if _ann_settings()["quantization"] != "int8" or matrix is None or matrix.shape[0] == 0:
+        return None
+    return Int8Matrix.from_matrix(matrix)
+
+
+class _DeltaBuffer:
+    """
+    Segment petit i mutable amb els events inserits o modificats després de
+    construir la base. Creix geomètricament i elimina amb swap de l'última
+    fila per mantenir la matriu contigua.
+    """
+
+    def __init__(self, dim: int, capacity: int = 256):
+        self.dim = dim
+        self.size = 0
+        self.matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.meta = MetaArrays.empty(capacity)
+        # event_id -> fila de la matriu
+        self.pos = {}
+        # event_id -> matriu dels fragments addicionals (només events llargs)
+        self.chunks = {}
+
+    def upsert(self, event_id: int, vec: np.ndarray, meta: tuple, chunks: np.ndarray = None):
+        row = self.pos.get(event_id)
+        if row is None:
+            if self.size == self.matrix.shape[0]:
+                capacity = 2 * self.size
+                matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+                ids = np.zeros(capacity, dtype=np.int64)
+                matrix[:self.size] = self.matrix
+                ids[:self.size] = self.ids
+                self.matrix, self.ids = matrix, ids
+                self.meta = self.meta.resized(capacity)
+
+            row = self.size
+            self.size += 1
+            self.pos[event_id] = row
+            self.ids[row] = event_id
+
+        self.matrix[row] = vec
+        self.meta.set(row, meta)
+
+        if chunks is not None:
+            self.chunks[event_id] = chunks
+        else:
+            self.chunks.pop(event_id, None)
+
+    def remove(self, event_id: int):
+        self.chunks.pop(event_id, None)
+        row = self.pos.pop(event_id, None)
+        if row is None:
+            return
+
+        last = self.size - 1
+        if row != last:
+            moved_id = int(self.ids[last])
+            self.matrix[row] = self.matrix[last]
+            self.ids[row] = moved_id
+            self.meta.set(row, self.meta.get(last))
+            self.pos[moved_id] = row
+
+        self.size = last
+
+    def chunk_rows(self):
+        """
+        Fragments addicionals del segment: (files a què pertanyen, matriu), o None.
+        """
+        if not self.chunks:
+            return None
+
+        rows = [np.full(m.shape[0], self.pos[event_id], dtype=np.int64) for event_id, m in self.chunks.items()]
+        return np.concatenate(rows), np.concatenate(list(self.chunks.values()))
+
+
+class EmbeddingIndex:
+    """
+    Índex vectorial resident a la memòria del procés.
+
+    Està format per dos segments:
+    - base: matriu contigua (N, dim) float32 amb els embeddings normalitzats
+      i un array paral·lel d'ids ordenats. Pot venir de la BD o d'un snapshot
+      en disc obert amb np.memmap (compartit entre workers pel page cache).
+    - delta: buffer petit en memòria amb els canvis posteriors.
+
+    Les files de la base que queden obsoletes es marquen com a eliminades
+    (tombstones), així la base no s'ha de modificar mai. Una cerca és un
+    producte matriu-vector per segment seguit d'un top-k amb argpartition.
+
+    Amb SEMANTIC_SEARCH_ENGINE = "ivf" la base es consulta amb un índex
+    aproximat (IVFIndex) i només es puntuen les llistes més properes.
+
+    Cada segment porta també arrays paral·lels amb la categoria, l'estat i
+    la data de cada fila (MetaArrays), de manera que els filtres de la cerca
+    s'apliquen com a màscares abans de puntuar, sense consultar la BD.
+
+    Amb SEMANTIC_SEARCH_QUANTIZATION = "int8" la cerca exacta de la base
+    recorre una còpia int8 de la matriu (4 vegades menys bytes) i només
+    els millors candidats es reordenen amb la matriu float32.
+
+    Els events amb text llarg tenen diversos vectors (un per fragment): la
+    fila de l'event és el primer i la resta van en una matriu a part. El
+    score de l'event és el màxim dels seus fragments (max-sim).
+    """
+
+    def __init__(self, ids=None, matrix=None, version: str = "db", synced_at=None,
+                 ann=None, quant=None, meta=None, model: str = None, chunks=None):
+        # Lock per protegir els segments durant escriptures i cerques concurrents
+        self._lock = threading.RLock()
+
+        if ids is None or matrix is None or matrix.ndim != 2 or matrix.shape[1] == 0:
+            ids = np.empty(0, dtype=np.int64)
+            matrix = None
+
+        self._base_ids = ids
+        self._base_matrix = matrix
+        self._base_alive = np.ones(ids.shape[0], dtype=bool)
+        self._base_live = int(ids.shape[0])
+        self._base_meta = meta if meta is not None else MetaArrays.empty(ids.shape[0])
+        self._dim = matrix.shape[1] if matrix is not None else None
+        self._delta = _DeltaBuffer(self._dim) if self._dim else None
+        self._ann = ann
+        self._quant = quant
+
+        # Fragments addicionals de la base: fila de l'event (agrupades) i matriu
+        self._chunk_rows = np.empty(0, dtype=np.int64)
+        self._chunk_matrix = None
+        if chunks is not None and matrix is not None and chunks[0].shape[0]:
+            chunk_ids, chunk_matrix = chunks
+            rows = np.minimum(np.searchsorted(ids, chunk_ids), max(ids.shape[0] - 1, 0))
+            found = ids[rows] == chunk_ids
+            self._chunk_rows = rows[found]
+            self._chunk_matrix = chunk_matrix[found] if not found.all() else chunk_matrix
+
+        self.version = version
+        self.synced_at = synced_at
+
+        # Moment (monotonic) de l'última comparació completa d'ids (vegeu catch_up)
+        self.reconciled_at = 0.0
+
+        # Model dels vectors de l'índex; les queries s'han d'embedir amb el mateix
+        self.model = model or model_name()
+
+        # Comptador de modificacions; amb el token d'instància forma `revision`
+        self.generation = 0
+        self._token = uuid.uuid4().hex[:8]
+
+    def __len__(self):
+        return self._base_live + (self._delta.size if self._delta else 0)
+
+    @property
+    def revision(self) -> str:
+        """
+        Identificador de l'estat de l'índex: canvia amb cada upsert, canvi de
+        metadades o eliminació, i amb cada índex nou (snapshot o reconstrucció).
+        """
+        return f"{self.version}:{self._token}:{self.generation}"
+
+    @property
+    def dim(self):
+        return self._dim
+
+    @classmethod
+    def from_db(cls, model: str = None):
+        """
+        Construeix l'índex llegint només (id, embedding) de tots els events,
+        amb els vectors del model indicat (per defecte, l'actiu).
+
+        Amb quantització int8, la matriu float32 es bolca a un fitxer
+        temporal mapejat (com si vingués d'un snapshot).
+        """
+        model = model or model_name()
+        synced_at = timezone.now()
+        ids, matrix, meta = load_embedding_arrays(model=model)
+        dim = matrix.shape[1] if matrix.ndim == 2 else None
+
+        ann = build_ann(matrix)
+        quant = build_quantized(matrix)
+        if quant is not None:
+            # Amb int8 la matriu float32 només serveix per reordenar: es passa a
+            # un fitxer mapejat perquè no ocupi memòria al costat dels codis
+            matrix = spill_to_disk(matrix)
+
+        return cls(
+            ids, matrix, version="db", synced_at=synced_at,
+            ann=ann, quant=quant, meta=meta, model=model,
+            chunks=load_chunk_arrays(dim, model),
+        )
+
+    @classmethod
+    def from_snapshot(cls, manifest: dict):
+        """
+        Construeix l'índex a partir d'un snapshot en disc (memmap).
+
+        Retorna None si el snapshot no existeix, és d'un altre model o està
+        malmès (checksum, amb SEMANTIC_SEARCH_SNAPSHOT_VERIFY); en aquest cas
+        cal tornar a llegir la BD.
+        """
+        if manifest is None or manifest.get("model") != model_name():
+            return None
+
+        arrays = snapshot.load_snapshot(manifest, verify=getattr(settings, "SEMANTIC_SEARCH_SNAPSHOT_VERIFY", True))
+        if arrays is None:
+            return None
+
+        ids, matrix = arrays
+        synced_at = datetime.fromisoformat(manifest["synced_at"])
+
+        # Les llistes IVF i la matriu int8 es precalculen en generar el snapshot
+        conf = _ann_settings()
+        extras = snapshot.load_snapshot_extras(manifest)
+
+        ann = None
+        if conf["engine"] == "ivf":
+            if {"ivf_centroids", "ivf_order", "ivf_offsets"} <= extras.keys():
+                ann = IVFIndex(extras["ivf_centroids"], extras["ivf_order"], extras["ivf_offsets"])
+            else:
+                ann = build_ann(matrix)
+
+        quant = None
+        if conf["quantization"] == "int8":
+            if {"quant_codes", "quant_scale", "quant_offset"} <= extras.keys():
+                quant = Int8Matrix(extras["quant_codes"], extras["quant_scale"], extras["quant_offset"])
+            else:
+                quant = build_quantized(matrix)
+
+        # Les metadades es copien a memòria: s'actualitzen quan canvia un event
+        if {"meta_category", "meta_status", "meta_scheduled"} <= extras.keys():
+            meta = MetaArrays(
+                np.array(extras["meta_category"]),
+                np.array(extras["meta_status"]),
+                np.array(extras["meta_scheduled"]),
+            )
+        else:
+            meta = load_meta_arrays(ids)
+
+        # Fragments addicionals (snapshots antics: es llegeixen de la BD)
+        if {"chunk_ids", "chunk_matrix"} <= extras.keys():
+            chunks = (extras["chunk_ids"], extras["chunk_matrix"])
+        else:
+            chunks = load_chunk_arrays(matrix.shape[1], manifest["model"])
+
+        index = cls(
+            ids, matrix, version=manifest["version"], synced_at=synced_at,
+            ann=ann, quant=quant, meta=meta, model=manifest["model"], chunks=chunks,
+        )
+
+        # Recupera els canvis fets des que es va generar el snapshot
+        index.catch_up()
+        return index
+
+    def event_ids(self) -> np.ndarray:
+        """
+        Ids dels events que té l'índex (base sense tombstones + delta).
+        """
+        with self._lock:
+            parts = [np.asarray(self._base_ids[self._base_alive])]
+            if self._delta is not None:
+                parts.append(self._delta.ids[:self._delta.size].copy())
+        return np.concatenate(parts)
+
+    def _base_row(self, event_id: int):
+        """
+        Retorna la fila de la base per a un id (cerca binària) o None.
+        """
+        ids = self._base_ids
+        row = int(np.searchsorted(ids, event_id))
+        if row < ids.shape[0] and ids[row] == event_id:
+            return row
+        return None
+
+    def _kill_base_row(self, event_id: int):
+        row = self._base_row(event_id)
+        if row is not None and self._base_alive[row]:
+            self._base_alive[row] = False
+            self._base_live -= 1
+
+    def _current_meta(self, event_id: int):
+        """
+        Metadades que l'índex té ara per a un event (o None si no hi és).
+        """
+        if self._delta is not None and event_id in self._delta.pos:
+            return self._delta.meta.get(self._delta.pos[event_id])
+
+        row = self._base_row(event_id)
+        if row is not None and self._base_alive[row]:
+            return self._base_meta.get(row)
+
+        return None
+
+    def upsert(self, event_id: int, embedding, meta: tuple = None, chunks=None):
+        """
+        Insereix o actualitza l'embedding d'un event.
+
+        `meta` són les metadades filtrables (vegeu metadata.encode_meta);
+        si no es passen, es conserven les que ja tenia l'event.
+        `chunks` són els vectors dels fragments addicionals, concatenats
+        (Event.embedding_chunks); None si el text és d'un sol fragment.
+        Si l'embedding no és vàlid, l'event s'elimina de l'índex.
+        """
+        with self._lock:
+            if self._dim is None and embedding is not None and len(embedding) > 0:
+                # La dimensió es fixa amb el primer vector vàlid
+                self._dim = len(embedding)
+                self._delta = _DeltaBuffer(self._dim)
+
+            vec = _as_vector(embedding, self._dim)
+            if vec is None:
+                self.remove(event_id)
+                return
+
+            if meta is None:
+                meta = self._current_meta(event_id) or encode_meta(None, None, None)
+
+            self._kill_base_row(event_id)
+            self._delta.upsert(event_id, vec, meta, _as_matrix(chunks, self._dim))
+            self.generation += 1
+
+    def set_meta(self, event_id: int, meta: tuple):
+        """
+        Actualitza les metadades filtrables d'un event sense tocar-ne el vector.
+        """
+        with self._lock:
+            self.generation += 1
+
+            if self._delta is not None and event_id in self._delta.pos:
+                self._delta.meta.set(self._delta.pos[event_id], meta)
+                return
+
+            row = self._base_row(event_id)
+            if row is not None and self._base_alive[row]:
+                self._base_meta.set(row, meta)
+
+    def remove(self, event_id: int):
+        """
+        Elimina un event de l'índex.
+        """
+        with self._lock:
+            self._kill_base_row(event_id)
+            if self._delta is not None:
+                self._delta.remove(event_id)
+            self.generation += 1
+
+    def catch_up(self, since=None):
+        """
+        Aplica els embeddings actualitzats a la BD des de `since`.
+
+        Cobreix els canvis fets per altres processos (els signals només
+        arriben al procés que ha fet el save). Els embeddings es recuperen
+        per `embedding_updated_at` i les metadades filtrables per `updated_at`.
+        Els vectors d'un altre model (un procés que encara no ha vist el
+        canvi de model) s'ignoren: l'índex mai barreja models.
+
+        Els esborrats es llegeixen del registre EventDeletion; de tant en
+        tant es comparen tots els ids (vegeu metadata.deleted_event_ids).
+        """
+        since = since or self.synced_at
+        started = timezone.now()
+
+        for event_id in deleted_event_ids(self, since):
+            self.remove(int(event_id))
+
+        qs = Event.objects.all()
+        if since is not None:
+            qs = qs.filter(embedding_updated_at__gte=since)
+
+        rows = qs.values_list(
+            "id", "embedding", "embedding_chunks", "embedding_model", *META_FIELDS
+        ).iterator()
+        for event_id, embedding, chunks, embedding_model, category, status, scheduled_date in rows:
+            if embedding is not None and embedding_model != self.model:
+                continue
+            self.upsert(event_id, embedding, encode_meta(category, status, scheduled_date), chunks)
+
+        if since is not None:
+            qs = Event.objects.filter(updated_at__gte=since)
+            for event_id, category, status, scheduled_date in qs.values_list("id", *META_FIELDS).iterator():
+                self.set_meta(event_id, encode_meta(category, status, scheduled_date))
+
+        self.synced_at = started
+
+    def _base_top_k(self, q, k, allowed, filters):
+        """
+        Puntua la base (aproximat si hi ha IVF, exacte altrament).
+        """
+        mask = self._base_alive
+        filter_mask = self._base_meta.mask(mask.shape[0], **filters)
+        if filter_mask is not None:
+            mask = mask & filter_mask
+
+        if self._ann is not None:
+            if allowed is not None:
+                mask = mask & np.isin(self._base_ids, allowed)
+
+            nprobe = _ann_settings()["nprobe"]
+            rows, scores = self._ann.search(self._base_matrix, q, k, nprobe, mask=mask)
+
+            # Amb filtres molt selectius les llistes explorades poden no tenir
+            # prou candidats: en aquest cas es fa la cerca exacta
+            if rows.shape[0] >= k or rows.shape[0] == int(mask.sum()):
+                if self._chunk_matrix is not None:
+                    rows, scores = self._merge_chunk_hits(rows, scores, q, k, mask)
+                return self._base_ids[rows], scores
+
+        if self._quant is not None:
+            approx = self._quant.scores(q)
+            chunk_best = self._chunk_best(q)
+            if chunk_best is not None:
+                approx[chunk_best[0]] = np.maximum(approx[chunk_best[0]], chunk_best[1])
+            approx[~mask] = -np.inf
+            if allowed is not None:
+                approx[~np.isin(self._base_ids, allowed)] = -np.inf
+
+            candidates = _ann_settings()["rerank"]
+            if chunk_best is None:
+                rows, scores = rerank_top_k(self._base_matrix, q, approx, k, candidates)
+                return self._base_ids[rows], scores
+
+            # Es reordenen tots els candidats i després s'hi aplica el max-sim
+            rows, scores = rerank_top_k(self._base_matrix, q, approx, candidates, candidates)
+            pos = np.searchsorted(chunk_best[0], rows)
+            hit = pos < chunk_best[0].shape[0]
+            hit[hit] = chunk_best[0][pos[hit]] == rows[hit]
+            scores[hit] = np.maximum(scores[hit], chunk_best[1][pos[hit]])
+            top = top_k_indices(scores, k)
+            return self._base_ids[rows[top]], scores[top]
+
+        chunks = (self._chunk_rows, self._chunk_matrix) if self._chunk_matrix is not None else None
+        return self._segment_top_k(self._base_ids, self._base_matrix, q, k, mask, allowed, chunks)
+
+    def _chunk_best(self, q):
+        """
+        Millor score de fragment per a cada fila de la base que en té: (files, scores), o None.
+        """
+        if self._chunk_matrix is None:
+            return None
+        return group_max(self._chunk_rows, np.asarray(self._chunk_matrix @ q, dtype=np.float32))
+
+    def _merge_chunk_hits(self, rows, scores, q, k, mask):
+        """
+        Afegeix als resultats de l'IVF les files amb algun fragment entre els
+        millors (els fragments no són a les llistes IVF i es puntuen tots).
+        """
+        targets, best = self._chunk_best(q)
+        keep = mask[targets]
+        rows = np.concatenate([rows, targets[keep]])
+        scores = np.concatenate([scores, best[keep]])
+
+        order = np.argsort(rows, kind="stable")
+        rows, scores = group_max(rows[order], scores[order])
+        top = top_k_indices(scores, k)
+        return rows[top], scores[top]
+
+    def _segment_top_k(self, ids, matrix, q, k, mask, allowed, chunks=None):
+        """
+        Puntua un segment i retorna (ids, scores) dels seus k millors.
+
+        `chunks` són els fragments addicionals del segment (files, matriu):
+        cada fila es queda amb el score del seu millor fragment.
+        """
+        scores = np.asarray(matrix @ q, dtype=np.float32)
+
+        if chunks is not None:
+            max_sim(scores, chunks[0], np.asarray(chunks[1] @ q, dtype=np.float32))
+
+        if mask is not None:
+            scores[~mask] = -np.inf
+        if allowed is not None:
+            scores[~np.isin(ids, allowed)] = -np.inf
+
+        top = top_k_indices(scores, k)
+        return ids[top], scores[top]
+
+    def search(self, query_vec, k: int = 20, allowed_ids=None, category=None,
+               status=None, scheduled_from=None) -> list[tuple[int, float]]:
+        """
+        Retorna els k events més similars a la query.
+
+        Els filtres de categoria, estat i data s'apliquen amb les metadades
+        de l'índex, sense consultar la BD.
+
+        Args:
+            query_vec: embedding de la query
+            k (int): nombre màxim de resultats
+            allowed_ids: iterable opcional d'ids permesos (filtre)
+            category: categoria o llista de categories permeses
+            status: estat o llista d'estats permesos
+            scheduled_from (datetime): només events programats a partir d'aquest instant
+
+        Returns:
+            list[tuple[int, float]]: [(event_id, score), ...] ordenat per score
+        """
+        q = _as_vector(query_vec, self._dim)
+        if q is None:
+            return []
+
+        allowed = None
+        if allowed_ids is not None:
+            allowed = np.fromiter(allowed_ids, dtype=np.int64)
+
+        filters = {"category": category, "status": status, "scheduled_from": scheduled_from}
+
+        with self._lock:
+            parts = []
+
+            if self._base_live:
+                parts.append(self._base_top_k(q, k, allowed, filters))
+
+            if self._delta is not None and self._delta.size:
+                n = self._delta.size
+                parts.append(self._segment_top_k(
+                    self._delta.ids[:n], self._delta.matrix[:n], q, k,
+                    self._delta.meta.mask(n, **filters), allowed, self._delta.chunk_rows()
+                ))
+
+        if not parts:
+            return []
+
+        # Fusió dels candidats de cada segment
+        ids = np.concatenate([p[0] for p in parts])
+        scores = np.concatenate([p[1] for p in parts])
+
+        return [
+            (int(ids[i]), float(scores[i]))
+            for i in top_k_indices(scores, k)
+            if np.isfinite(scores[i])
+        ]
+
+
+def write_index_snapshot(model: str = None, directory=None, publish: bool = True) -> dict:
+    """
+    Genera el snapshot en disc de l'índex d'un model (per defecte, l'actiu).
+
+    A més dels ids i la matriu inclou les metadades filtrables i, si estan
+    activades, les llistes IVF, la matriu int8 i les postings BM25, perquè
+    els workers no les hagin de calcular.
+
+    Returns:
+        dict: manifest (publicat o no segons `publish`)
+    """
+    model = model or model_name()
+
+    # Els canvis posteriors a aquest instant els recuperarà el catch-up dels workers
+    synced_at = timezone.now()
+    ids, matrix, meta = load_embedding_arrays(model=model)
+
+    # Metadades filtrables (categoria, estat, data) paral·leles a les files
+    extras = {
+        "meta_category": meta.category,
+        "meta_status": meta.status,
+        "meta_scheduled": meta.scheduled,
+    }
+
+    # Fragments addicionals dels events amb text llarg
+    chunk_ids, chunk_matrix = load_chunk_arrays(matrix.shape[1] if matrix.ndim == 2 else None, model)
+    if chunk_ids.shape[0]:
+        extras.update({"chunk_ids": chunk_ids, "chunk_matrix": chunk_matrix})
+
+    # Amb el motor IVF, les llistes s'entrenen aquí i no a cada worker
+    ann = build_ann(matrix)
+    if ann is not None:
+        extras.update({
+            "ivf_centroids": ann.centroids,
+            "ivf_order": ann.order,
+            "ivf_offsets": ann.offsets,
+        })
+
+    # Amb quantització, la matriu int8 també es comparteix via memmap
+    quant = build_quantized(matrix)
+    if quant is not None:
+        extras.update({
+            "quant_codes": quant.codes,
+            "quant_scale": quant.scale,
+            "quant_offset": quant.offset,
+        })
+
+    # Postings de l'índex BM25, perquè els workers tampoc hagin de llegir els textos
+    if getattr(settings, "SEMANTIC_SEARCH_HYBRID", True):
+        extras.update(postings_extras(load_postings()))
+
+    return snapshot.write_snapshot(
+        ids, matrix, model, synced_at, directory=directory, extras=extras, publish=publish
+    )
+
+
+def hydrate_events(hits: list[tuple[int, float]]) -> list[tuple[Event, float]]:
+    """
+    Carrega només els events guanyadors amb una sola consulta (in_bulk),
+    mantenint l'ordre del ranking.
+
+    Segona fase de la cerca: el rànquing ja s'ha fet a l'índex, així que
+    l'embedding (el camp més gran de la fila) no es torna a llegir.
+    """
+    if not hits:
+        return []
+
+    events = Event.objects.defer("embedding").in_bulk([event_id for event_id, _ in hits])
+
+    return [
+        (events[event_id], score)
+        for event_id, score in hits
+        if event_id in events
+    ]
+
+
+# Lock per evitar construir l'índex diverses vegades en paral·lel
+_lock = threading.Lock()
+
+# Instància global de l'índex (lazy loading)
+_index = None
+
+# Moment (monotonic) de l'última comprovació de snapshot / canvis
+_checked_at = 0.0
+
+
+def _build_index() -> EmbeddingIndex:
+    """
+    Construeix l'índex des del snapshot vigent o, si no n'hi ha, des de la BD.
+    """
+    index = EmbeddingIndex.from_snapshot(snapshot.read_manifest())
+    if index is None:
+        index = EmbeddingIndex.from_db()
+    return index
+
+
+def _refresh(index: EmbeddingIndex) -> EmbeddingIndex:
+    """
+    Comprova si hi ha un snapshot nou (i el carrega) o recupera els canvis
+    fets per altres processos des de l'última sincronització.
+
+    Si s'ha activat un altre model i no n'hi ha snapshot, l'índex del model
+    nou es construeix des de la BD.
+    """
+    manifest = snapshot.read_manifest()
+
+    if manifest is not None and manifest.get("version") != index.version:
+        fresh = EmbeddingIndex.from_snapshot(manifest)
+        if fresh is not None:
+            return fresh
+
+    if index.model != model_name():
+        return EmbeddingIndex.from_db()
+
+    index.catch_up()
+    return index
+
+
+def get_index() -> EmbeddingIndex:
+    """
+    Retorna l'índex singleton del procés, construint-lo la primera vegada.
+
+    Utilitza double-checked locking, igual que get_model(). Cada
+    SEMANTIC_SEARCH_REFRESH_SECONDS es comprova si hi ha un snapshot nou;
+    el canvi d'índex és atòmic (una sola assignació de referència).
+    """
+    global _index, _checked_at
+
+    if _index is None:
+        with _lock:
+            if _index is None:
+                _index = _build_index()
+                _checked_at = time.monotonic()
+
+    interval = getattr(settings, "SEMANTIC_SEARCH_REFRESH_SECONDS", 30)
+    if interval and time.monotonic() - _checked_at >= interval:
+        # Només un fil fa la comprovació; la resta continua amb l'índex actual
+        if _lock.acquire(blocking=False):
+            try:
+                _checked_at = time.monotonic()
+                _index = _refresh(_index)
+            finally:
+                _lock.release()
+
+    return _index
+
+
+def peek_index():
+    """
+    Retorna l'índex només si ja s'ha construït (None altrament).
+
+    Els signals l'utilitzen per no forçar una càrrega completa en un save.
+    """
+    return _index
+
+
+def reset_index():
+    """
+    Descarta l'índex actual; es tornarà a construir a la pròxima cerca.
+    """
+    global _index
+    with _lock:
+        _index = None
@@ -0,0 +1,510 @@
+# semantic_search > Services > lexical.py
+
+import math
+import threading
+import time
+import uuid
+from array import array
+from collections import Counter
+from datetime import datetime
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from events.models import Event
+from .metadata import META_FIELDS, MetaArrays, deleted_event_ids, encode_meta, meta_matcher
+from .ranker import top_k_indices
+from .text import tokenize
+from . import snapshot
+
+# Camps de l'Event indexats per paraules
+LEXICAL_FIELDS = ("title", "description", "tags")
+
+# Paràmetres estàndard de BM25 (saturació del tf i normalització per longitud)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Paraules buides en català i castellà (sense accents, com les retorna tokenize).
+# Apareixen a gairebé tots els events: no ajuden a ordenar i farien recórrer
+# totes les postings a cada query.
+STOPWORDS = frozenset("""
+    al als amb com de del dels el els en es ha hi ho ja la les li lo los me mes
+    ni no per pel pels pero perque que qui se si sa ses seu seus seva seves son
+    sobre te un una uns unes on quan fins entre sense molt tambe aquest aquesta
+    aquests aquestes aquell aquella
+    con las le mas mi para por sin su sus unos unas ya muy como este esta estos
+    estas ese esa hay desde hasta cuando donde
+""".split())
+
+# Longitud màxima d'un terme indexat (els més llargs no es busquen mai)
+MAX_TERM_LENGTH = 40
+
+
+def lexical_text(title, description, tags) -> str:
+    """
+    Text indexat per BM25 (títol, descripció i tags).
+    """
+    return " ".join(part for part in (title, description, tags) if part)
+
+
+def lexical_terms(text: str) -> list[str]:
+    """
+    Termes d'un text per a BM25: tokenize sense paraules buides ni termes massa llargs.
+    """
+    return [t for t in tokenize(text) if t not in STOPWORDS and len(t) <= MAX_TERM_LENGTH]
+
+
+def build_postings(docs) -> dict:
+    """
+    Construeix les postings en format CSR a partir de (event_id, text, meta)
+    ordenats per id.
+
+    - terms: termes ordenats (bytes UTF-8), per cercar-los amb searchsorted
+    - offsets: les postings del terme i són les posicions offsets[i]:offsets[i+1]
+    - rows: fila del document de cada posting (int32)
+    - tf: freqüència del terme al document (float32)
+    - ids, lengths, meta: id, nombre de termes i metadades de cada fila
+
+    Returns:
+        dict: arguments de BM25Index
+    """
+    vocab = {}
+    ids, lengths, metas = [], [], []
+    term_col, row_col, tf_col = array("i"), array("i"), array("f")
+
+    for row, (event_id, text, meta) in enumerate(docs):
+        counts = Counter(lexical_terms(text))
+        ids.append(event_id)
+        lengths.append(sum(counts.values()))
+        metas.append(meta)
+
+        for term, tf in counts.items():
+            term_col.append(vocab.setdefault(term, len(vocab)))
+            row_col.append(row)
+            tf_col.append(tf)
+
+    # Els termes es renumeren en ordre alfabètic (l'ordre dels bytes UTF-8 és
+    # el mateix que el dels caràcters)
+    words = sorted(vocab)
+    rank = np.empty(len(words), dtype=np.int32)
+    rank[np.fromiter((vocab[w] for w in words), dtype=np.int64, count=len(words))] = np.arange(len(words))
+    term_col = rank[np.frombuffer(term_col, dtype=np.int32)]
+
+    # Postings agrupades per terme i, dins de cada terme, per fila
+    order = np.argsort(term_col, kind="stable")
+    offsets = np.zeros(len(words) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(term_col, minlength=len(words)), out=offsets[1:])
+
+    meta = MetaArrays.empty(len(ids))
+    for row, codes in enumerate(metas):
+        meta.set(row, codes)
+
+    return {
+        "terms": np.array([w.encode("utf-8") for w in words], dtype="S") if words else np.empty(0, dtype="S1"),
+        "offsets": offsets,
+        "rows": np.frombuffer(row_col, dtype=np.int32)[order],
+        "tf": np.frombuffer(tf_col, dtype=np.float32)[order],
+        "ids": np.array(ids, dtype=np.int64),
+        "lengths": np.array(lengths, dtype=np.float32),
+        "meta": meta,
+    }
+
+
+def load_postings() -> dict:
+    """
+    Llegeix les columnes de text i de filtre de tots els events (ordenats per id)
+    i en construeix les postings (vegeu build_postings).
+    """
+    rows = Event.objects.order_by("id").values_list("id", *LEXICAL_FIELDS, *META_FIELDS).iterator()
+    docs = (
+        (event_id, lexical_text(title, description, tags), encode_meta(category, status, scheduled_date))
+        for event_id, title, description, tags, category, status, scheduled_date in rows
+    )
+    return build_postings(docs)
+
+
+# Arrays addicionals del snapshot amb l'índex BM25 (prefix per no barrejar-los amb els vectorials)
+SNAPSHOT_EXTRAS = (
+    "bm25_terms", "bm25_offsets", "bm25_rows", "bm25_tf", "bm25_ids", "bm25_lengths",
+    "bm25_category", "bm25_status", "bm25_scheduled",
+)
+
+
+def postings_extras(postings: dict) -> dict:
+    """
+    Converteix el resultat de build_postings en arrays addicionals del snapshot.
+    """
+    meta = postings["meta"]
+    return {
+        "bm25_terms": postings["terms"],
+        "bm25_offsets": postings["offsets"],
+        "bm25_rows": postings["rows"],
+        "bm25_tf": postings["tf"],
+        "bm25_ids": postings["ids"],
+        "bm25_lengths": postings["lengths"],
+        "bm25_category": meta.category,
+        "bm25_status": meta.status,
+        "bm25_scheduled": meta.scheduled,
+    }
+
+
+class BM25Index:
+    """
+    Índex invertit amb puntuació BM25.
+
+    Està format per dos segments, com l'índex vectorial:
+    - base: postings en format CSR (arrays de NumPy, vegeu build_postings)
+      amb els ids, les longituds i les metadades filtrables de cada fila.
+      Una query suma les contribucions de cada terme amb np.bincount.
+    - delta: diccionaris petits amb els events inserits o modificats després
+      de construir la base (terme -> {event_id: freqüència}).
+
+    Les files de la base que queden obsoletes es marquen com a eliminades
+    (tombstones), així la base no s'ha de modificar mai. Per això la base pot
+    venir d'un snapshot en disc obert amb np.memmap, com la matriu vectorial.
+
+    Complementa la cerca semàntica: troba coincidències exactes (noms
+    propis, equips, artistes) que els embeddings poden no prioritzar.
+    """
+
+    def __init__(self, terms=None, offsets=None, rows=None, tf=None, ids=None,
+                 lengths=None, meta=None, version: str = "db", synced_at=None):
+        # Lock per protegir les estructures durant escriptures i cerques concurrents
+        self._lock = threading.RLock()
+
+        if ids is None:
+            terms = np.empty(0, dtype="S1")
+            offsets = np.zeros(1, dtype=np.int64)
+            rows = np.empty(0, dtype=np.int32)
+            tf = np.empty(0, dtype=np.float32)
+            ids = np.empty(0, dtype=np.int64)
+            lengths = np.empty(0, dtype=np.float32)
+            meta = MetaArrays.empty(0)
+
+        self._terms = terms
+        self._offsets = offsets
+        self._post_rows = rows
+        self._post_tf = tf
+        self._base_ids = ids
+        self._base_len = lengths
+        self._base_meta = meta
+        self._base_alive = np.ones(ids.shape[0], dtype=bool)
+        self._base_live = int(ids.shape[0])
+        self._base_total_len = float(lengths.sum(dtype=np.float64))
+
+        # Segment delta: terme -> {event_id: tf} i dades de cada event
+        self._postings = {}
+        self._doc_terms = {}
+        self._doc_len = {}
+        self._doc_meta = {}
+        self._total_len = 0
+
+        self.version = version
+        self.synced_at = synced_at
+
+        # Moment (monotonic) de l'última comparació completa d'ids (vegeu catch_up)
+        self.reconciled_at = 0.0
+
+        # Comptador de modificacions; amb el token d'instància forma `revision`
+        self.generation = 0
+        self._token = uuid.uuid4().hex[:8]
+
+    def __len__(self):
+        return self._base_live + len(self._doc_len)
+
+    @property
+    def revision(self) -> str:
+        """
+        Identificador de l'estat de l'índex (canvia amb cada upsert o eliminació).
+        """
+        return f"{self._token}:{self.generation}"
+
+    @classmethod
+    def from_db(cls):
+        """
+        Construeix l'índex llegint només les columnes de text i de filtre.
+        """
+        synced_at = timezone.now()
+        return cls(**load_postings(), synced_at=synced_at)
+
+    @classmethod
+    def from_snapshot(cls, manifest: dict):
+        """
+        Construeix l'índex a partir de les postings del snapshot en disc (memmap).
+
+        Retorna None si no hi ha snapshot, està malmès o no porta l'índex
+        BM25; en aquest cas cal tornar a llegir la BD.
+        """
+        if manifest is None:
+            return None
+
+        if getattr(settings, "SEMANTIC_SEARCH_SNAPSHOT_VERIFY", True) and not snapshot.verify_snapshot(manifest):
+            return None
+
+        extras = snapshot.load_snapshot_extras(manifest)
+        if not set(SNAPSHOT_EXTRAS) <= extras.keys():
+            return None
+
+        index = cls(
+            terms=extras["bm25_terms"],
+            offsets=extras["bm25_offsets"],
+            rows=extras["bm25_rows"],
+            tf=extras["bm25_tf"],
+            ids=extras["bm25_ids"],
+            lengths=extras["bm25_lengths"],
+            # La base no es modifica mai: les metadades es poden quedar mapejades
+            meta=MetaArrays(extras["bm25_category"], extras["bm25_status"], extras["bm25_scheduled"]),
+            version=manifest["version"],
+            synced_at=datetime.fromisoformat(manifest["synced_at"]),
+        )
+
+        # Recupera els canvis fets des que es va generar el snapshot
+        index.catch_up()
+        return index
+
+    def _kill_base_row(self, event_id: int) -> bool:
+        ids = self._base_ids
+        row = int(np.searchsorted(ids, event_id))
+        if row < ids.shape[0] and ids[row] == event_id and self._base_alive[row]:
+            self._base_alive[row] = False
+            self._base_live -= 1
+            self._base_total_len -= float(self._base_len[row])
+            return True
+        return False
+
+    def _term_range(self, term: str) -> tuple[int, int]:
+        """
+        Posicions (inici, final) de les postings d'un terme a la base.
+        """
+        key = term.encode("utf-8")
+        i = int(np.searchsorted(self._terms, key))
+        if i < self._terms.shape[0] and self._terms[i] == key:
+            return int(self._offsets[i]), int(self._offsets[i + 1])
+        return 0, 0
+
+    def upsert(self, event_id: int, text: str, meta: tuple):
+        """
+        Indexa (o reindexa) el text d'un event al segment delta.
+        """
+        terms = Counter(lexical_terms(text))
+
+        with self._lock:
+            self.remove(event_id)
+
+            for term, tf in terms.items():
+                self._postings.setdefault(term, {})[event_id] = tf
+
+            length = sum(terms.values())
+            self._doc_terms[event_id] = tuple(terms)
+            self._doc_len[event_id] = length
+            self._doc_meta[event_id] = meta
+            self._total_len += length
+            self.generation += 1
+
+    def remove(self, event_id: int):
+        """
+        Elimina un event de l'índex.
+        """
+        with self._lock:
+            if self._kill_base_row(event_id):
+                self.generation += 1
+
+            terms = self._doc_terms.pop(event_id, None)
+            if terms is None:
+                return
+
+            self.generation += 1
+
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is not None:
+                    postings.pop(event_id, None)
+                    if not postings:
+                        del self._postings[term]
+
+            self._total_len -= self._doc_len.pop(event_id)
+            self._doc_meta.pop(event_id, None)
+
+    def event_ids(self) -> np.ndarray:
+        """
+        Ids dels events que té l'índex (base sense tombstones + delta).
+        """
+        with self._lock:
+            return np.concatenate([
+                np.asarray(self._base_ids[self._base_alive]),
+                np.fromiter(self._doc_len, dtype=np.int64, count=len(self._doc_len)),
+            ])
+
+    def catch_up(self, since=None):
+        """
+        Reindexa els events modificats a la BD des de `since` (altres processos)
+        i elimina els esborrats (vegeu metadata.deleted_event_ids).
+        """
+        since = since or self.synced_at
+        started = timezone.now()
+
+        for event_id in deleted_event_ids(self, since):
+            self.remove(int(event_id))
+
+        qs = Event.objects.all()
+        if since is not None:
+            qs = qs.filter(updated_at__gte=since)
+
+        rows = qs.values_list("id", *LEXICAL_FIELDS, *META_FIELDS).iterator()
+        for event_id, title, description, tags, category, status, scheduled_date in rows:
+            self.upsert(
+                event_id,
+                lexical_text(title, description, tags),
+                encode_meta(category, status, scheduled_date),
+            )
+
+        self.synced_at = started
+
+    def search(self, query: str, k: int = 20, category=None, status=None,
+               scheduled_from=None) -> list[tuple[int, float]]:
+        """
+        Retorna els k events amb més puntuació BM25 per a la query.
+
+        Accepta els mateixos filtres que EmbeddingIndex.search.
+
+        Returns:
+            list[tuple[int, float]]: [(event_id, score), ...] ordenat per score
+        """
+        terms = set(lexical_terms(query))
+        if not terms:
+            return []
+
+        with self._lock:
+            n = len(self)
+            if n == 0:
+                return []
+            avg_len = (self._base_total_len + self._total_len) / n
+
+            base_rows, base_scores, delta_scores = [], [], {}
+            for term in terms:
+                start, end = self._term_range(term)
+                postings = self._postings.get(term)
+
+                df = (end - start) + (len(postings) if postings else 0)
+                if df == 0:
+                    continue
+                idf = math.log(1.0 + max(n - df + 0.5, 0.0) / (df + 0.5))
+
+                if end > start:
+                    rows = self._post_rows[start:end]
+                    tf = self._post_tf[start:end]
+                    norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self._base_len[rows] / avg_len)
+                    base_rows.append(rows)
+                    base_scores.append(idf * tf * (BM25_K1 + 1.0) / (tf + norm))
+
+                for event_id, tf in (postings or {}).items():
+                    norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self._doc_len[event_id] / avg_len)
+                    delta_scores[event_id] = delta_scores.get(event_id, 0.0) + idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+
+            hits = []
+            if base_rows:
+                scores = np.bincount(
+                    np.concatenate(base_rows), weights=np.concatenate(base_scores),
+                    minlength=self._base_ids.shape[0],
+                )
+                mask = self._base_alive
+                filter_mask = self._base_meta.mask(mask.shape[0], category, status, scheduled_from)
+                if filter_mask is not None:
+                    mask = mask & filter_mask
+                scores[~mask] = 0.0
+
+                hits = [
+                    (int(self._base_ids[i]), float(scores[i]))
+                    for i in top_k_indices(scores, k)
+                    if scores[i] > 0.0
+                ]
+
+            matches = meta_matcher(category, status, scheduled_from)
+            if matches is not None:
+                delta_scores = {
+                    event_id: score for event_id, score in delta_scores.items()
+                    if matches(self._doc_meta[event_id])
+                }
+
+        hits.extend(delta_scores.items())
+        return sorted(hits, key=lambda item: item[1], reverse=True)[:k]
+
+
+# Lock per evitar construir l'índex diverses vegades en paral·lel
+_lock = threading.Lock()
+
+# Instància global de l'índex BM25 (lazy loading)
+_index = None
+
+# Moment (monotonic) de l'última recuperació de canvis
+_checked_at = 0.0
+
+
+def _build_index() -> BM25Index:
+    """
+    Construeix l'índex des del snapshot vigent o, si no n'hi ha, des de la BD.
+    """
+    index = BM25Index.from_snapshot(snapshot.read_manifest())
+    if index is None:
+        index = BM25Index.from_db()
+    return index
+
+
+def _refresh(index: BM25Index) -> BM25Index:
+    """
+    Carrega el snapshot nou si n'hi ha o recupera els canvis fets per
+    altres processos des de l'última sincronització.
+    """
+    manifest = snapshot.read_manifest()
+
+    if manifest is not None and manifest.get("version") != index.version:
+        fresh = BM25Index.from_snapshot(manifest)
+        if fresh is not None:
+            return fresh
+
+    index.catch_up()
+    return index
+
+
+def get_lexical_index() -> BM25Index:
+    """
+    Retorna l'índex BM25 del procés, construint-lo la primera vegada.
+
+    Igual que l'índex vectorial, es carrega del snapshot si n'hi ha i cada
+    SEMANTIC_SEARCH_REFRESH_SECONDS comprova si n'hi ha un de nou o
+    recupera els events modificats per altres processos.
+    """
+    global _index, _checked_at
+
+    if _index is None:
+        with _lock:
+            if _index is None:
+                _index = _build_index()
+                _checked_at = time.monotonic()
+
+    interval = getattr(settings, "SEMANTIC_SEARCH_REFRESH_SECONDS", 30)
+    if interval and time.monotonic() - _checked_at >= interval:
+        # Només un fil fa la comprovació; la resta continua amb l'índex actual
+        if _lock.acquire(blocking=False):
+            try:
+                _checked_at = time.monotonic()
+                _index = _refresh(_index)
+            finally:
+                _lock.release()
+
+    return _index
+
+
+def peek_lexical_index():
+    """
+    Retorna l'índex BM25 només si ja s'ha construït (None altrament).
+    """
+    return _index
+
+
+def reset_lexical_index():
+    """
+    Descarta l'índex BM25; es tornarà a construir a la pròxima cerca.
+    """
+    global _index
+    with _lock:
+        _index = None
@@ -0,0 +1,216 @@
+# semantic_search > Services > metadata.py
+
+import time
+from datetime import timedelta
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from events.models import Event
+from ..models import EventDeletion
+
+# Columnes d'Event que es repliquen a l'índex per poder filtrar
+META_FIELDS = ("category", "status", "scheduled_date")
+
+# Codis compactes de categoria i estat (posició a les choices del model)
+CATEGORY_CODES = {value: code for code, (value, _) in enumerate(Event.CATEGORY_CHOICES)}
+STATUS_CODES = {value: code for code, (value, _) in enumerate(Event.STATUS_CHOICES)}
+
+# Valor per a categories/estats desconeguts i per a events sense data
+UNKNOWN = -1
+NO_DATE = np.iinfo(np.int64).min
+
+
+def encode_meta(category, status, scheduled_date) -> tuple[int, int, int]:
+    """
+    Converteix els camps filtrables d'un event a (categoria, estat, epoch).
+    """
+    return (
+        CATEGORY_CODES.get(category, UNKNOWN),
+        STATUS_CODES.get(status, UNKNOWN),
+        int(scheduled_date.timestamp()) if scheduled_date is not None else NO_DATE,
+    )
+
+
+def event_meta(event: Event) -> tuple[int, int, int]:
+    """
+    Metadades filtrables d'una instància d'Event.
+    """
+    return encode_meta(event.category, event.status, event.scheduled_date)
+
+
+def _codes(values, table: dict) -> np.ndarray:
+    """
+    Converteix un valor o una llista de valors de choices als seus codis.
+    """
+    if isinstance(values, str):
+        values = [values]
+    return np.array([table.get(v, UNKNOWN) for v in values], dtype=np.int16)
+
+
+class MetaArrays:
+    """
+    Arrays paral·lels a les files d'un segment de l'índex amb les columnes
+    per les quals es pot filtrar:
+
+    - category: int16, codi de la categoria
+    - status: int8, codi de l'estat
+    - scheduled: int64, data programada en segons epoch
+
+    Ocupen 11 bytes per event i permeten aplicar els filtres com a màscares
+    booleanes de NumPy abans de puntuar, sense consultar la BD.
+    """
+
+    def __init__(self, category: np.ndarray, status: np.ndarray, scheduled: np.ndarray):
+        self.category = category
+        self.status = status
+        self.scheduled = scheduled
+
+    @classmethod
+    def empty(cls, capacity: int):
+        return cls(
+            np.full(capacity, UNKNOWN, dtype=np.int16),
+            np.full(capacity, UNKNOWN, dtype=np.int8),
+            np.full(capacity, NO_DATE, dtype=np.int64),
+        )
+
+    def __len__(self):
+        return self.category.shape[0]
+
+    def get(self, row: int) -> tuple[int, int, int]:
+        return int(self.category[row]), int(self.status[row]), int(self.scheduled[row])
+
+    def set(self, row: int, meta: tuple[int, int, int]):
+        self.category[row], self.status[row], self.scheduled[row] = meta
+
+    def take(self, rows):
+        """
+        Retorna una còpia amb les files indicades (slice o índexs).
+        """
+        return MetaArrays(self.category[rows].copy(), self.status[rows].copy(), self.scheduled[rows].copy())
+
+    def resized(self, capacity: int):
+        """
+        Retorna una còpia amb una altra capacitat (les files noves, buides).
+        """
+        grown = MetaArrays.empty(capacity)
+        n = min(capacity, len(self))
+        grown.category[:n] = self.category[:n]
+        grown.status[:n] = self.status[:n]
+        grown.scheduled[:n] = self.scheduled[:n]
+        return grown
+
+    def mask(self, n: int, category=None, status=None, scheduled_from=None):
+        """
+        Màscara booleana de les n primeres files que compleixen els filtres.
+
+        Args:
+            category: valor o llista de valors de Event.CATEGORY_CHOICES
+            status: valor o llista de valors de Event.STATUS_CHOICES
+            scheduled_from (datetime): només events programats a partir d'aquest instant
+
+        Returns:
+            np.ndarray | None: None si no hi ha cap filtre actiu
+        """
+        conditions = []
+
+        if category:
+            conditions.append(np.isin(self.category[:n], _codes(category, CATEGORY_CODES)))
+        if status:
+            conditions.append(np.isin(self.status[:n], _codes(status, STATUS_CODES)))
+        if scheduled_from is not None:
+            conditions.append(self.scheduled[:n] >= int(scheduled_from.timestamp()))
+
+        if not conditions:
+            return None
+        return np.logical_and.reduce(conditions)
+
+
+def meta_matcher(category=None, status=None, scheduled_from=None):
+    """
+    Retorna una funció meta -> bool amb els mateixos filtres que
+    MetaArrays.mask, per a estructures que no són arrays (p.ex. BM25).
+
+    Returns:
+        Callable | None: None si no hi ha cap filtre actiu
+    """
+    if not category and not status and scheduled_from is None:
+        return None
+
+    categories = set(_codes(category, CATEGORY_CODES).tolist()) if category else None
+    statuses = set(_codes(status, STATUS_CODES).tolist()) if status else None
+    since = int(scheduled_from.timestamp()) if scheduled_from is not None else None
+
+    def matches(meta) -> bool:
+        category_code, status_code, scheduled = meta
+        return (
+            (categories is None or category_code in categories)
+            and (statuses is None or status_code in statuses)
+            and (since is None or scheduled >= since)
+        )
+
+    return matches
+
+
+def load_meta_arrays(ids: np.ndarray) -> MetaArrays:
+    """
+    Llegeix de la BD les metadades filtrables dels ids donats (ordenats).
+
+    S'usa amb snapshots antics que no les porten; els ids que ja no
+    existeixen queden amb valors desconeguts.
+    """
+    meta = MetaArrays.empty(ids.shape[0])
+    rows = Event.objects.values_list("id", *META_FIELDS).iterator()
+
+    for event_id, category, status, scheduled_date in rows:
+        row = int(np.searchsorted(ids, event_id))
+        if row < ids.shape[0] and ids[row] == event_id:
+            meta.set(row, encode_meta(category, status, scheduled_date))
+
+    return meta
+
+
+def load_live_ids() -> np.ndarray:
+    """
+    Ids de tots els events que existeixen a la BD (una sola columna).
+    """
+    return np.fromiter(Event.objects.values_list("id", flat=True).iterator(), dtype=np.int64)
+
+
+def deleted_event_ids(index, since) -> np.ndarray:
+    """
+    Ids que té `index` (EmbeddingIndex o BM25Index) d'events ja esborrats.
+
+    Els signals només arriben al procés que ha fet l'esborrat; per als
+    altres, normalment n'hi ha prou de llegir el registre EventDeletion des
+    de `since`. La primera vegada i cada SEMANTIC_SEARCH_RECONCILE_SECONDS
+    es comparen tots els ids de l'índex amb els de la BD, per cobrir els
+    esborrats que no passen pels signals (i els d'un snapshot antic), i es
+    purguen les files velles del registre.
+    """
+    interval = getattr(settings, "SEMANTIC_SEARCH_RECONCILE_SECONDS", 3600)
+    now = time.monotonic()
+
+    if since is None or not index.reconciled_at or (interval and now - index.reconciled_at >= interval):
+        index.reconciled_at = now
+        purge_deletions()
+
+        # Ids abans de llegir la BD: un event creat mentrestant no es pot perdre
+        known = index.event_ids()
+        return known[~np.isin(known, load_live_ids())]
+
+    rows = EventDeletion.objects.filter(deleted_at__gte=since).values_list("event_id", flat=True)
+    deleted = np.fromiter(rows.iterator(), dtype=np.int64)
+    if deleted.shape[0] == 0:
+        return deleted
+
+    # Els que aquest procés ja ha tret (o no ha tingut mai) no canvien l'índex
+    return deleted[np.isin(deleted, index.event_ids())]
+
+
+def purge_deletions():
+    """
+    Esborra les files del registre EventDeletion més antigues que
+    SEMANTIC_SEARCH_DELETION_LOG_DAYS (els índexs les llegeixen en pocs segons).
+    """
+    days = getattr(settings, "SEMANTIC_SEARCH_DELETION_LOG_DAYS", 7)
+    EventDeletion.objects.filter(deleted_at__lt=timezone.now() - timedelta(days=days)).delete()
@@ -0,0 +1,34 @@
+# semantic_search > Services > pool.py
+
+import os
+
+# Funcions que executen els processos del pool del backfill.
+#
+# Aquest mòdul no importa Django ni cap model a nivell de mòdul: amb el mètode
+# d'arrencada "spawn" (Windows, macOS) cada procés fill l'importa de zero,
+# abans que Django estigui configurat. Els imports es fan dins les funcions,
+# després de django.setup().
+
+
+def init_worker(model: str, settings_module: str):
+    """
+    Inicialitzador dels processos del pool: configura Django i carrega el
+    model una sola vegada.
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+
+    import django
+    django.setup()
+
+    from .embeddings import get_model
+    get_model(model)
+
+
+def encode_batch(args):
+    """
+    Funció executada als workers: embedeix els fragments d'un batch d'events.
+    """
+    from .chunking import embed_chunks
+
+    chunk_lists, batch_size, model = args
+    return embed_chunks(chunk_lists, batch_size=batch_size, model=model)
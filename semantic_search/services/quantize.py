@@ -0,0 +1,138 @@
+# semantic_search > Services > quantize.py
+
+import tempfile
+import numpy as np
+from .ranker import top_k_indices
+
+# Files que es processen de cop en quantitzar (limita la memòria temporal)
+_BLOCK_ROWS = 65536
+
+# Files que es converteixen a float32 de cop en puntuar: un bloc petit cap a
+# la cache de la CPU i el producte no ha de tornar a llegir la memòria principal
+_SCORE_BLOCK_ROWS = 1024
+
+
+class Int8Matrix:
+    """
+    Matriu d'embeddings quantitzada a int8 (quantització escalar).
+
+    Cada dimensió d té un rang [offset_d, offset_d + 255·scale_d] i cada
+    valor es guarda com el codi int8 més proper:
+
+        x ≈ offset + scale · (code + 128)
+
+    Ocupa 1 byte per component en lloc de 4. El producte amb una query q
+    es pot calcular directament sobre els codis:
+
+        q·x ≈ (q·scale)·code + q·(offset + 128·scale)
+
+    Els scores són aproximats; s'han de reordenar amb la matriu float32
+    (vegeu `rerank_top_k`).
+    """
+
+    def __init__(self, codes: np.ndarray, scale: np.ndarray, offset: np.ndarray):
+        self.codes = codes
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.offset = np.asarray(offset, dtype=np.float32)
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.codes.nbytes + self.scale.nbytes + self.offset.nbytes)
+
+    @classmethod
+    def from_matrix(cls, matrix: np.ndarray):
+        """
+        Calcula l'escala i l'offset per dimensió (mínim i màxim) i codifica
+        la matriu per blocs, de manera que funciona també amb memmaps.
+        """
+        n, dim = matrix.shape
+        low = np.full(dim, np.inf, dtype=np.float32)
+        high = np.full(dim, -np.inf, dtype=np.float32)
+
+        for start in range(0, n, _BLOCK_ROWS):
+            block = np.asarray(matrix[start:start + _BLOCK_ROWS], dtype=np.float32)
+            np.minimum(low, block.min(axis=0), out=low)
+            np.maximum(high, block.max(axis=0), out=high)
+
+        scale = (high - low) / 255.0
+        # Dimensions constants: qualsevol escala serveix (el codi sempre és -128)
+        scale[scale == 0] = 1.0
+
+        codes = np.empty((n, dim), dtype=np.int8)
+        for start in range(0, n, _BLOCK_ROWS):
+            block = np.asarray(matrix[start:start + _BLOCK_ROWS], dtype=np.float32)
+            scaled = np.rint((block - low) / scale) - 128.0
+            codes[start:start + block.shape[0]] = np.clip(scaled, -128, 127)
+
+        return cls(codes, scale, low)
+
+    def scores(self, q: np.ndarray) -> np.ndarray:
+        """
+        Scores aproximats (N,) float32 de totes les files contra la query.
+        """
+        weights = (q * self.scale).astype(np.float32)
+        bias = np.float32(q @ (self.offset + 128.0 * self.scale))
+
+        n, dim = self.codes.shape
+        out = np.empty(n, dtype=np.float32)
+        buffer = np.empty((_SCORE_BLOCK_ROWS, dim), dtype=np.float32)
+
+        for start in range(0, n, _SCORE_BLOCK_ROWS):
+            block = self.codes[start:start + _SCORE_BLOCK_ROWS]
+            rows = block.shape[0]
+            np.copyto(buffer[:rows], block, casting="unsafe")
+            np.dot(buffer[:rows], weights, out=out[start:start + rows])
+
+        out += bias
+        return out
+
+
+def spill_to_disk(matrix: np.ndarray) -> np.memmap:
+    """
+    Copia una matriu a un fitxer temporal i la retorna mapejada (np.memmap).
+
+    Amb la quantització int8 la matriu float32 només es llegeix per reordenar
+    candidats: mapejada, les seves pàgines són del page cache (el sistema les
+    pot alliberar) i no memòria del procés. El fitxer no té nom i
+    desapareix quan el procés deixa de fer-lo servir.
+    """
+    fh = tempfile.TemporaryFile(prefix="semantic-search-", suffix=".f32")
+    spilled = np.memmap(fh, dtype=np.float32, mode="w+", shape=matrix.shape)
+
+    for start in range(0, matrix.shape[0], _BLOCK_ROWS):
+        spilled[start:start + _BLOCK_ROWS] = matrix[start:start + _BLOCK_ROWS]
+    spilled.flush()
+
+    return spilled
+
+
+def rerank_top_k(matrix: np.ndarray, q: np.ndarray, approx: np.ndarray, k: int, candidates: int):
+    """
+    Reordena amb scores exactes float32 els millors candidats aproximats.
+
+    Només es llegeixen de `matrix` les files candidates, de manera que amb
+    un memmap la matriu float32 no cal que sigui resident a memòria.
+
+    Args:
+        matrix (np.ndarray): matriu float32 original (N, dim)
+        q (np.ndarray): query normalitzada
+        approx (np.ndarray): scores aproximats (N,); -inf per a files excloses
+        k (int): nombre de resultats
+        candidates (int): candidats que es reordenen (>= k)
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (files, scores exactes) ordenats per score
+    """
+    rows = top_k_indices(approx, max(k, candidates))
+    rows = np.sort(rows[np.isfinite(approx[rows])])
+
+    if rows.shape[0] == 0:
+        return rows, np.empty(0, dtype=np.float32)
+
+    exact = np.asarray(matrix[rows], dtype=np.float32) @ q
+    top = top_k_indices(exact, k)
+    return rows[top], exact[top]
@@ -0,0 +1,181 @@
+# semantic_search > Services > queue.py
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.db import close_old_connections
+from events.models import Event
+from .chunking import embed_events
+from .embeddings import model_name
+from .index import peek_index
+from .metadata import META_FIELDS, event_meta
+from .storage import save_embeddings
+from .text import TEXT_FIELDS, event_text
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingQueue:
+    """
+    Cua en memòria amb un fil de fons que embedeix events per batches.
+
+    - enqueue() és O(1) i no bloqueja la petició (els ids repetits es fusionen)
+    - el fil espera fins a `max_wait` segons per agrupar fins a `batch_size` ids
+    - cada batch es llegeix amb una consulta, s'embedeix amb una sola crida
+      al model (tots els fragments dels events junts) i s'escriu amb
+      bulk_update (sense disparar signals)
+
+    Si el procés s'atura amb ids pendents no es perden: els events continuen
+    marcats amb embedding_stale i els recull `backfill_event_embeddings --stale-only`.
+    """
+
+    def __init__(self, batch_size: int = 32, max_wait: float = 0.5):
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        # event_id -> instant (monotonic) en què es va encuar
+        self._pending = OrderedDict()
+        self._cond = threading.Condition()
+        self._thread = None
+        self.processed = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_batch_seconds = 0.0
+        # Retard (encuat → desat) de l'últim event processat
+        self.last_lag_seconds = 0.0
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name="embedding-queue", daemon=True
+            )
+            self._thread.start()
+
+    def enqueue(self, event_id: int):
+        """
+        Afegeix un event a la cua (si ja hi era, manté l'instant original).
+        """
+        with self._cond:
+            self._pending.setdefault(event_id, time.monotonic())
+            self._ensure_thread()
+            self._cond.notify()
+
+    def _take_batch(self) -> dict:
+        """
+        Espera ids pendents i en retorna com a molt `batch_size`.
+        """
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+
+            # Deixa un marge perquè s'acumulin més ids al mateix batch
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = {}
+            while self._pending and len(batch) < self.batch_size:
+                event_id, enqueued_at = self._pending.popitem(last=False)
+                batch[event_id] = enqueued_at
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            started = time.monotonic()
+            try:
+                self._process(batch)
+            except Exception:
+                # Un error no ha d'aturar el fil; els events queden com a obsolets
+                self.errors += 1
+                logger.exception("Error embedint %d events en segon pla", len(batch))
+            finally:
+                close_old_connections()
+
+            finished = time.monotonic()
+            self.batches += 1
+            self.last_batch_seconds = finished - started
+            self.last_lag_seconds = finished - min(batch.values())
+
+    def _process(self, batch: dict):
+        """
+        Embedeix i desa un batch d'ids, i actualitza l'índex del procés.
+        """
+        fields = set(TEXT_FIELDS) | set(META_FIELDS)
+        events = Event.objects.only("id", *fields).filter(id__in=list(batch))
+
+        items = []
+        for e in events:
+            text = event_text(e)
+            if text:
+                items.append((e, text))
+
+        if not items:
+            return
+
+        # El model es fixa un cop: si s'activa un altre model durant el batch,
+        # els vectors es desen amb el model amb què s'han calculat
+        model = model_name()
+        vecs = embed_events([e for e, _ in items], batch_size=self.batch_size, model=model)
+        saved = save_embeddings(items, vecs, model=model)
+
+        # bulk_update no dispara post_save: actualitzem l'índex directament
+        index = peek_index()
+        if index is not None and index.model == model:
+            for e in saved:
+                index.upsert(e.pk, e.embedding, event_meta(e), e.embedding_chunks)
+
+        self.processed += len(saved)
+
+    def stats(self) -> dict:
+        """
+        Retorna la profunditat de la cua i el retard de frescor de la cerca.
+        """
+        with self._cond:
+            depth = len(self._pending)
+            oldest = next(iter(self._pending.values()), None)
+
+        return {
+            "depth": depth,
+            "oldest_pending_seconds": time.monotonic() - oldest if oldest is not None else 0.0,
+            "last_lag_seconds": self.last_lag_seconds,
+            "last_batch_seconds": self.last_batch_seconds,
+            "processed": self.processed,
+            "batches": self.batches,
+            "errors": self.errors,
+        }
+
+
+# Lock per crear la cua una sola vegada
+_lock = threading.Lock()
+
+# Instància global de la cua (lazy loading)
+_queue = None
+
+
+def get_queue() -> EmbeddingQueue:
+    """
+    Retorna la cua d'embeddings del procés (la crea la primera vegada).
+    """
+    global _queue
+
+    if _queue is None:
+        with _lock:
+            if _queue is None:
+                _queue = EmbeddingQueue(
+                    batch_size=getattr(settings, "SEMANTIC_SEARCH_QUEUE_BATCH_SIZE", 32),
+                    max_wait=getattr(settings, "SEMANTIC_SEARCH_QUEUE_MAX_WAIT", 0.5),
+                )
+
+    return _queue
+
+
+def queue_stats():
+    """
+    Estadístiques de la cua, o None si encara no s'ha creat en aquest procés.
+    """
+    return _queue.stats() if _queue is not None else None
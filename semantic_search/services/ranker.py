@@ -1,51 +1,131 @@
 import numpy as np
 
 
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Retorna els índexs dels k scores més alts, ordenats de més a menys.
+
+    Utilitza argpartition (O(N)) per seleccionar els candidats i només ordena
+    els k guanyadors, en lloc d'ordenar tot el vector de scores.
+    """
+    n = scores.shape[0]
+
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+
+    if k < n:
+        # Selecció parcial: els k millors queden a les últimes posicions
+        idx = np.argpartition(scores, n - k)[n - k:]
+    else:
+        idx = np.arange(n)
+
+    # Només ordenem els k candidats (descendent)
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+def group_max(groups: np.ndarray, values: np.ndarray):
+    """
+    Màxim de `values` per a cada grup de posicions consecutives amb el mateix valor a `groups`.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (grups, màxim de cada grup)
+    """
+    if groups.shape[0] == 0:
+        return groups, values
+
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    return groups[starts], np.maximum.reduceat(values, starts)
+
+
+def max_sim(scores: np.ndarray, rows: np.ndarray, chunk_scores: np.ndarray) -> np.ndarray:
+    """
+    Agregació max-sim dels events amb diversos vectors (fragments).
+
+    `scores` té un score per fila (el del primer fragment de cada event) i
+    `chunk_scores` el dels fragments addicionals, que pertanyen a les files
+    `rows` (agrupades). Cada fila es queda amb el millor dels seus fragments.
+    Modifica `scores` i el retorna.
+    """
+    if rows.shape[0]:
+        targets, best = group_max(rows, chunk_scores)
+        scores[targets] = np.maximum(scores[targets], best)
+    return scores
+
+
 def cosine_top_k(query_vec: list[float], items: list[tuple[object, list[float]]], k: int = 20):
     """
     Calcula la similitud cosinus (mitjançant dot product) entre un vector de query
     i una llista d'embeddings.
 
     items: [(event_obj, embedding_list), ...]
-    
+
     Retorna:
         [(event_obj, score), ...] ordenat de més a menys similitud
     """
 
     # Si la query està buida → no hi ha res a comparar
-    if not query_vec:
+    if query_vec is None or len(query_vec) == 0:
         return []
 
     # Convertim a numpy per operacions vectorials eficients
-    q = np.array(query_vec, dtype=np.float32)
+    q = np.asarray(query_vec, dtype=np.float32)
 
     # Evita problemes amb vectors nuls
     if np.linalg.norm(q) == 0:
         return []
 
-    scored = []
+    objs = []
+    rows = []
 
     for obj, emb in items:
-        # Ignorar embeddings buits
-        if not emb:
-            continue
-
-        v = np.array(emb, dtype=np.float32)
-
         # Validacions:
+        # - embedding no buit
         # - mateixa dimensió
-        # - vector no nul
-        if v.shape != q.shape or np.linalg.norm(v) == 0:
+        if emb is None or len(emb) != q.shape[0]:
             continue
 
-        # Com que els embeddings estan normalitzats:
-        # dot product == similitud cosinus
-        score = float(np.dot(q, v))
+        objs.append(obj)
+        rows.append(emb)
+
+    if not rows:
+        return []
+
+    # Una sola matriu (N, dim) i un sol producte matriu-vector
+    matrix = np.asarray(rows, dtype=np.float32)
 
-        scored.append((obj, score))
+    # Com que els embeddings estan normalitzats:
+    # dot product == similitud cosinus
+    scores = matrix @ q
 
-    # Ordenar descendent per score (més similar primer)
-    scored.sort(key=lambda x: x[1], reverse=True)
+    # Descarta vectors nuls
+    scores[~matrix.any(axis=1)] = -np.inf
+
+    return [
+        (objs[i], float(scores[i]))
+        for i in top_k_indices(scores, k)
+        if np.isfinite(scores[i])
+    ]
+
+
+def reciprocal_rank_fusion(rankings, k: int = 60, limit: int = 20) -> list[tuple[int, float]]:
+    """
+    Fusiona diversos rànquings amb Reciprocal Rank Fusion (RRF).
+
+    Cada element rep sum(1 / (k + posició)) sobre els rànquings on apareix.
+    Només depèn de les posicions, així que permet combinar scores en escales
+    diferents (cosinus i BM25) sense calibrar-los.
+
+    Args:
+        rankings: llistes [(id, score), ...] ordenades de millor a pitjor
+        k (int): constant d'esmorteïment (60 és el valor habitual)
+        limit (int): nombre màxim de resultats
+
+    Returns:
+        list[tuple[int, float]]: [(id, score_rrf), ...] ordenat per score
+    """
+    fused = {}
+    for ranking in rankings:
+        for position, (item_id, _) in enumerate(ranking, start=1):
+            fused[item_id] = fused.get(item_id, 0.0) + 1.0 / (k + position)
 
-    # Retornar només els top-k
-    return scored[:k]
\ No newline at end of file
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)[:limit]
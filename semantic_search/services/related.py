@@ -0,0 +1,220 @@
+# semantic_search > Services > related.py
+
+import numpy as np
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Max
+from django.utils import timezone
+from events.models import Event
+from ..models import RelatedEvents
+from .embeddings import model_name
+from .index import load_embedding_arrays
+
+# Memòria màxima de la matriu de similituds d'un bloc (files x N float32)
+_BLOCK_BYTES = 64 * 1024 * 1024
+
+# Files de RelatedEvents escrites per cada escriptura massiva
+_WRITE_BATCH = 1000
+
+
+def _related_settings() -> dict:
+    """
+    Veïns que es precalculen per event i quants se'n mostren al detall.
+    """
+    return {
+        "count": getattr(settings, "SEMANTIC_SEARCH_RELATED_COUNT", 12),
+        "shown": getattr(settings, "SEMANTIC_SEARCH_RELATED_SHOWN", 4),
+    }
+
+
+def pack_ids(ids: np.ndarray) -> bytes:
+    return np.asarray(ids, dtype="<i8").tobytes()
+
+
+def unpack_ids(value) -> np.ndarray:
+    if value is None:
+        return np.empty(0, dtype=np.int64)
+    return np.frombuffer(bytes(value), dtype="<i8")
+
+
+def block_rows_for(n: int) -> int:
+    """
+    Files per bloc perquè la matriu de similituds (bloc x n) càpiga a _BLOCK_BYTES.
+    """
+    return max(1, _BLOCK_BYTES // (4 * max(n, 1)))
+
+
+def nearest_neighbours(matrix: np.ndarray, rows: np.ndarray, count: int, block_rows: int = None):
+    """
+    Top-`count` veïns (cosinus) de les files `rows` contra tota la matriu.
+
+    Es processa per blocs de files: cada bloc és un sol producte de
+    matrius (bloc, dim) x (dim, N) i un argpartition per fila, de manera
+    que el cost és el de N·len(rows) productes a BLAS i la memòria està
+    fitada per bloc. La fila mateixa s'exclou dels seus veïns.
+
+    Args:
+        matrix (np.ndarray): embeddings normalitzats (N, dim) float32
+        rows (np.ndarray): files de les quals es volen els veïns
+        count (int): veïns per fila (com a molt N - 1)
+        block_rows (int): files per bloc (per defecte, segons _BLOCK_BYTES)
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: files dels veïns (len(rows), count)
+        i scores, ordenats de més a menys similar
+    """
+    n = matrix.shape[0]
+    count = min(count, n - 1)
+    if count <= 0 or rows.shape[0] == 0:
+        return np.empty((rows.shape[0], 0), dtype=np.int64), np.empty((rows.shape[0], 0), dtype=np.float32)
+
+    block_rows = block_rows or block_rows_for(n)
+    out_rows = np.empty((rows.shape[0], count), dtype=np.int64)
+    out_scores = np.empty((rows.shape[0], count), dtype=np.float32)
+
+    for start in range(0, rows.shape[0], block_rows):
+        block = rows[start:start + block_rows]
+        sims = np.asarray(matrix[block], dtype=np.float32) @ np.asarray(matrix, dtype=np.float32).T
+
+        # Un event no és veí de si mateix
+        sims[np.arange(block.shape[0]), block] = -np.inf
+
+        top = np.argpartition(sims, n - count, axis=1)[:, n - count:]
+        top_scores = np.take_along_axis(sims, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+
+        out_rows[start:start + block.shape[0]] = np.take_along_axis(top, order, axis=1)
+        out_scores[start:start + block.shape[0]] = np.take_along_axis(top_scores, order, axis=1)
+
+    return out_rows, out_scores
+
+
+def save_related(event_ids, neighbour_ids, scores, model: str, now=None):
+    """
+    Crea o actualitza les files RelatedEvents (una per event).
+    """
+    now = now or timezone.now()
+
+    for start in range(0, len(event_ids), _WRITE_BATCH):
+        chunk = [int(event_id) for event_id in event_ids[start:start + _WRITE_BATCH]]
+        existing = dict(
+            RelatedEvents.objects.filter(event_id__in=chunk).values_list("event_id", "id")
+        )
+
+        objs = [
+            RelatedEvents(
+                id=existing.get(event_id), event_id=event_id, model=model,
+                neighbour_ids=pack_ids(neighbour_ids[start + i]),
+                scores=scores[start + i], computed_at=now,
+            )
+            for i, event_id in enumerate(chunk)
+        ]
+        updates = [obj for obj in objs if obj.id is not None]
+        creates = [obj for obj in objs if obj.id is None]
+        fields = ["model", "neighbour_ids", "scores", "computed_at"]
+
+        try:
+            with transaction.atomic():
+                if updates:
+                    RelatedEvents.objects.bulk_update(updates, fields, batch_size=len(updates))
+                if creates:
+                    RelatedEvents.objects.bulk_create(creates, batch_size=len(creates))
+        except DatabaseError:
+            # djongo sense UPDATE massiu, o una fila creada en paral·lel: fila a fila
+            for obj in objs:
+                RelatedEvents.objects.update_or_create(
+                    event_id=obj.event_id,
+                    defaults={field: getattr(obj, field) for field in fields},
+                )
+
+
+def last_computed_at():
+    """
+    Instant de l'últim càlcul (el punt de partida d'una execució incremental).
+    """
+    return RelatedEvents.objects.aggregate(last=Max("computed_at"))["last"]
+
+
+def build_related(count: int = None, since=None, block_rows: int = None, model: str = None) -> dict:
+    """
+    Precalcula els veïns semàntics dels events i els desa a RelatedEvents.
+
+    - Complet (`since` None): tots els events amb embedding. Les files dels
+      events que ja no en tenen s'esborren.
+    - Incremental: els events amb l'embedding actualitzat des de `since` i
+      els seus veïns nous (la seva llista pot haver canviat). Les llistes
+      d'altres events que contenien un event modificat s'arreglen en la
+      pròxima execució completa.
+
+    Es fan servir els vectors de l'índex (el primer fragment de cada event).
+
+    Returns:
+        dict: events a l'índex, llistes calculades, veïns per llista i segons
+    """
+    model = model or model_name()
+    count = count or _related_settings()["count"]
+    started = timezone.now()
+
+    ids, matrix, _ = load_embedding_arrays(model=model)
+    n = ids.shape[0]
+
+    if since is None:
+        rows = np.arange(n)
+    else:
+        changed = np.fromiter(
+            Event.objects.filter(embedding_updated_at__gte=since).values_list("id", flat=True).iterator(),
+            dtype=np.int64,
+        )
+        rows = np.flatnonzero(np.isin(ids, changed))
+
+    if since is not None and rows.shape[0]:
+        # Els veïns nous dels events modificats també es recalculen
+        neighbours, _ = nearest_neighbours(matrix, rows, count, block_rows)
+        rows = np.union1d(rows, neighbours.reshape(-1))
+
+    neighbours, scores = nearest_neighbours(matrix, rows, count, block_rows)
+    save_related(ids[rows], ids[neighbours], scores, model, now=started)
+
+    if since is None:
+        # Es filtra a Python: djongo no tradueix bé els filtres amb NOT
+        alive = set(ids.tolist())
+        stale = [
+            event_id for event_id in RelatedEvents.objects.values_list("event_id", flat=True).iterator()
+            if event_id not in alive
+        ]
+        for start in range(0, len(stale), _WRITE_BATCH):
+            RelatedEvents.objects.filter(event_id__in=stale[start:start + _WRITE_BATCH]).delete()
+
+    return {
+        "events": n,
+        "computed": int(rows.shape[0]),
+        "count": min(count, max(n - 1, 0)),
+        "block_rows": block_rows or block_rows_for(n),
+        "seconds": (timezone.now() - started).total_seconds(),
+    }
+
+
+def related_events(event_id: int, limit: int = None) -> list[Event]:
+    """
+    Events semànticament similars a un event, per a la pàgina de detall.
+
+    Llegeix la llista precalculada amb una sola consulta per event_id i
+    carrega els veïns amb un in_bulk (sense els vectors). No crida el model
+    ni l'índex. Els events esborrats o cancel·lats s'ometen.
+    """
+    limit = limit or _related_settings()["shown"]
+
+    packed = (
+        RelatedEvents.objects.filter(event_id=event_id)
+        .values_list("neighbour_ids", flat=True).first()
+    )
+    neighbour_ids = unpack_ids(packed).tolist()
+    if not neighbour_ids:
+        return []
+
+    events = Event.objects.in_bulk(neighbour_ids)
+    related = [
+        events[pk] for pk in neighbour_ids
+        if pk in events and events[pk].status != "cancelled"
+    ]
+    return related[:limit]
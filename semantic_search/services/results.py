@@ -0,0 +1,191 @@
+# semantic_search > Services > results.py
+
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from .embeddings import embed_text, normalize_text
+from .hybrid import _hybrid_settings, hybrid_search
+from .index import get_index
+from .lexical import get_lexical_index
+
+
+def search_revision() -> str:
+    """
+    Revisió dels índexs que intervenen en el rànquing.
+
+    Canvia amb qualsevol modificació de l'índex vectorial (i del BM25 si la
+    cerca híbrida està activa), o quan es carrega un snapshot nou.
+    """
+    revision = get_index().revision
+    if _hybrid_settings()["enabled"]:
+        revision = f"{revision}|{get_lexical_index().revision}"
+    return revision
+
+
+class RankedResultCache:
+    """
+    Cache LRU en memòria de llistes d'ids ja ordenades.
+
+    Cada entrada guarda la revisió dels índexs amb què es va calcular. En
+    llegir-la, si la revisió actual és diferent, l'entrada es descarta: no
+    hi ha TTL, un resultat és vàlid exactament mentre l'índex no canvia.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get(self, key: str, revision: str):
+        """
+        Retorna la llista [(event_id, score), ...] o None si no hi és o és obsoleta.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[0] == revision:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._data[key]
+                self.invalidations += 1
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, revision: str, hits: list):
+        with self._lock:
+            self._data[key] = (revision, tuple(hits))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Lock i instància global de la cache de resultats (lazy)
+_lock = threading.Lock()
+_result_cache = None
+
+
+def get_result_cache() -> RankedResultCache:
+    """
+    Retorna la cache de resultats del procés (la crea la primera vegada).
+    """
+    global _result_cache
+
+    if _result_cache is None:
+        with _lock:
+            if _result_cache is None:
+                _result_cache = RankedResultCache(
+                    maxsize=getattr(settings, "SEMANTIC_SEARCH_RESULT_CACHE_SIZE", 256),
+                )
+
+    return _result_cache
+
+
+def _result_key(query: str, depth: int, min_score, filters: dict) -> str:
+    parts = [query, str(depth), repr(min_score)]
+    parts += [f"{name}={filters[name]!r}" for name in sorted(filters)]
+    digest = hashlib.sha1("\0".join(parts).encode("utf-8")).hexdigest()
+    return f"semantic_search:results:{digest}"
+
+
+def ranked_results(query: str, depth: int = None, min_score: float = None,
+                   category=None, status=None, scheduled_from=None) -> tuple:
+    """
+    Rànquing complet d'una query (fins a `depth` resultats), des de la cache si es pot.
+
+    La revisió es llegeix abans de calcular el rànquing: si l'índex canvia
+    mentrestant, l'entrada queda marcada amb la revisió antiga i es
+    recalcula a la pròxima petició (mai se serveix un resultat obsolet).
+    En un encert no es calcula l'embedding de la query.
+
+    Returns:
+        tuple[tuple[int, float | None]]: ((event_id, cosinus), ...) en ordre de rànquing
+    """
+    query = normalize_text(query)
+    if not query:
+        return ()
+
+    depth = depth or getattr(settings, "SEMANTIC_SEARCH_RESULT_DEPTH", 200)
+    filters = {"category": category, "status": status, "scheduled_from": scheduled_from}
+
+    cache = get_result_cache()
+    revision = search_revision()
+    key = _result_key(query, depth, min_score, filters)
+
+    hits = cache.get(key, revision)
+    if hits is None:
+        # La query s'embedeix amb el model de l'índex que es consultarà
+        query_vec = embed_text(query, model=get_index().model)
+        hits = hybrid_search(query, query_vec, k=depth, min_score=min_score, **filters)
+        cache.set(key, revision, hits)
+        hits = tuple(hits)
+
+    return hits
+
+
+def encode_cursor(offset: int, last_id: int) -> str:
+    """
+    Cursor opac: posició i últim id mostrat.
+    """
+    return base64.urlsafe_b64encode(f"{offset}:{last_id}".encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """
+    Retorna (offset, last_id); un cursor buit o invàlid torna a l'inici.
+    """
+    if not cursor:
+        return 0, None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+        offset, last_id = raw.split(":")
+        return max(int(offset), 0), int(last_id)
+    except (ValueError, UnicodeDecodeError):
+        return 0, None
+
+
+def paginate(hits, cursor: str = None, page_size: int = 20):
+    """
+    Retorna (pàgina, cursor següent o None) d'una llista ordenada.
+
+    La pàgina continua just després de l'últim id mostrat. Si la llista
+    s'ha recalculat (índex modificat) i aquest id ja no hi és, es continua
+    per la posició.
+    """
+    offset, last_id = decode_cursor(cursor)
+
+    if last_id is not None:
+        for position, (event_id, _) in enumerate(hits):
+            if event_id == last_id:
+                offset = position + 1
+                break
+
+    page = list(hits[offset:offset + page_size])
+    end = offset + len(page)
+    next_cursor = encode_cursor(end, page[-1][0]) if page and end < len(hits) else None
+    return page, next_cursor
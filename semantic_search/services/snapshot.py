@@ -0,0 +1,254 @@
+# semantic_search > Services > snapshot.py
+
+import hashlib
+import json
+import logging
+import os
+import uuid
+from pathlib import Path
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Versió del format en disc (canviar-la invalida els snapshots antics)
+SNAPSHOT_FORMAT = 2
+
+# Fitxer que apunta a la versió vigent del snapshot
+MANIFEST_NAME = "manifest.json"
+
+# Nombre de versions antigues que es conserven (workers que encara les tenen mapejades)
+KEEP_VERSIONS = 2
+
+# Snapshots (directori, versió) que aquest procés ja ha verificat
+_verified = set()
+
+
+def snapshot_dir():
+    """
+    Retorna el directori configurat per als snapshots (o None si està desactivat).
+    """
+    directory = getattr(settings, "SEMANTIC_SEARCH_SNAPSHOT_DIR", None)
+    return Path(directory) if directory else None
+
+
+def _checksum(*paths) -> str:
+    """
+    Calcula un sha256 sobre el contingut dels fitxers indicats.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as fh:
+            for chunk in iter(lambda: fh.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _snapshot_files(manifest: dict, directory: Path) -> list:
+    """
+    Fitxers que cobreix el checksum: ids, matriu i arrays addicionals (per nom).
+    """
+    extras = manifest.get("extras", {})
+    return [
+        directory / manifest["ids_file"],
+        directory / manifest["vectors_file"],
+        *(directory / extras[name] for name in sorted(extras)),
+    ]
+
+
+def _atomic_save(path: Path, array: np.ndarray):
+    """
+    Desa un array .npy escrivint primer a un fitxer temporal i fent rename.
+    """
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as fh:
+        np.save(fh, array)
+    os.replace(tmp, path)
+
+
+def read_manifest(directory=None):
+    """
+    Llegeix el manifest del snapshot vigent.
+
+    Returns:
+        dict | None: contingut del manifest o None si no n'hi ha cap de vàlid
+    """
+    directory = Path(directory) if directory else snapshot_dir()
+    if directory is None:
+        return None
+
+    try:
+        with open(directory / MANIFEST_NAME, encoding="utf-8") as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        return None
+
+    return manifest
+
+
+def write_snapshot(ids: np.ndarray, matrix: np.ndarray, model: str, synced_at,
+                   directory=None, extras: dict = None, publish: bool = True) -> dict:
+    """
+    Escriu un snapshot versionat (ids + matriu d'embeddings) i el publica.
+
+    Els fitxers de dades es desen amb un nom únic per versió; el manifest es
+    substitueix amb un rename atòmic, de manera que un worker sempre veu o bé
+    la versió anterior o bé la nova, mai una barreja.
+
+    Amb publish=False només s'escriuen els fitxers (índex en preparació) i
+    el manifest retornat es publica més tard amb publish_manifest().
+
+    Args:
+        ids (np.ndarray): ids dels events ordenats ascendentment (int64)
+        matrix (np.ndarray): embeddings normalitzats (N, dim) float32
+        model (str): nom del model d'embeddings
+        synced_at (datetime): moment a partir del qual cal recuperar canvis
+        extras (dict): arrays addicionals (p.ex. llistes IVF) {nom: array}
+
+    Returns:
+        dict: manifest publicat
+    """
+    directory = Path(directory) if directory else snapshot_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+
+    version = timezone.now().strftime("%Y%m%d%H%M%S") + "-" + uuid.uuid4().hex[:8]
+    ids_path = directory / f"ids-{version}.npy"
+    vectors_path = directory / f"vectors-{version}.npy"
+
+    _atomic_save(ids_path, np.ascontiguousarray(ids, dtype=np.int64))
+    _atomic_save(vectors_path, np.ascontiguousarray(matrix, dtype=np.float32))
+
+    extra_files = {}
+    for name, array in (extras or {}).items():
+        path = directory / f"{name}-{version}.npy"
+        _atomic_save(path, np.ascontiguousarray(array))
+        extra_files[name] = path.name
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "version": version,
+        "model": model,
+        "rows": int(ids.shape[0]),
+        "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+        "ids_file": ids_path.name,
+        "vectors_file": vectors_path.name,
+        "extras": extra_files,
+        "synced_at": synced_at.isoformat(),
+    }
+    manifest["checksum"] = _checksum(*_snapshot_files(manifest, directory))
+
+    if publish:
+        publish_manifest(manifest, directory)
+
+    return manifest
+
+
+def publish_manifest(manifest: dict, directory=None):
+    """
+    Fa vigent un snapshot ja escrit (rename atòmic del manifest).
+    """
+    directory = Path(directory) if directory else snapshot_dir()
+
+    tmp = directory / (MANIFEST_NAME + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2)
+    os.replace(tmp, directory / MANIFEST_NAME)
+
+    _prune_old_versions(directory, manifest["version"])
+
+
+def _prune_old_versions(directory: Path, current: str):
+    """
+    Elimina versions antigues conservant les KEEP_VERSIONS més recents.
+
+    A Linux un fitxer esborrat continua accessible per als processos que
+    el tenen mapejat, així que no cal coordinar-se amb els workers.
+    """
+    versions = sorted(
+        {p.stem.split("-", 1)[1] for p in directory.glob("ids-*.npy")},
+        reverse=True,
+    )
+    for version in versions[KEEP_VERSIONS:]:
+        if version == current:
+            continue
+        for path in directory.glob(f"*-{version}.npy"):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+def verify_snapshot(manifest: dict, directory=None) -> bool:
+    """
+    Comprova el checksum de tots els fitxers d'un snapshot.
+
+    Llegeix els fitxers sencers (i de pas els porta al page cache), així
+    que cada procés ho fa un sol cop per versió: l'índex vectorial i el
+    BM25 comparteixen el resultat.
+    """
+    directory = Path(directory) if directory else snapshot_dir()
+    key = (str(directory), manifest["version"])
+    if key in _verified:
+        return True
+
+    try:
+        valid = _checksum(*_snapshot_files(manifest, directory)) == manifest.get("checksum")
+    except OSError:
+        valid = False
+
+    if not valid:
+        logger.warning("El snapshot %s no supera la verificació del checksum", manifest["version"])
+        return False
+
+    _verified.add(key)
+    return True
+
+
+def load_snapshot(manifest: dict, directory=None, verify: bool = False):
+    """
+    Obre un snapshot amb np.memmap (mode només lectura).
+
+    Les pàgines les comparteix el page cache del sistema operatiu entre tots
+    els workers, de manera que només n'hi ha una còpia a memòria. Amb
+    `verify` es comprova abans el checksum (vegeu verify_snapshot).
+
+    Returns:
+        tuple[np.ndarray, np.ndarray] | None: (ids, matrix) o None si no és vàlid
+    """
+    directory = Path(directory) if directory else snapshot_dir()
+    if verify and not verify_snapshot(manifest, directory):
+        return None
+
+    try:
+        ids = np.load(directory / manifest["ids_file"], mmap_mode="r")
+        matrix = np.load(directory / manifest["vectors_file"], mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+
+    # Validació barata: el nombre de files ha de coincidir amb el manifest
+    if ids.shape[0] != manifest["rows"] or matrix.shape[0] != manifest["rows"]:
+        return None
+
+    return ids, matrix
+
+
+def load_snapshot_extras(manifest: dict, directory=None) -> dict:
+    """
+    Obre amb memmap els arrays addicionals del snapshot.
+
+    Returns:
+        dict: {nom: array}; buit si no n'hi ha o algun fitxer falta
+    """
+    directory = Path(directory) if directory else snapshot_dir()
+
+    try:
+        return {
+            name: np.load(directory / filename, mmap_mode="r")
+            for name, filename in manifest.get("extras", {}).items()
+        }
+    except (OSError, ValueError):
+        return {}
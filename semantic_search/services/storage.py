@@ -0,0 +1,191 @@
+# semantic_search > Services > storage.py
+
+import numpy as np
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from events.models import Event
+from ..models import EventEmbedding
+from .embeddings import model_name
+from .metadata import META_FIELDS
+from .text import text_hash
+
+# Camps que s'escriuen a la BD per a cada event embedit
+EMBEDDING_FIELDS = [
+    "embedding", "embedding_chunks", "embedding_model", "embedding_updated_at",
+    "embedding_text_hash", "embedding_stale",
+]
+
+
+def _bulk_save(events: list[Event]):
+    """
+    Desa un batch d'events amb bulk_update.
+
+    Si el backend no suporta l'UPDATE massiu (djongo no tradueix totes
+    les expressions CASE WHEN), es torna al save() fila a fila.
+    """
+    try:
+        with transaction.atomic():
+            Event.objects.bulk_update(events, EMBEDDING_FIELDS, batch_size=len(events))
+    except DatabaseError:
+        for e in events:
+            e.save(update_fields=EMBEDDING_FIELDS)
+
+
+def split_vectors(vectors):
+    """
+    Separa els vectors dels fragments d'un event en (primer, resta).
+
+    La resta es retorna concatenada en un sol vector pla (com es guarda a
+    Event.embedding_chunks), o None si l'event només té un fragment.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        return vectors, None
+    if vectors.shape[0] == 0:
+        return None, None
+    chunks = vectors[1:].reshape(-1) if vectors.shape[0] > 1 else None
+    return vectors[0], chunks
+
+
+def save_model_embeddings(rows: list[tuple], model: str, now=None):
+    """
+    Crea o actualitza les files EventEmbedding d'un model.
+
+    Args:
+        rows: [(event_id, vector, fragments, hash_del_text), ...]
+        model: nom del model amb què s'han calculat
+    """
+    if not rows:
+        return
+
+    now = now or timezone.now()
+    existing = dict(
+        EventEmbedding.objects
+        .filter(model=model, event_id__in=[row[0] for row in rows])
+        .values_list("event_id", "id")
+    )
+
+    objs = [
+        EventEmbedding(
+            id=existing.get(event_id), event_id=event_id, model=model,
+            embedding=vec, chunks=chunks, text_hash=digest, updated_at=now,
+        )
+        for event_id, vec, chunks, digest in rows
+    ]
+    updates = [obj for obj in objs if obj.id is not None]
+    creates = [obj for obj in objs if obj.id is None]
+    fields = ["embedding", "chunks", "text_hash", "updated_at"]
+
+    try:
+        with transaction.atomic():
+            if updates:
+                EventEmbedding.objects.bulk_update(updates, fields, batch_size=len(updates))
+            if creates:
+                EventEmbedding.objects.bulk_create(creates, batch_size=len(creates))
+    except DatabaseError:
+        # djongo sense UPDATE massiu, o una fila creada en paral·lel (IntegrityError): fila a fila
+        for obj in objs:
+            EventEmbedding.objects.update_or_create(
+                event_id=obj.event_id, model=model,
+                defaults={
+                    "embedding": obj.embedding, "chunks": obj.chunks,
+                    "text_hash": obj.text_hash, "updated_at": now,
+                },
+            )
+
+
+def save_embeddings(batch: list[tuple[Event, str]], vecs: list,
+                    model: str = None) -> list[Event]:
+    """
+    Assigna els vectors als events d'un batch i els desa de cop.
+
+    Els vectors es guarden sempre com a EventEmbedding del seu model. Si el
+    model és l'actiu, també es copien a Event.embedding (el que llegeix
+    l'índex); si no, és un model en preparació i els events no es toquen.
+
+    Args:
+        batch: [(event, text_embedit), ...]
+        vecs: per a cada event del batch, la matriu (fragments, dim) de
+              chunking.embed_chunks o un sol vector
+        model: model amb què s'han calculat (per defecte, l'actiu)
+
+    Returns:
+        list[Event]: events desats (els vectors buits s'ometen)
+    """
+    now = timezone.now()
+    name = model or model_name()
+    active = name == model_name()
+
+    events, rows = [], []
+    for (e, text), vectors in zip(batch, vecs):
+        if vectors is None or len(vectors) == 0:
+            continue
+        vec, chunks = split_vectors(vectors)
+        digest = text_hash(text)
+        rows.append((e.pk, vec, chunks, digest))
+        events.append(e)
+
+        if active:
+            # Desa embedding, fragments, informació del model i hash del text embedit
+            e.embedding = vec
+            e.embedding_chunks = chunks
+            e.embedding_model = name
+            e.embedding_updated_at = now
+            e.embedding_text_hash = digest
+            e.embedding_stale = False
+
+    if active and events:
+        _bulk_save(events)
+
+    save_model_embeddings(rows, name, now)
+
+    return events
+
+
+def copy_model_embeddings(model: str, batch_size: int = 500) -> int:
+    """
+    Copia els vectors d'un model (EventEmbedding) a Event.embedding.
+
+    Es fa servir en activar un model: Event.embedding és la còpia del model
+    actiu que llegeixen l'índex i el catch-up. Es conserva la data original
+    de cada vector perquè els workers no el tornin a aplicar.
+
+    Returns:
+        int: events actualitzats
+    """
+    rows = (
+        EventEmbedding.objects.filter(model=model).order_by("event_id")
+        .values_list("event_id", "embedding", "chunks", "text_hash", "updated_at")
+        .iterator()
+    )
+
+    copied = 0
+    chunk = []
+
+    def flush():
+        vectors = {event_id: rest for event_id, *rest in chunk}
+        # Es carreguen els camps filtrables perquè el fallback fila a fila
+        # (save + signals) tingui les metadades correctes
+        events = list(Event.objects.only("id", *META_FIELDS).filter(id__in=list(vectors)))
+        for e in events:
+            embedding, chunks, digest, updated_at = vectors[e.pk]
+            e.embedding = embedding
+            e.embedding_chunks = chunks
+            e.embedding_model = model
+            e.embedding_text_hash = digest
+            e.embedding_updated_at = updated_at
+            e.embedding_stale = False
+        if events:
+            _bulk_save(events)
+        return len(events)
+
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= batch_size:
+            copied += flush()
+            chunk = []
+
+    if chunk:
+        copied += flush()
+
+    return copied
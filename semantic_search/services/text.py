@@ -0,0 +1,128 @@
+# semantic_search > Services > text.py
+
+import hashlib
+import re
+import unicodedata
+
+# Camps de l'Event que formen el text embedit
+TEXT_FIELDS = ("title", "description", "category", "tags")
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Fronteres de frase (punt, exclamació, interrogant o salt de línia)
+_SENTENCE_RE = re.compile(r"(?<=[.!?…])\s+|\n+")
+
+# Tokens mínims de descripció per fragment; amb menys, no es fragmenta
+MIN_CHUNK_TOKENS = 16
+
+
+def event_text(e) -> str:
+    """
+    Construeix un text agregat amb els camps més rellevants de l'event.
+
+    Aquest text s'utilitza en altres parts del projecte per generar embeddings
+    o mostrar informació semàntica completa.
+    """
+    parts = [
+        e.title or "",
+        e.description or "",
+        e.category or "",
+        e.tags or "",
+    ]
+    # Uneix només els camps no buits amb un delimitador "|"
+    return " | ".join([p.strip() for p in parts if p and p.strip()])
+
+
+def _pack(pieces: list[str], counts: list[int], budget: int) -> list[list[str]]:
+    """
+    Agrupa peces consecutives en finestres de com a molt `budget` tokens.
+    """
+    windows, current, used = [], [], 0
+    for piece, count in zip(pieces, counts):
+        if current and used + count > budget:
+            windows.append(current)
+            current, used = [], 0
+        current.append(piece)
+        used += count
+    if current:
+        windows.append(current)
+    return windows
+
+
+def event_chunks(e, count_tokens, max_tokens: int = None, max_chunks: int = 8) -> list[str]:
+    """
+    Divideix el text d'un event en fragments que el model pugui llegir sencers.
+
+    Si event_text(e) hi cap (el cas habitual), és l'únic fragment. Si no,
+    la descripció es talla per frases (i les frases massa llargues, per
+    paraules) en finestres de tokens, i cada fragment repeteix el títol, la
+    categoria i els tags: "títol | tros de descripció | categoria | tags".
+    El primer fragment sempre comença per l'inici de la descripció.
+
+    Args:
+        e: event (o qualsevol objecte amb els camps de TEXT_FIELDS)
+        count_tokens: funció [text] -> [tokens] del tokenitzador del model
+        max_tokens (int): tokens que llegeix el model (None = sense límit)
+        max_chunks (int): nombre màxim de fragments per event
+
+    Returns:
+        list[str]: fragments (buida si l'event no té text)
+    """
+    full = event_text(e)
+    if not full or max_tokens is None:
+        return [full] if full else []
+
+    if count_tokens([full])[0] <= max_tokens:
+        return [full]
+
+    description = (e.description or "").strip()
+    frame = [(e.title or "").strip(), (e.category or "").strip(), (e.tags or "").strip()]
+    frame_tokens = count_tokens([" | ".join(p for p in frame if p)])[0]
+
+    # Els separadors " | " del fragment també compten
+    budget = max_tokens - frame_tokens - 2
+    if not description or budget < MIN_CHUNK_TOKENS:
+        # El títol i els tags ja omplen el model: no hi ha res a repartir
+        return [full]
+
+    pieces = []
+    sentences = [p.strip() for p in _SENTENCE_RE.split(description) if p.strip()]
+    for sentence, count in zip(sentences, count_tokens(sentences)):
+        if count <= budget:
+            pieces.append((sentence, count))
+            continue
+        # Frase més llarga que un fragment: es talla per paraules
+        words = sentence.split()
+        for window in _pack(words, count_tokens(words), budget):
+            text = " ".join(window)
+            pieces.append((text, count_tokens([text])[0]))
+
+    windows = _pack([p for p, _ in pieces], [c for _, c in pieces], budget)
+
+    title, category, tags = frame
+    return [
+        " | ".join(p for p in (title, " ".join(window), category, tags) if p)
+        for window in windows[:max_chunks]
+    ]
+
+
+def text_hash(text: str) -> str:
+    """
+    Hash (sha256) del text embedit; permet saber si l'embedding està al dia.
+    """
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def fold_accents(text: str) -> str:
+    """
+    Elimina accents i diacrítics (Música → Musica, Barça → Barca).
+    """
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Divideix un text en termes: minúscules, sense accents i d'almenys 2 caràcters.
+    """
+    return [t for t in _TOKEN_RE.findall(fold_accents(text or "").casefold()) if len(t) > 1]
@@ -0,0 +1,145 @@
+# semantic_search > Services > versions.py
+
+from collections import namedtuple
+from events.models import Event
+from ..models import EventEmbedding
+from . import snapshot
+from .chunking import embed_events
+from .embeddings import model_name, set_active_model
+from .index import peek_index, reset_index, write_index_snapshot
+from .metadata import META_FIELDS
+from .storage import copy_model_embeddings, save_embeddings
+from .text import TEXT_FIELDS, event_text, text_hash
+
+# Fila mínima per construir el text d'un event sense instanciar-lo
+_EventText = namedtuple("_EventText", TEXT_FIELDS)
+
+
+def model_coverage() -> list[dict]:
+    """
+    Cobertura de cada model: events amb vector d'aquest model / total d'events.
+
+    És un recompte ràpid (no comprova si el text ha canviat després
+    d'embedir); la comprovació exacta la fa pending_event_ids().
+    """
+    total = Event.objects.count()
+    active = model_name()
+
+    models = set(
+        EventEmbedding.objects.order_by().values_list("model", flat=True).distinct()
+    )
+    models.add(active)
+
+    stats = []
+    for model in sorted(models):
+        embedded = EventEmbedding.objects.filter(model=model).count()
+        stats.append({
+            "model": model,
+            "active": model == active,
+            "embedded": embedded,
+            "events": total,
+            "coverage": embedded / total if total else 1.0,
+        })
+    return stats
+
+
+def pending_event_ids(model: str) -> list[int]:
+    """
+    Ids dels events que no tenen un vector al dia d'aquest model.
+
+    Un vector és al dia si es va calcular a partir del text actual de
+    l'event (mateix hash). Els events sense text no compten.
+    """
+    stored = dict(EventEmbedding.objects.filter(model=model).values_list("event_id", "text_hash"))
+
+    pending = []
+    rows = Event.objects.order_by("id").values_list("id", *TEXT_FIELDS).iterator()
+    for event_id, *fields in rows:
+        text = event_text(_EventText(*fields))
+        if text and stored.get(event_id) != text_hash(text):
+            pending.append(event_id)
+    return pending
+
+
+def embed_pending(model: str, batch_size: int = 64) -> int:
+    """
+    Embedeix amb `model` els events que no en tenen un vector al dia.
+
+    Returns:
+        int: events embedits
+    """
+    ids = pending_event_ids(model)
+    fields = set(TEXT_FIELDS) | set(META_FIELDS)
+
+    embedded = 0
+    for start in range(0, len(ids), batch_size):
+        events = Event.objects.only("id", *fields).filter(id__in=ids[start:start + batch_size])
+        items = []
+        for e in events:
+            text = event_text(e)
+            if text:
+                items.append((e, text))
+        if not items:
+            continue
+        vecs = embed_events([e for e, _ in items], batch_size=batch_size, model=model)
+        embedded += len(save_embeddings(items, vecs, model=model))
+    return embedded
+
+
+def activate_model(model: str) -> dict:
+    """
+    Fa que `model` serveixi les cerques, sense temps d'aturada.
+
+    1. Escriu (sense publicar) el snapshot de l'índex del model nou, si
+       hi ha directori de snapshots: l'índex en ombra.
+    2. Canvia el model actiu (una sola escriptura).
+    3. Publica el manifest del snapshot nou (rename atòmic).
+    4. Copia els vectors del model nou a Event.embedding.
+    5. Embedeix amb el model nou els events creats o editats entre el final
+       del backfill en ombra i el canvi, que fins ara només s'havien
+       embedit amb el model antic (catch-up).
+
+    Fins al pas 2 el model antic continua servint. A partir d'aquí, cada
+    worker canvia d'índex en la pròxima comprovació: carrega el snapshot
+    nou o, si no n'hi ha, el construeix des de la BD, que durant el pas 4
+    llegeix d'EventEmbedding els vectors encara no copiats. Mai es barregen
+    vectors de dos models en un mateix índex.
+
+    No comprova la cobertura: cal cridar-la quan pending_event_ids() és buit
+    (el catch-up només ha de cobrir els events desats mentrestant).
+
+    Els workers que encara no han vist el canvi (com a molt
+    SEMANTIC_SEARCH_REFRESH_SECONDS) embedeixen amb el model antic i marquen
+    els events amb aquest model: els recull `backfill_event_embeddings --stale-only`.
+
+    Returns:
+        dict: model, versió del snapshot publicat (o None), events copiats
+              i events embedits pel catch-up
+    """
+    manifest = None
+    if snapshot.snapshot_dir() is not None:
+        manifest = write_index_snapshot(model=model, publish=False)
+
+    previous = model_name()
+    set_active_model(model)
+
+    if manifest is not None:
+        snapshot.publish_manifest(manifest)
+
+    # L'índex d'aquest procés es reconstruirà amb el model nou
+    index = peek_index()
+    if index is not None and index.model != model:
+        reset_index()
+
+    copied = copy_model_embeddings(model)
+
+    # Després del canvi, el desat dels events ja embedeix amb el model nou
+    caught_up = embed_pending(model)
+
+    return {
+        "model": model,
+        "previous": previous,
+        "snapshot": manifest["version"] if manifest is not None else None,
+        "copied": copied,
+        "caught_up": caught_up,
+    }
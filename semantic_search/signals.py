@@ -0,0 +1,161 @@
+# semantic_search > signals.py
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from events.models import Event
+from events.signals import near_duplicates_requested, related_events_requested
+from .models import EventDeletion
+from .services.duplicates import find_near_duplicates
+from .services.embeddings import model_name
+from .services.index import peek_index
+from .services.lexical import LEXICAL_FIELDS, lexical_text, peek_lexical_index
+from .services.metadata import META_FIELDS, event_meta
+from .services.queue import get_queue
+from .services.related import related_events
+from .services.text import TEXT_FIELDS, event_text, text_hash
+
+
+@receiver(pre_save, sender=Event)
+def mark_stale_embedding(sender, instance, update_fields=None, **kwargs):
+    """
+    Marca l'embedding com a obsolet si el text o el model han canviat.
+
+    Compara el hash del text actual amb el guardat en generar l'embedding;
+    un save que no toca title/description/category/tags no canvia res i
+    no fa cap consulta addicional.
+
+    En un save parcial (update_fields) sense `embedding_stale` el flag no
+    s'escriuria; com que update_fields és immutable, es marca la fila amb
+    un update() a part.
+    """
+    # Un save parcial que no toca el text no pot invalidar l'embedding
+    if update_fields is not None and not set(TEXT_FIELDS) & set(update_fields):
+        return
+
+    # Si algun camp de text està diferit, llegir-lo costaria una consulta
+    if set(TEXT_FIELDS) & instance.get_deferred_fields():
+        return
+
+    current = text_hash(event_text(instance))
+    if current != instance.embedding_text_hash or instance.embedding_model != model_name():
+        instance.embedding_stale = True
+
+        if update_fields is not None and "embedding_stale" not in update_fields:
+            Event.objects.filter(pk=instance.pk).update(embedding_stale=True)
+
+
+@receiver(post_save, sender=Event)
+def sync_index_on_save(sender, instance, update_fields=None, **kwargs):
+    """
+    Actualitza l'índex vectorial del procés quan es desa un Event.
+
+    Si l'índex encara no s'ha construït no fem res: la primera cerca el
+    carregarà directament de la BD amb les dades ja actualitzades.
+    """
+    index = peek_index()
+    if index is None:
+        return
+
+    # Un save parcial que no toca l'embedding només pot canviar les metadades
+    if update_fields is not None and "embedding" not in update_fields:
+        if set(META_FIELDS) & set(update_fields):
+            index.set_meta(instance.pk, event_meta(instance))
+        return
+
+    # Un vector d'un altre model (procés que encara no ha vist el canvi) no entra a l'índex
+    if instance.embedding is not None and instance.embedding_model != index.model:
+        return
+
+    # Els fragments diferits no es llegeixen (costaria una consulta): el
+    # catch-up els recuperarà
+    chunks = None
+    if "embedding_chunks" not in instance.get_deferred_fields():
+        chunks = instance.embedding_chunks
+
+    index.upsert(instance.pk, instance.embedding, event_meta(instance), chunks)
+
+
+@receiver(post_save, sender=Event)
+def sync_lexical_index_on_save(sender, instance, update_fields=None, **kwargs):
+    """
+    Reindexa l'Event a l'índex BM25 del procés si ja s'ha construït.
+    """
+    index = peek_lexical_index()
+    if index is None:
+        return
+
+    fields = set(LEXICAL_FIELDS) | set(META_FIELDS)
+
+    # Un save parcial que no toca el text ni els filtres no canvia res
+    if update_fields is not None and not fields & set(update_fields):
+        return
+
+    # Llegir camps diferits costaria consultes; ho recuperarà el catch-up
+    if fields & instance.get_deferred_fields():
+        return
+
+    index.upsert(
+        instance.pk,
+        lexical_text(instance.title, instance.description, instance.tags),
+        event_meta(instance),
+    )
+
+
+@receiver(post_save, sender=Event)
+def enqueue_stale_embedding(sender, instance, **kwargs):
+    """
+    Encua l'Event per embedir-lo en segon pla si el seu embedding és obsolet.
+
+    L'encuat es fa en confirmar la transacció, perquè el fil de fons llegeixi
+    el text ja desat; la petició no espera el model.
+    """
+    if not getattr(settings, "SEMANTIC_SEARCH_ASYNC_EMBEDDINGS", True):
+        return
+
+    if not instance.embedding_stale:
+        return
+
+    pk = instance.pk
+    transaction.on_commit(lambda: get_queue().enqueue(pk))
+
+
+@receiver(post_delete, sender=Event)
+def sync_index_on_delete(sender, instance, **kwargs):
+    """
+    Elimina l'Event dels índexs (vectorial i BM25) quan s'esborra de la BD.
+    """
+    index = peek_index()
+    if index is not None:
+        index.remove(instance.pk)
+
+    lexical = peek_lexical_index()
+    if lexical is not None:
+        lexical.remove(instance.pk)
+
+
+@receiver(post_delete, sender=Event)
+def log_event_deletion(sender, instance, **kwargs):
+    """
+    Registra l'esborrat perquè els índexs dels altres processos el vegin en
+    el seu catch-up (els signals només arriben a aquest procés).
+    """
+    EventDeletion.objects.create(event_id=instance.pk, deleted_at=timezone.now())
+
+
+@receiver(near_duplicates_requested, sender=Event)
+def find_duplicates_for_form(sender, fields, creator, scheduled_date, exclude_id=None, **kwargs):
+    """
+    Respon a la validació del formulari d'events amb els possibles duplicats.
+    """
+    return find_near_duplicates(fields, creator, scheduled_date, exclude_id=exclude_id)
+
+
+@receiver(related_events_requested, sender=Event)
+def related_events_for_detail(sender, event, **kwargs):
+    """
+    Respon a la pàgina de detall amb els veïns precalculats de l'event.
+    """
+    return related_events(event.pk)
@@ -1,3 +1,650 @@
-from django.test import TestCase
+import tempfile
+import threading
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from events.forms import EventCreationForm
+from events.models import Event
+from .models import EventDeletion
+from .services import embeddings, snapshot
+from .services.ann import IVFIndex
+from .services.batching import MicroBatcher
+from .services.duplicates import find_near_duplicates
+from .services.embeddings import embed_text, model_name, set_active_model
+from .services.index import (
+    EmbeddingIndex, get_index, load_embedding_arrays, peek_index, reset_index, write_index_snapshot,
+)
+from .services.lexical import BM25Index
+from .services.metadata import event_meta
+from .services.quantize import Int8Matrix, rerank_top_k
+from .services.related import save_related
+from .services.results import decode_cursor, encode_cursor, paginate
+from .services.text import event_text
+from .services.versions import activate_model, embed_pending, pending_event_ids
+from .signals import sync_index_on_delete
 
-# Create your tests here.
+MODEL = "hashing-64"
+
+
+def _vector(seed: int, dim: int = 64) -> np.ndarray:
+    """
+    Vector aleatori (determinista) normalitzat.
+    """
+    vec = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+def _event(creator, title: str = "Event", embedding=None, model: str = MODEL, **fields) -> Event:
+    """
+    Crea un event i, si es passa, li assigna l'embedding (sense passar pel model).
+    """
+    defaults = {
+        "description": "Descripció de prova",
+        "category": "music",
+        "status": "scheduled",
+        "scheduled_date": timezone.now() + timedelta(days=7),
+    }
+    defaults.update(fields)
+    event = Event.objects.create(title=title, creator=creator, **defaults)
+
+    if embedding is not None:
+        Event.objects.filter(pk=event.pk).update(
+            embedding=embedding, embedding_model=model, embedding_stale=False
+        )
+    return event
+
+
+@override_settings(SEMANTIC_SEARCH_ASYNC_EMBEDDINGS=False)
+class LoadEmbeddingArraysTests(TestCase):
+    """
+    Lectura dels embeddings de la BD per construir l'índex.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("creador", password="x")
+
+    def test_mixed_dimensions_keep_majority(self):
+        # Vectors antics de 3 dimensions als ids més baixos
+        legacy = [_event(self.user, f"Antic {i}", np.ones(3, dtype=np.float32)) for i in range(3)]
+        current = [_event(self.user, f"Nou {i}", _vector(i)) for i in range(5)]
+
+        with self.assertLogs("semantic_search.services.index", level="WARNING"):
+            ids, matrix, meta = load_embedding_arrays(model=MODEL)
+
+        self.assertEqual(matrix.shape, (5, 64))
+        self.assertEqual(ids.tolist(), [e.pk for e in current])
+        self.assertFalse(set(ids.tolist()) & {e.pk for e in legacy})
+
+        index = EmbeddingIndex(ids, matrix, meta=meta, model=MODEL)
+        hits = index.search(_vector(2), k=1)
+        self.assertEqual(hits[0][0], current[2].pk)
+
+    def test_other_model_vectors_are_left_out(self):
+        _event(self.user, "Altre model", _vector(1), model="hashing-32")
+        kept = _event(self.user, "Model actiu", _vector(2))
+
+        ids, matrix, _ = load_embedding_arrays(model=MODEL)
+
+        self.assertEqual(ids.tolist(), [kept.pk])
+
+
+def _matrix(n: int, dim: int = 64, seed: int = 0) -> np.ndarray:
+    """
+    Matriu (n, dim) de vectors aleatoris normalitzats.
+    """
+    matrix = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+@override_settings(SEMANTIC_SEARCH_ASYNC_EMBEDDINGS=False, SEMANTIC_SEARCH_ENGINE="exact",
+                   SEMANTIC_SEARCH_QUANTIZATION=None)
+class EmbeddingIndexTests(TestCase):
+    """
+    Cerca a l'índex: top-k, tombstones de la base i filtres de metadades.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("creador", password="x")
+        self.now = timezone.now()
+        self.events = [
+            _event(
+                self.user, f"Event {i}", _vector(i),
+                category="music" if i % 2 else "talk",
+                status="cancelled" if i == 3 else "scheduled",
+                scheduled_date=self.now + timedelta(days=i),
+            )
+            for i in range(8)
+        ]
+        self.index = EmbeddingIndex.from_db(model=MODEL)
+
+    def _ids(self, hits):
+        return [event_id for event_id, _ in hits]
+
+    def test_top_k_matches_exact_ranking(self):
+        query = _vector(100)
+        scores = {e.pk: float(_vector(i) @ query) for i, e in enumerate(self.events)}
+        expected = sorted(scores, key=scores.get, reverse=True)[:3]
+
+        hits = self.index.search(query, k=3)
+
+        self.assertEqual(self._ids(hits), expected)
+        for event_id, score in hits:
+            self.assertAlmostEqual(score, scores[event_id], places=5)
+
+    def test_upsert_replaces_base_row(self):
+        moved = self.events[2].pk
+        self.index.upsert(moved, _vector(50))
+
+        self.assertEqual(len(self.index), 8)
+        self.assertEqual(self.index.search(_vector(50), k=1)[0][0], moved)
+        # La fila antiga de la base queda marcada com a eliminada
+        self.assertNotIn(moved, self._ids(self.index.search(_vector(2), k=1)))
+
+    def test_remove_base_and_delta_rows(self):
+        removed = self.events[4].pk
+        self.index.remove(removed)
+        self.index.upsert(9999, _vector(60))
+        self.index.remove(9999)
+
+        ids = self._ids(self.index.search(_vector(4), k=20))
+        self.assertEqual(len(self.index), 7)
+        self.assertNotIn(removed, ids)
+        self.assertNotIn(9999, ids)
+
+    def test_filters(self):
+        hits = self.index.search(_vector(0), k=20, category="music")
+        self.assertEqual(sorted(self._ids(hits)), [e.pk for i, e in enumerate(self.events) if i % 2])
+
+        hits = self.index.search(_vector(0), k=20, status="scheduled")
+        self.assertNotIn(self.events[3].pk, self._ids(hits))
+        self.assertEqual(len(hits), 7)
+
+        hits = self.index.search(_vector(0), k=20, scheduled_from=self.now + timedelta(days=5, hours=12))
+        self.assertEqual(sorted(self._ids(hits)), [self.events[6].pk, self.events[7].pk])
+
+        allowed = [self.events[1].pk, self.events[5].pk]
+        hits = self.index.search(_vector(0), k=20, allowed_ids=allowed, category="music")
+        self.assertEqual(sorted(self._ids(hits)), allowed)
+
+    def test_filters_apply_to_delta(self):
+        event = self.events[0]
+        Event.objects.filter(pk=event.pk).update(category="sports")
+        event.refresh_from_db()
+        self.index.upsert(event.pk, _vector(0), event_meta(event))
+
+        self.assertEqual(self._ids(self.index.search(_vector(0), k=20, category="sports")), [event.pk])
+        self.assertNotIn(event.pk, self._ids(self.index.search(_vector(0), k=20, category="talk")))
+
+    @override_settings(SEMANTIC_SEARCH_QUANTIZATION="int8", SEMANTIC_SEARCH_RERANK_CANDIDATES=4)
+    def test_int8_index_matches_exact(self):
+        quantized = EmbeddingIndex.from_db(model=MODEL)
+        self.assertIsInstance(quantized._quant, Int8Matrix)
+
+        for seed in range(100, 110):
+            query = _vector(seed)
+            exact = self.index.search(query, k=3)
+            hits = quantized.search(query, k=3)
+            self.assertEqual(self._ids(hits), self._ids(exact))
+            np.testing.assert_allclose([s for _, s in hits], [s for _, s in exact], rtol=1e-5)
+
+
+class QuantizationTests(SimpleTestCase):
+    """
+    Scores de la matriu int8 i reordenació amb la matriu float32.
+    """
+
+    def setUp(self):
+        self.matrix = _matrix(2000)
+        self.quant = Int8Matrix.from_matrix(self.matrix)
+
+    def test_scores_approximate_float32(self):
+        query = _vector(7)
+        approx = self.quant.scores(query)
+
+        self.assertEqual(self.quant.codes.dtype, np.int8)
+        self.assertEqual(self.quant.shape, self.matrix.shape)
+        self.assertLess(np.abs(approx - self.matrix @ query).max(), 0.02)
+
+    def test_rerank_recovers_exact_top_k(self):
+        for seed in range(20):
+            query = _vector(seed)
+            exact = self.matrix @ query
+            expected = np.argsort(-exact)[:10]
+
+            rows, scores = rerank_top_k(self.matrix, query, self.quant.scores(query), k=10, candidates=100)
+
+            self.assertEqual(rows.tolist(), expected.tolist())
+            np.testing.assert_allclose(scores, exact[expected], rtol=1e-6)
+
+    def test_rerank_skips_excluded_rows(self):
+        query = _vector(3)
+        approx = self.quant.scores(query)
+        best = int(np.argmax(self.matrix @ query))
+        approx[best] = -np.inf
+
+        rows, _ = rerank_top_k(self.matrix, query, approx, k=5, candidates=50)
+
+        self.assertNotIn(best, rows.tolist())
+        self.assertEqual(len(rows), 5)
+
+
+class IVFIndexTests(SimpleTestCase):
+    """
+    Recall de l'índex IVF respecte de la cerca exacta.
+    """
+
+    def setUp(self):
+        # Dades agrupades al voltant de 32 centres, com els embeddings reals
+        rng = np.random.default_rng(1)
+        centers = _matrix(32, seed=2)
+        labels = rng.integers(0, 32, size=4000)
+        matrix = centers[labels] + 0.15 * rng.standard_normal((4000, 64)).astype(np.float32)
+        self.matrix = (matrix / np.linalg.norm(matrix, axis=1, keepdims=True)).astype(np.float32)
+        self.ivf = IVFIndex.train(self.matrix, nlist=32)
+
+    def _recall(self, nprobe: int, k: int = 10) -> float:
+        found = 0
+        for row in range(0, 4000, 200):
+            query = self.matrix[row]
+            expected = set(np.argsort(-(self.matrix @ query))[:k].tolist())
+            rows, _ = self.ivf.search(self.matrix, query, k, nprobe)
+            found += len(expected & set(rows.tolist()))
+        return found / (20 * k)
+
+    def test_lists_cover_all_rows(self):
+        self.assertEqual(self.ivf.nlist, 32)
+        self.assertEqual(sorted(self.ivf.order.tolist()), list(range(4000)))
+
+    def test_recall(self):
+        self.assertGreaterEqual(self._recall(nprobe=4), 0.9)
+        # Explorant totes les llistes la cerca és exacta
+        self.assertEqual(self._recall(nprobe=32), 1.0)
+
+    def test_mask(self):
+        mask = np.zeros(4000, dtype=bool)
+        mask[::2] = True
+
+        rows, _ = self.ivf.search(self.matrix, self.matrix[1], k=10, nprobe=32)
+        masked, _ = self.ivf.search(self.matrix, self.matrix[1], k=10, nprobe=32, mask=mask)
+
+        self.assertIn(1, rows.tolist())
+        self.assertTrue(all(row % 2 == 0 for row in masked.tolist()))
+
+
+class CursorTests(SimpleTestCase):
+    """
+    Paginació dels resultats amb cursors opacs.
+    """
+
+    def test_round_trip(self):
+        cursor = encode_cursor(40, 123)
+
+        self.assertNotIn("=", cursor)
+        self.assertEqual(decode_cursor(cursor), (40, 123))
+
+    def test_invalid_cursor_restarts(self):
+        self.assertEqual(decode_cursor(None), (0, None))
+        self.assertEqual(decode_cursor("no-és-un-cursor"), (0, None))
+        self.assertEqual(decode_cursor(encode_cursor(5, 1)[:-2]), (0, None))
+
+    def test_pages_cover_all_hits(self):
+        hits = [(event_id, 1.0 - event_id / 100) for event_id in range(1, 46)]
+
+        pages, cursor = [], None
+        while True:
+            page, cursor = paginate(hits, cursor, page_size=20)
+            pages.append(page)
+            if cursor is None:
+                break
+
+        self.assertEqual([len(page) for page in pages], [20, 20, 5])
+        self.assertEqual([hit for page in pages for hit in page], hits)
+
+    def test_continues_after_last_id_when_results_change(self):
+        hits = [(event_id, 0.0) for event_id in range(1, 11)]
+        _, cursor = paginate(hits, page_size=4)
+
+        # Un event nou ha entrat al davant de la llista
+        page, _ = paginate([(99, 1.0)] + hits, cursor, page_size=4)
+
+        self.assertEqual([event_id for event_id, _ in page], [5, 6, 7, 8])
+
+
+@override_settings(SEMANTIC_SEARCH_ASYNC_EMBEDDINGS=False, SEMANTIC_SEARCH_SNAPSHOT_DIR=None)
+class NearDuplicateTests(TestCase):
+    """
+    Detecció de duplicats en crear un event, amb el worker en fred i en calent.
+    """
+
+    def setUp(self):
+        self.addCleanup(reset_index)
+        self.addCleanup(set_active_model, model_name())
+        set_active_model(MODEL)
+        reset_index()
+
+        self.user = get_user_model().objects.create_user("creador", password="x")
+        self.when = timezone.now() + timedelta(days=3)
+        self.original = _event(
+            self.user, "Concert de jazz al port", description="Quartet de jazz en directe",
+            scheduled_date=self.when,
+        )
+        self.original.embedding = embed_text(event_text(self.original), model=MODEL)
+        Event.objects.filter(pk=self.original.pk).update(
+            embedding=self.original.embedding, embedding_model=MODEL, embedding_stale=False
+        )
+
+    def _fields(self):
+        return {
+            "title": "Concert de jazz al port",
+            "description": "Quartet de jazz en directe",
+            "category": "music",
+            "tags": "",
+        }
+
+    def test_cold_worker_builds_index(self):
+        self.assertIsNone(peek_index())
+
+        hits = find_near_duplicates(self._fields(), self.user, self.when + timedelta(hours=1))
+
+        self.assertEqual([event.pk for event, _ in hits], [self.original.pk])
+        self.assertIsNotNone(peek_index())
+
+    def test_warm_worker(self):
+        get_index()
+
+        hits = find_near_duplicates(self._fields(), self.user, self.when)
+
+        self.assertEqual([event.pk for event, _ in hits], [self.original.pk])
+        self.assertGreater(hits[0][1], 0.99)
+
+    def test_outside_window_or_other_creator(self):
+        other = get_user_model().objects.create_user("altre", password="x")
+
+        self.assertEqual(find_near_duplicates(self._fields(), other, self.when), [])
+        self.assertEqual(find_near_duplicates(self._fields(), self.user, self.when + timedelta(days=30)), [])
+
+    def test_editing_event_is_not_its_own_duplicate(self):
+        hits = find_near_duplicates(self._fields(), self.user, self.when, exclude_id=self.original.pk)
+
+        self.assertEqual(hits, [])
+
+    def _form(self, **data):
+        fields = {
+            # Títol diferent (clean_title no admet títols repetits) però mateix text
+            "title": "Concert de jazz al port!",
+            "description": "Quartet de jazz en directe",
+            "category": "music",
+            "status": "scheduled",
+            "scheduled_date": timezone.localtime(self.when + timedelta(hours=1)).strftime("%Y-%m-%d %H:%M"),
+            "max_viewers": 100,
+            "tags": "",
+        }
+        fields.update(data)
+        return EventCreationForm(data=fields, user=self.user)
+
+    def test_form_rejects_near_duplicate(self):
+        form = self._form()
+
+        self.assertFalse(form.is_valid())
+        self.assertIn("Sembla un duplicat", form.non_field_errors()[0])
+        self.assertEqual([event.pk for event, _ in form.near_duplicates], [self.original.pk])
+
+    def test_form_allow_duplicate(self):
+        form = self._form(allow_duplicate="on")
+
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.near_duplicates, [])
+
+    def test_form_accepts_different_event(self):
+        form = self._form(title="Taller de ceràmica", description="Modelat amb torn per a principiants")
+
+        self.assertTrue(form.is_valid(), form.errors)
+
+
+@override_settings(SEMANTIC_SEARCH_ASYNC_EMBEDDINGS=False)
+class RelatedEventsTests(TestCase):
+    """
+    Veïns precalculats a la pàgina de detall d'un event.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("creador", password="x")
+
+    def test_detail_shows_precomputed_neighbours(self):
+        event = _event(self.user, "Concert de jazz")
+        near = _event(self.user, "Nit de jazz al port")
+        cancelled = _event(self.user, "Jazz cancel·lat", status="cancelled")
+        save_related([event.pk], [[cancelled.pk, near.pk]], [np.array([0.9, 0.8])], MODEL)
+
+        response = self.client.get(reverse("events:event_detail", args=[event.pk]))
+
+        self.assertEqual(response.context["related_events"], [near])
+
+
+@override_settings(SEMANTIC_SEARCH_ASYNC_EMBEDDINGS=False, SEMANTIC_SEARCH_RECONCILE_SECONDS=3600)
+class CatchUpDeletionTests(TestCase):
+    """
+    Esborrats fets per altres processos: registre EventDeletion i comparació completa.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("creador", password="x")
+        self.events = [_event(self.user, f"Event {i}", _vector(i)) for i in range(4)]
+        self.index = EmbeddingIndex.from_db(model=MODEL)
+        self.lexical = BM25Index.from_db()
+
+        # La primera sincronització compara tots els ids; les següents llegeixen el registre
+        self.index.catch_up()
+        self.lexical.catch_up()
+
+        # Els signals d'aquest procés no actualitzen els índexs del test ("altre procés")
+        post_delete.disconnect(sync_index_on_delete, sender=Event)
+        self.addCleanup(post_delete.connect, sync_index_on_delete, sender=Event)
+
+    def test_deletion_log(self):
+        gone = self.events[1].pk
+        self.events[1].delete()
+        self.assertTrue(EventDeletion.objects.filter(event_id=gone).exists())
+
+        # Registre d'esborrats, embeddings i metadades: cap lectura de tots els ids
+        with self.assertNumQueries(3):
+            self.index.catch_up()
+
+        self.assertNotIn(gone, self.index.event_ids().tolist())
+        self.assertEqual(len(self.index), 3)
+
+        self.lexical.catch_up()
+        self.assertNotIn(gone, self.lexical.event_ids().tolist())
+
+    def test_deletes_bypassing_signals_wait_for_full_comparison(self):
+        gone = self.events[2]
+        Event.objects.filter(pk=gone.pk)._raw_delete("default")
+
+        self.index.catch_up()
+        self.assertIn(gone.pk, self.index.event_ids().tolist())
+
+        self.index.reconciled_at -= 3600
+        self.index.catch_up()
+        self.assertNotIn(gone.pk, self.index.event_ids().tolist())
+
+    def test_old_log_rows_are_purged(self):
+        EventDeletion.objects.create(event_id=999, deleted_at=timezone.now() - timedelta(days=30))
+        self.index.reconciled_at = 0.0
+
+        self.index.catch_up()
+
+        self.assertFalse(EventDeletion.objects.filter(event_id=999).exists())
+
+
+@override_settings(SEMANTIC_SEARCH_ASYNC_EMBEDDINGS=False, SEMANTIC_SEARCH_SNAPSHOT_VERIFY=True)
+class SnapshotTests(TestCase):
+    """
+    Snapshot en disc: càrrega amb memmap i verificació del checksum.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("creador", password="x")
+        self.events = [_event(self.user, f"Concert {i}", _vector(i)) for i in range(5)]
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+        settings_override = override_settings(SEMANTIC_SEARCH_SNAPSHOT_DIR=self.directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.addCleanup(set_active_model, model_name())
+        set_active_model(MODEL)
+
+    def test_load_snapshot(self):
+        manifest = write_index_snapshot()
+
+        index = EmbeddingIndex.from_snapshot(snapshot.read_manifest())
+        lexical = BM25Index.from_snapshot(snapshot.read_manifest())
+
+        self.assertEqual(index.version, manifest["version"])
+        self.assertEqual(sorted(index.event_ids().tolist()), [e.pk for e in self.events])
+        self.assertEqual(index.search(_vector(3), k=1)[0][0], self.events[3].pk)
+        self.assertEqual(len(lexical.search("concert", k=10)), 5)
+
+    def test_corrupted_snapshot_is_rejected(self):
+        manifest = write_index_snapshot()
+        vectors = np.load(self.directory / manifest["vectors_file"], mmap_mode="r+")
+        vectors[0, 0] += 1.0
+        vectors.flush()
+        del vectors
+
+        with self.assertLogs("semantic_search.services.snapshot", level="WARNING"):
+            self.assertIsNone(EmbeddingIndex.from_snapshot(snapshot.read_manifest()))
+            self.assertIsNone(BM25Index.from_snapshot(snapshot.read_manifest()))
+
+
+@override_settings(SEMANTIC_SEARCH_ASYNC_EMBEDDINGS=False, SEMANTIC_SEARCH_SNAPSHOT_DIR=None)
+class ModelActivationTests(TestCase):
+    """
+    Canvi de model actiu després d'omplir-lo en ombra.
+    """
+
+    SHADOW = "hashing-32"
+
+    def setUp(self):
+        self.addCleanup(reset_index)
+        self.addCleanup(set_active_model, model_name())
+        set_active_model(MODEL)
+
+        self.user = get_user_model().objects.create_user("creador", password="x")
+        self.edited = _event(self.user, "Concert de jazz")
+        self.unchanged = _event(self.user, "Fira del llibre")
+
+    def test_events_saved_after_backfill_are_caught_up(self):
+        self.assertEqual(embed_pending(self.SHADOW), 2)
+
+        # Desats entre el final del backfill i el canvi de model
+        self.edited.title = "Concert de jazz i blues"
+        self.edited.save()
+        created = _event(self.user, "Taller de ceràmica")
+        self.assertEqual(set(pending_event_ids(self.SHADOW)), {self.edited.pk, created.pk})
+
+        result = activate_model(self.SHADOW)
+
+        self.assertEqual(result["caught_up"], 2)
+        self.assertEqual(pending_event_ids(self.SHADOW), [])
+        self.assertEqual(
+            set(Event.objects.values_list("embedding_model", flat=True)), {self.SHADOW}
+        )
+
+        index = get_index()
+        self.assertEqual(index.model, self.SHADOW)
+        self.assertEqual(
+            sorted(index.event_ids().tolist()),
+            [self.edited.pk, self.unchanged.pk, created.pk],
+        )
+        query = embed_text(event_text(Event.objects.get(pk=self.edited.pk)), model=self.SHADOW)
+        self.assertEqual(index.search(query, k=1)[0][0], self.edited.pk)
+
+
+class _BlockingEncoder:
+    """
+    Encoder de prova: el primer encode espera fins que el test el deixa acabar.
+    """
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.texts = []
+
+    def __call__(self, texts):
+        self.texts.extend(texts)
+        if not self.started.is_set():
+            self.started.set()
+            self.release.wait(5)
+        return np.stack([_vector(len(text)) for text in texts])
+
+
+class MicroBatcherTests(SimpleTestCase):
+    """
+    Agrupació de queries concurrents, cancel·lacions i cua fitada.
+    """
+
+    def _blocked_batcher(self, **kwargs):
+        encoder = _BlockingEncoder()
+        batcher = MicroBatcher(encoder, max_wait=0.001, **kwargs)
+        self.addCleanup(encoder.release.set)
+
+        # Un primer text ocupa el fil del batcher
+        batcher.submit("en curs")
+        self.assertTrue(encoder.started.wait(5))
+        return batcher, encoder
+
+    def test_queued_texts_share_one_encode(self):
+        batcher, encoder = self._blocked_batcher()
+        futures = [batcher.submit(f"query {i}") for i in range(5)]
+
+        encoder.release.set()
+
+        self.assertEqual([len(f.result(5)) for f in futures], [64] * 5)
+        self.assertEqual(batcher.stats()["batches"], 2)
+
+    def test_cancelled_future_is_not_encoded(self):
+        batcher, encoder = self._blocked_batcher()
+        kept = batcher.submit("es queda")
+        dropped = batcher.submit("cancel·lada")
+        self.assertTrue(dropped.cancel())
+
+        encoder.release.set()
+        kept.result(5)
+
+        self.assertNotIn("cancel·lada", encoder.texts)
+        self.assertEqual(batcher.stats()["cancelled"], 1)
+
+    def test_full_queue_encodes_in_caller(self):
+        batcher, encoder = self._blocked_batcher(max_pending=1)
+        queued = batcher.submit("a la cua")
+        direct = batcher.submit("sense lloc")
+
+        # Ja té el resultat, encara que el fil del batcher continua bloquejat
+        self.assertTrue(direct.done())
+        self.assertFalse(queued.done())
+        self.assertEqual(batcher.stats()["overflows"], 1)
+
+    @override_settings(SEMANTIC_SEARCH_MICROBATCH_TIMEOUT=0.05)
+    def test_embed_text_timeout_cancels_and_encodes_directly(self):
+        batcher, encoder = self._blocked_batcher()
+        embeddings.get_query_cache().clear()
+
+        with mock.patch.object(embeddings, "get_batcher", return_value=batcher):
+            with self.assertLogs("semantic_search.services.embeddings", level="WARNING"):
+                vec = embeddings.embed_text("query sense resposta", model=MODEL)
+
+        self.assertEqual(len(vec), 64)
+        encoder.release.set()
+        batcher.submit("després").result(5)
+        self.assertNotIn("query sense resposta", encoder.texts)
+        self.assertEqual(batcher.stats()["cancelled"], 1)
@@ -1,8 +1,9 @@
 from django.urls import path
-from .views import semantic_search
+from .views import semantic_search, semantic_stats
 
 app_name = "semantic_search"
 
 urlpatterns = [
     path("semantic/", semantic_search, name="semantic"),
+    path("semantic/stats/", semantic_stats, name="stats"),
 ]
\ No newline at end of file
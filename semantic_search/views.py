@@ -1,25 +1,15 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+from django.conf import settings
 from django.shortcuts import render
+from django.template.loader import render_to_string
 from django.utils import timezone
 from events.models import Event
-from .services.embeddings import embed_text, model_name
-from .services.ranker import cosine_top_k
-
-
-def _event_text(e: Event) -> str:
-    """
-    Construeix un text agregat amb els camps més rellevants de l'event.
-
-    Aquest text s'utilitza en altres parts del projecte per generar embeddings
-    o mostrar informació semàntica completa.
-    """
-    parts = [
-        e.title or "",
-        e.description or "",
-        e.category or "",
-        e.tags or "",
-    ]
-    # Uneix només els camps no buits amb un delimitador "|"
-    return " | ".join([p.strip() for p in parts if p and p.strip()])
+from .services.embeddings import batcher_stats, get_query_cache, model_name
+from .services.index import hydrate_events, peek_index
+from .services.queue import queue_stats
+from .services.results import get_result_cache, paginate, ranked_results
+from .services.versions import model_coverage
 
 
 def semantic_search(request):
@@ -27,11 +17,15 @@ def semantic_search(request):
     Vista de cerca semàntica:
 
     1. Obté la query de l'usuari via GET.
-    2. Genera embedding de la query amb el model carregat.
-    3. Recupera events de la BD (opcionalment només futurs).
-    4. Filtra events amb embeddings vàlids.
-    5. Ordena per similitud cosinus i retorna els top-20.
-    6. Renderitza la plantilla amb els resultats i metadades.
+    2. Restringeix opcionalment la cerca per categoria, estat i events futurs
+       (filtres aplicats dins l'índex, sense consultar la BD).
+    3. Obté el rànquing complet de la cache de resultats o, si l'índex ha
+       canviat, el recalcula: embedding de la query i cerca híbrida
+       (cosinus + BM25 fusionats amb RRF).
+    4. Agafa la pàgina indicada pel cursor (`cursor`) i carrega de la BD
+       només aquests events.
+    5. Renderitza la plantilla; amb `partial=1` ("Carregar més") retorna
+       JSON amb l'HTML dels resultats i l'URL de la pàgina següent.
     """
 
     # Obté la query i elimina espais al principi i final
@@ -40,39 +34,89 @@ def semantic_search(request):
     # Boolean per decidir si només mostrar events futurs
     only_future = request.GET.get("future", "0") == "1"
 
+    # Filtres opcionals de categoria i estat (només valors vàlids de les choices)
+    category = request.GET.get("category", "")
+    if category not in dict(Event.CATEGORY_CHOICES):
+        category = ""
+    status = request.GET.get("status", "")
+    if status not in dict(Event.STATUS_CHOICES):
+        status = ""
+
     results = []
+    next_url = None
 
     if q:
-        # Genera embedding del text de la query
-        q_vec = embed_text(q)
-
-        # Consulta base: tots els events
-        qs = Event.objects.all()
-
-        # Si només volem futurs, filtrem per data >= ara
-        if only_future:
-            qs = qs.filter(scheduled_date__gte=timezone.now())
-
-        items = []
-
-        # Construcció de la llista d'events amb embeddings vàlids
-        for e in qs:
-            emb = getattr(e, "embedding", None)
-            # Només afegeix embeddings que siguin llistes no buides
-            if isinstance(emb, list) and len(emb) > 0:
-                items.append((e, emb))
-
-        # Ranking semàntic amb similitud cosinus (top 20)
-        ranked = cosine_top_k(q_vec, items, k=20)
-        results = ranked
+        # Si només volem futurs, restringim als events amb data >= ara
+        # (arrodonit al minut perquè les recàrregues comparteixin entrada de cache)
+        scheduled_from = (
+            timezone.now().replace(second=0, microsecond=0) if only_future else None
+        )
+
+        # Rànquing híbrid (semàntic + paraules) amb els filtres, cachejat
+        # mentre l'índex no canviï
+        hits = ranked_results(
+            q, category=category or None, status=status or None,
+            scheduled_from=scheduled_from,
+        )
+
+        page, next_cursor = paginate(
+            hits, request.GET.get("cursor"),
+            page_size=getattr(settings, "SEMANTIC_SEARCH_PAGE_SIZE", 20),
+        )
+
+        # Només es carreguen de la BD els events de la pàgina
+        results = hydrate_events(page)
+
+        if next_cursor:
+            params = request.GET.copy()
+            params.pop("partial", None)
+            params["cursor"] = next_cursor
+            next_url = f"{request.path}?{params.urlencode()}"
+
+    if request.GET.get("partial") == "1":
+        html = render_to_string("semantic_search/_results.html", {"results": results}, request)
+        return JsonResponse({"html": html, "next_url": next_url})
 
     # Context per passar a la plantilla
     context = {
         "query": q,                        # Query de l'usuari
-        "results": results,                # Llista d'events ordenats per similitud
+        "results": results,                # Pàgina d'events ordenats per similitud
+        "next_url": next_url,              # URL de la pàgina següent (None = última)
         "only_future": only_future,        # Indica si s'ha filtrat per futurs
+        "category": category,              # Categoria seleccionada ("" = totes)
+        "status": status,                  # Estat seleccionat ("" = tots)
+        "category_choices": Event.CATEGORY_CHOICES,
+        "status_choices": Event.STATUS_CHOICES,
         "embedding_model": model_name(),   # Nom del model d'embeddings (debug / informació)
     }
 
     # Renderitza la plantilla amb context
-    return render(request, "semantic_search/search.html", context)
\ No newline at end of file
+    return render(request, "semantic_search/search.html", context)
+
+
+@staff_member_required
+def semantic_stats(request):
+    """
+    Vista JSON (només staff) amb mètriques internes de la cerca semàntica:
+    mida, revisió i model de l'índex, cobertura de cada model d'embeddings,
+    comptadors de les caches d'embeddings de queries i de resultats,
+    profunditat i retard de la cua d'embeddings en segon pla i histograma
+    del micro-batcher de queries.
+    """
+    index = peek_index()
+
+    return JsonResponse({
+        "model": model_name(),
+        "index": {
+            "loaded": index is not None,
+            "size": len(index) if index is not None else 0,
+            "version": index.version if index is not None else None,
+            "revision": index.revision if index is not None else None,
+            "model": index.model if index is not None else None,
+        },
+        "models": model_coverage(),
+        "query_cache": get_query_cache().stats(),
+        "result_cache": get_result_cache().stats(),
+        "queue": queue_stats(),
+        "batcher": batcher_stats(),
+    })
@@ -34,3 +34,28 @@ if (semanticBtn) {
     });
 }
 
+
+// Semantic search "load more" js.
+const semanticMore = document.getElementById('semantic-more');
+if (semanticMore) {
+    semanticMore.addEventListener('click', async function(e) {
+        e.preventDefault();
+        semanticMore.classList.add('disabled');
+
+        try {
+            const response = await fetch(semanticMore.href + "&partial=1");
+            const data = await response.json();
+            document.getElementById('semantic-results').insertAdjacentHTML('beforeend', data.html);
+
+            if (data.next_url) {
+                semanticMore.href = data.next_url;
+                semanticMore.classList.remove('disabled');
+            } else {
+                semanticMore.remove();
+            }
+        } catch (err) {
+            // Sense JS/xarxa, l'enllaç continua funcionant com a pàgina següent
+            window.location.href = semanticMore.href;
+        }
+    });
+}